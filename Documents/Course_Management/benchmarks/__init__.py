@@ -0,0 +1,8 @@
+"""
+Benchmarks for the Course Management System.
+
+Each module runs against a throwaway database created the same way the test
+runner creates one, so db.sqlite3 is never touched:
+
+    python -m benchmarks.course_search --courses 100000
+"""
@@ -0,0 +1,283 @@
+"""
+Sync WSGI vs async ASGI throughput with many concurrent keep-alive clients.
+
+The same generated database is served, in a subprocess, first by a threaded
+WSGI server (a thread per connection, like runserver or a threaded
+gunicorn worker) with the sync views, then by uvicorn with
+course_management.asgi (the async catalog and enrollment views). Both use
+DB_PROFILE=production. An asyncio load generator keeps --clients logged-in
+students on keep-alive connections, browsing the catalog, course pages and
+My Courses and enrolling.
+
+    python -m benchmarks.asgi_wsgi --clients 1000 --duration 20
+
+The ASGI side needs uvicorn (pip install uvicorn).
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+from benchmarks.common import setup
+from benchmarks.sqlite_concurrency import restore
+
+MIX = {
+    'course_list': 35,
+    'course_detail': 35,
+    'my_courses': 20,
+    'enroll_course': 10,
+}
+CSRF_TOKEN = 'benchmarkbenchmarkbenchmarkbench'
+
+
+def serve(mode, db_name, port):
+    """Subprocess entry point: serve the benchmark database until killed."""
+    import django
+
+    os.environ['DB_PROFILE'] = 'production'
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'course_management.settings')
+    django.setup()
+    from django.conf import settings
+    from django.db import connections
+
+    settings.DEBUG = False
+    settings.ALLOWED_HOSTS = ['*']
+    connections.settings['default']['NAME'] = db_name
+
+    if mode == 'wsgi':
+        from django.core.handlers.wsgi import WSGIHandler
+        from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+
+        class Server(ThreadedWSGIServer):
+            request_queue_size = 2048
+
+        class QuietHandler(WSGIRequestHandler):
+            def log_message(self, *args):
+                pass
+
+        server = Server(('127.0.0.1', port), QuietHandler)
+        server.set_app(WSGIHandler())
+        server.serve_forever()
+    else:
+        import uvicorn
+        from course_management.asgi import application
+        uvicorn.run(application, host='127.0.0.1', port=port, log_level='warning', lifespan='off', backlog=2048)
+
+
+def create_sessions(student_users):
+    """Log every student in without paying for a password hash each."""
+    from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+    from django.contrib.sessions.backends.db import SessionStore
+
+    keys = {}
+    for user in student_users:
+        session = SessionStore()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = 'django.contrib.auth.backends.ModelBackend'
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.create()
+        keys[user.pk] = session.session_key
+    return keys
+
+
+class Connection:
+    """A keep-alive HTTP/1.1 connection speaking just enough of the protocol."""
+
+    def __init__(self, port, cookies):
+        self.port = port
+        self.cookie_header = '; '.join(f'{k}={v}' for k, v in cookies.items())
+        self.reader = self.writer = None
+
+    async def request(self, method, path, body=b''):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection('127.0.0.1', self.port)
+        head = (
+            f'{method} {path} HTTP/1.1\r\nHost: localhost\r\nCookie: {self.cookie_header}\r\n'
+            f'Content-Length: {len(body)}\r\n'
+        )
+        if method == 'POST':
+            head += f'Content-Type: application/x-www-form-urlencoded\r\nX-CSRFToken: {CSRF_TOKEN}\r\n'
+        self.writer.write(head.encode() + b'\r\n' + body)
+        status = int((await self.reader.readline()).split()[1])
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        if headers.get('transfer-encoding') == 'chunked':
+            while True:
+                size = int((await self.reader.readline()).strip(), 16)
+                await self.reader.readexactly(size + 2)
+                if not size:
+                    break
+        else:
+            await self.reader.readexactly(int(headers.get('content-length', 0)))
+        if headers.get('connection', '').lower() == 'close':
+            self.close()
+        return status
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+async def run_client(port, session_key, course_ids, deadline, warmup_until, rng, samples, errors):
+    connection = Connection(port, {'sessionid': session_key, 'csrftoken': CSRF_TOKEN})
+    views, weights = zip(*MIX.items())
+    try:
+        while time.perf_counter() < deadline:
+            view = rng.choices(views, weights)[0]
+            course_id = rng.choice(course_ids)
+            method, path = {
+                'course_list': ('GET', '/courses/'),
+                'course_detail': ('GET', f'/courses/{course_id}/'),
+                'my_courses': ('GET', '/my-courses/'),
+                'enroll_course': ('POST', f'/courses/{course_id}/enroll/'),
+            }[view]
+            start = time.perf_counter()
+            try:
+                status = await asyncio.wait_for(connection.request(method, path), timeout=60)
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError, IndexError):
+                connection.close()
+                status = None
+            finished = time.perf_counter()
+            # Count what completes in the window, however long it queued
+            if not warmup_until <= finished < deadline:
+                continue
+            if status is None or status >= 400:
+                errors[view] += 1
+            else:
+                samples[view].append((finished - start) * 1000)
+    finally:
+        connection.close()
+
+
+async def sample_server(pid, deadline, peak):
+    """Track the server's peak thread count and RSS while under load."""
+    while time.perf_counter() < deadline:
+        threads, rss = process_status(pid)
+        if threads is None:
+            return
+        peak[0], peak[1] = max(peak[0], threads), max(peak[1], rss)
+        await asyncio.sleep(0.5)
+
+
+async def load(port, pid, session_keys, course_ids, args):
+    samples, errors, peak = defaultdict(list), defaultdict(int), [0, 0.0]
+    started = time.perf_counter()
+    warmup_until = started + args.warmup
+    deadline = warmup_until + args.duration
+    await asyncio.gather(sample_server(pid, deadline, peak), *(
+        run_client(port, key, course_ids, deadline, warmup_until, random.Random(args.seed + i), samples, errors)
+        for i, key in enumerate(session_keys)
+    ))
+    return samples, errors, peak
+
+
+def wait_for_port(port, process, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f'Server exited with status {process.returncode}')
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise SystemExit(f'Server did not start listening on port {port}')
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def process_status(pid):
+    """(threads, RSS in MiB) of the server process, where /proc exists."""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            fields = dict(line.split(':', 1) for line in f)
+        return int(fields['Threads']), int(fields['VmRSS'].split()[0]) / 1024
+    except OSError:
+        return None, None
+
+
+def summarize(mode, samples, errors, seconds, peak):
+    latencies = sorted(ms for view in samples.values() for ms in view)
+    q = statistics.quantiles(latencies, n=100, method='inclusive') if len(latencies) > 1 else latencies * 99 or [0.0] * 99
+    threads, rss = peak
+    print(f'{mode:<5} {len(latencies) / seconds:>9.0f} {q[49]:>9.1f} {q[94]:>9.1f} {q[98]:>9.1f} '
+          f'{sum(errors.values()):>7} {threads or "-":>8} {f"{rss:.0f}" if rss else "-":>8}')
+    for view in MIX:
+        view_q = statistics.quantiles(samples[view], n=100, method='inclusive') if len(samples[view]) > 1 else [0.0] * 99
+        print(f'  {view:<14} {len(samples[view]) / seconds:>7.0f} req/s  p50 {view_q[49]:>8.1f}  '
+              f'p95 {view_q[94]:>8.1f} ms  errors {errors[view]}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--serve', choices=['wsgi', 'asgi'], help=argparse.SUPPRESS)
+    parser.add_argument('--db', help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--clients', type=int, default=1000)
+    parser.add_argument('--duration', type=float, default=20, help='Seconds of load per server')
+    parser.add_argument('--warmup', type=float, default=5, help='Seconds excluded from the results')
+    parser.add_argument('--courses', type=int, default=200)
+    parser.add_argument('--modes', default='wsgi,asgi')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.serve:
+        return serve(args.serve, args.db, args.port)
+
+    db_dir = tempfile.mkdtemp()
+    db_name = os.path.join(db_dir, 'asgi_wsgi.sqlite3')
+    teardown = setup(db_name)
+    try:
+        from django.contrib.auth.models import User
+        from django.db import connection
+        from students.dataset import DatasetGenerator
+        from students.models import Course
+
+        DatasetGenerator(students=args.clients, courses=args.courses, seed=args.seed).run()
+        session_keys = list(create_sessions(User.objects.filter(student__isnull=False)).values())
+        course_ids = list(Course.objects.filter(is_active=True).values_list('pk', flat=True))
+        connection.close()
+        snapshot = os.path.join(db_dir, 'snapshot.sqlite3')
+        shutil.copyfile(db_name, snapshot)
+
+        print(f'{len(session_keys)} keep-alive clients, {args.duration:.0f}s per server after {args.warmup:.0f}s warm-up\n')
+        print(f'{"mode":<5} {"req/s":>9} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9} {"errors":>7} {"threads":>8} {"RSS MiB":>8}  (server peak)')
+        for mode in args.modes.split(','):
+            restore(snapshot, db_name)
+            port = free_port()
+            server = subprocess.Popen([
+                sys.executable, '-m', 'benchmarks.asgi_wsgi', '--serve', mode, '--db', db_name, '--port', str(port),
+            ])
+            try:
+                wait_for_port(port, server)
+                samples, errors, peak = asyncio.run(load(port, server.pid, session_keys, course_ids, args))
+                summarize(mode, samples, errors, args.duration, peak)
+            finally:
+                server.terminate()
+                server.wait()
+    finally:
+        teardown()
+        shutil.rmtree(db_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
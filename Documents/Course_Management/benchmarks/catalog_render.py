@@ -0,0 +1,50 @@
+"""
+Render time of the course catalog template with the fragment cache cold and warm.
+
+    python -m benchmarks.catalog_render --courses 500
+"""
+
+import argparse
+
+from benchmarks.common import make_courses, setup, timed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--courses', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    teardown = setup()
+    try:
+        from django.contrib.auth.models import AnonymousUser
+        from django.core.cache import cache
+        from django.template.loader import render_to_string
+        from django.test import RequestFactory
+        from students.models import Course
+
+        make_courses(args.courses)
+        courses = list(Course.objects.order_by('title', 'id'))
+        request = RequestFactory().get('/courses/')
+        request.user = AnonymousUser()
+        context = {'courses': courses, 'user_enrollments': frozenset(), 'filter_form': None, 'query': ''}
+
+        def render():
+            render_to_string('students/course_list.html', context, request=request)
+
+        def render_cold():
+            cache.clear()
+            render()
+
+        cold = timed(render_cold, args.repeat)
+        render()
+        warm = timed(render, args.repeat)
+        print(f'{args.courses} course cards, median of {args.repeat} renders')
+        print(f'  cold cache: {cold:8.2f} ms')
+        print(f'  warm cache: {warm:8.2f} ms  ({cold / warm:.1f}x faster)')
+    finally:
+        teardown()
+
+
+if __name__ == '__main__':
+    main()
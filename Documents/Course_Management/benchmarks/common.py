@@ -0,0 +1,82 @@
+"""
+Shared setup for the benchmark scripts.
+"""
+
+import os
+import random
+import statistics
+import time
+from datetime import date, timedelta
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'course_management.settings')
+
+WORDS = (
+    'python django data science machine learning web development database design sql '
+    'security cloud computing mobile networks algorithms statistics calculus physics '
+    'chemistry biology history literature economics marketing finance design ethics '
+    'robotics graphics compilers systems distributed parallel introduction advanced '
+    'fundamentals applied theory practice analysis modelling visualisation research'
+).split()
+
+# Filler vocabulary so descriptions follow a Zipf-like word distribution
+# instead of every course mentioning every subject word.
+SYLLABLES = ['ka', 'lo', 'mi', 'ne', 'ru', 'ta', 'vo', 'shi', 'dra', 'pel', 'gon', 'tur', 'ex', 'bal', 'qui']
+FILLER = sorted({a + b + c for a in SYLLABLES for b in SYLLABLES for c in SYLLABLES})
+VOCABULARY = WORDS + FILLER
+random.Random(0).shuffle(VOCABULARY)
+WEIGHTS = [1 / (rank + 1) for rank in range(len(VOCABULARY))]
+
+INSTRUCTORS = [f'Dr. {name}' for name in (
+    'Johnson', 'Chen', 'Wilson', 'Davis', 'Anderson', 'Taylor', 'Martinez', 'Lee',
+    'Garcia', 'Brown', 'Nguyen', 'Okafor', 'Kowalski', 'Haddad', 'Silva', 'Tanaka',
+)]
+
+
+def setup(test_db_name=None):
+    """
+    Configure Django and create a fresh, migrated benchmark database. Pass a
+    file path as ``test_db_name`` when several connections must share it;
+    SQLite otherwise uses an in-memory database. Returns a teardown callable.
+    """
+    django.setup()
+    from django.db import connection
+
+    if test_db_name:
+        connection.settings_dict['TEST']['NAME'] = str(test_db_name)
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    return lambda: connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def make_courses(count, seed=0, batch_size=5000):
+    """Bulk-insert ``count`` active courses with random titles and descriptions."""
+    from students.models import Course
+
+    rng = random.Random(seed)
+    today = date.today()
+    for offset in range(0, count, batch_size):
+        Course.objects.bulk_create([
+            Course(
+                title=' '.join(rng.choices(WORDS, k=3)).title(),
+                description=' '.join(rng.choices(VOCABULARY, WEIGHTS, k=40)),
+                instructor=rng.choice(INSTRUCTORS),
+                credits=rng.randint(1, 5),
+                difficulty=rng.choice(['beginner', 'intermediate', 'advanced']),
+                max_students=rng.choice([15, 20, 25, 30, 40, 60]),
+                start_date=today + timedelta(days=rng.randint(0, 365)),
+                end_date=today + timedelta(days=rng.randint(366, 500)),
+            )
+            for _ in range(offset, min(count, offset + batch_size))
+        ])
+
+
+def timed(fn, repeat=5):
+    """Run ``fn`` ``repeat`` times and return the median wall time in ms."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
@@ -0,0 +1,64 @@
+"""
+Compare FTS5 course search with the admin's icontains search.
+
+    python -m benchmarks.course_search --courses 100000
+"""
+
+import argparse
+import time
+
+from benchmarks.common import make_courses, setup, timed
+
+QUERIES = ['python', 'machine learning', 'distrib', 'statistics calculus physics', 'kaloqui', 'nomatchword']
+
+
+def count_matches(query):
+    from django.db import connection
+    from students.search import FTS_TABLE, match_expression
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT count(*) FROM {FTS_TABLE} JOIN students_course ON students_course.id = {FTS_TABLE}.rowid '
+            f'WHERE {FTS_TABLE} MATCH %s AND students_course.is_active',
+            [match_expression(query)],
+        )
+        return cursor.fetchone()[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--courses', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    teardown = setup()
+    try:
+        from students.models import Course
+        from students.search import icontains_q, search_courses
+
+        start = time.perf_counter()
+        make_courses(args.courses)
+        print(f'Loaded {args.courses} courses (with FTS triggers) in {time.perf_counter() - start:.1f}s\n')
+
+        active = Course.objects.filter(is_active=True)
+        print('Top 50 results (icontains: first 50 by title; fts5: 50 best by bm25 with snippets)')
+        print(f'{"query":<30} {"icontains ms":>14} {"fts5 ms":>10} {"speedup":>8} {"matches":>9}')
+        for query in QUERIES:
+            icontains = timed(lambda: list(active.filter(icontains_q(query)).order_by('title', 'id')[:50]), args.repeat)
+            fts = timed(lambda: search_courses(query, active, limit=50), args.repeat)
+            matches = active.filter(icontains_q(query)).count()
+            print(f'{query:<30} {icontains:>14.2f} {fts:>10.2f} {icontains / fts:>7.1f}x {matches:>9}')
+
+        # The admin changelist also counts every match to paginate
+        print('\nCounting all matches (admin changelist pagination)')
+        print(f'{"query":<30} {"icontains ms":>14} {"fts5 ms":>10} {"speedup":>8}')
+        for query in QUERIES:
+            icontains = timed(lambda: active.filter(icontains_q(query)).count(), args.repeat)
+            fts = timed(lambda: count_matches(query), args.repeat)
+            print(f'{query:<30} {icontains:>14.2f} {fts:>10.2f} {icontains / fts:>7.1f}x')
+    finally:
+        teardown()
+
+
+if __name__ == '__main__':
+    main()
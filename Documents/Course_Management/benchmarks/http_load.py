@@ -0,0 +1,352 @@
+"""
+End-to-end HTTP load test of the student-facing views.
+
+Many logged-in students browse, enroll, upload and download concurrently.
+Reports p50/p95/p99 latency, throughput and queries per request (from the
+Server-Timing header) for each view and saves the results as JSON; --compare
+fails the run when a view's p95 regressed past --tolerance against an
+earlier result.
+
+By default a seeded dataset (see students.dataset) is generated in a
+throwaway database and served by an in-process threaded server:
+
+    python -m benchmarks.http_load --clients 16 --duration 30
+
+To load an already running server instead, generate its data first with
+``manage.py generate_dataset`` and point --url at it; the harness reads the
+same database to plan requests:
+
+    python -m benchmarks.http_load --url http://127.0.0.1:8000 --prefix load
+"""
+
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import re
+import shutil
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode, urlsplit
+
+import django
+
+from benchmarks.common import setup
+
+# Relative weight of each view in a client's request stream
+MIX = {
+    'course_list': 30,
+    'course_detail': 30,
+    'my_courses': 15,
+    'enroll_course': 10,
+    'download_file': 10,
+    'upload_file': 5,
+}
+UPLOAD_SIZE = 64 * 1024
+# Set by students.perf.PerformanceMiddleware
+SERVER_TIMING_QUERIES = re.compile(r'db;[^,]*desc="(\d+) queries"')
+
+
+class Client:
+    """A keep-alive HTTP connection with a cookie jar, like one browser tab."""
+
+    def __init__(self, base_url):
+        parts = urlsplit(base_url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.cookies = {}
+        self.connection = None
+
+    def request(self, method, path, body=None, headers=None):
+        headers = dict(headers or {})
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f'{name}={value}' for name, value in self.cookies.items())
+        if method != 'GET' and 'csrftoken' in self.cookies:
+            headers['X-CSRFToken'] = self.cookies['csrftoken']
+        for attempt in range(2):
+            if self.connection is None:
+                self.connection = http.client.HTTPConnection(self.host, self.port, timeout=60)
+            try:
+                self.connection.request(method, path, body=body, headers=headers)
+                response = self.connection.getresponse()
+                content = response.read()
+                break
+            except (ConnectionError, http.client.HTTPException):
+                # The server closed an idle keep-alive connection
+                self.connection.close()
+                self.connection = None
+                if attempt:
+                    raise
+        for header in response.headers.get_all('Set-Cookie') or []:
+            for name, morsel in SimpleCookie(header).items():
+                self.cookies[name] = morsel.value
+        if response.getheader('Connection', '').lower() == 'close':
+            self.connection.close()
+            self.connection = None
+        return response, content
+
+    def login(self, username, password):
+        self.request('GET', '/login/')
+        response, _ = self.request('POST', '/login/', urlencode({
+            'username': username,
+            'password': password,
+            'csrfmiddlewaretoken': self.cookies.get('csrftoken', ''),
+        }), {'Content-Type': 'application/x-www-form-urlencoded'})
+        if response.status != 302:
+            raise RuntimeError(f'Login failed for {username} (HTTP {response.status})')
+
+
+def multipart(fields, file_field, filename, content):
+    boundary = uuid.uuid4().hex
+    lines = []
+    for name, value in fields.items():
+        lines.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    lines.append(
+        f'--{boundary}\r\nContent-Disposition: form-data; name="{file_field}"; filename="{filename}"\r\n'
+        f'Content-Type: application/octet-stream\r\n\r\n'.encode() + content + b'\r\n'
+    )
+    lines.append(f'--{boundary}--\r\n'.encode())
+    return b''.join(lines), f'multipart/form-data; boundary={boundary}'
+
+
+class Student:
+    """What one client knows about its account: courses it can use and files it can fetch."""
+
+    def __init__(self, username, enrolled, files):
+        self.username = username
+        self.enrolled = enrolled
+        self.files = files
+
+
+def plan(prefix, clients, seed):
+    """Pick ``clients`` generated students, preferring ones with enrollments."""
+    from students.models import Course, Enrollment, FileUpload
+
+    rng = random.Random(seed)
+    enrolled = defaultdict(list)
+    for username, course_id in Enrollment.objects.filter(
+        is_active=True, student__user__username__startswith=prefix
+    ).values_list('student__user__username', 'course_id').iterator():
+        enrolled[username].append(course_id)
+    if len(enrolled) < clients:
+        raise SystemExit(f'Only {len(enrolled)} enrolled students with prefix {prefix!r}; need {clients}')
+
+    files = defaultdict(list)
+    for course_id, file_id in FileUpload.objects.values_list('course_id', 'id').iterator():
+        files[course_id].append(file_id)
+    usernames = rng.sample(sorted(enrolled), clients)
+    course_ids = list(Course.objects.filter(is_active=True).values_list('id', flat=True))
+    students = [
+        Student(name, enrolled[name], [f for course_id in enrolled[name] for f in files.get(course_id, [])])
+        for name in usernames
+    ]
+    return students, course_ids
+
+
+def run_client(base_url, student, password, course_ids, deadline, warmup_until, seed, results, errors):
+    rng = random.Random(seed)
+    client = Client(base_url)
+    client.login(student.username, password)
+    views, weights = zip(*MIX.items())
+    upload = bytes(rng.getrandbits(8) for _ in range(256)) * (UPLOAD_SIZE // 256)
+
+    while time.perf_counter() < deadline:
+        view = rng.choices(views, weights)[0]
+        if view in ('download_file', 'upload_file') and not (student.files if view == 'download_file' else student.enrolled):
+            view = 'course_list'
+        body, headers, method = None, {}, 'GET'
+        if view == 'course_list':
+            path = '/courses/'
+        elif view == 'course_detail':
+            path = f'/courses/{rng.choice(course_ids)}/'
+        elif view == 'my_courses':
+            path = '/my-courses/'
+        elif view == 'enroll_course':
+            method, path = 'POST', f'/courses/{rng.choice(course_ids)}/enroll/'
+            body = urlencode({'csrfmiddlewaretoken': client.cookies.get('csrftoken', '')})
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        elif view == 'download_file':
+            path = f'/files/{rng.choice(student.files)}/download/'
+        else:
+            method, path = 'POST', f'/courses/{rng.choice(student.enrolled)}/upload/'
+            body, headers['Content-Type'] = multipart(
+                {'title': 'Load test upload', 'description': '',
+                 'csrfmiddlewaretoken': client.cookies.get('csrftoken', '')},
+                'file', f'load-{uuid.uuid4().hex[:8]}.bin', upload,
+            )
+
+        start = time.perf_counter()
+        try:
+            response, _ = client.request(method, path, body, headers)
+        except (OSError, http.client.HTTPException) as e:
+            errors[view].append(str(e))
+            continue
+        elapsed = (time.perf_counter() - start) * 1000
+        if start < warmup_until:
+            continue
+        if response.status >= 400:
+            errors[view].append(f'HTTP {response.status} {path}')
+            continue
+        queries = SERVER_TIMING_QUERIES.search(response.getheader('Server-Timing', ''))
+        results[view].append((elapsed, int(queries.group(1)) if queries else None))
+
+
+def summarize(samples, seconds):
+    latencies = sorted(ms for ms, _ in samples)
+    queries = [q for _, q in samples if q is not None]
+    percentiles = statistics.quantiles(latencies, n=100, method='inclusive') if len(latencies) > 1 else latencies * 99
+    return {
+        'requests': len(latencies),
+        'throughput': round(len(latencies) / seconds, 2),
+        'p50_ms': round(percentiles[49], 2),
+        'p95_ms': round(percentiles[94], 2),
+        'p99_ms': round(percentiles[98], 2),
+        'mean_ms': round(statistics.fmean(latencies), 2),
+        'queries_per_request': round(statistics.fmean(queries), 2) if queries else None,
+    }
+
+
+def start_server():
+    from django.core.handlers.wsgi import WSGIHandler
+    from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_message(self, *args):
+            pass
+
+    server = ThreadedWSGIServer(('127.0.0.1', 0), QuietHandler, allow_reuse_address=False)
+    server.set_app(WSGIHandler())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_port}'
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ''
+
+
+def compare(result, baseline_path, tolerance):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    regressions = []
+    print(f'\nChange in p95 against {baseline_path} ({baseline["meta"].get("revision") or "unknown revision"})')
+    for view, stats in result['views'].items():
+        before = baseline['views'].get(view)
+        if not before or not before['p95_ms']:
+            continue
+        change = stats['p95_ms'] / before['p95_ms'] - 1
+        flag = '  REGRESSION' if change > tolerance else ''
+        print(f'  {view:<15} {before["p95_ms"]:9.1f} -> {stats["p95_ms"]:9.1f} ms  {change:+7.1%}{flag}')
+        if flag:
+            regressions.append(view)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--url', help='Load a running server instead of starting one')
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=20, help='Seconds of load per run')
+    parser.add_argument('--warmup', type=float, default=2, help='Seconds excluded from the results')
+    parser.add_argument('--students', type=int, default=2000, help='Dataset size when self-hosting')
+    parser.add_argument('--courses', type=int, default=200)
+    parser.add_argument('--files', type=int, default=400)
+    parser.add_argument('--file-size', type=int, default=256 * 1024)
+    parser.add_argument('--prefix', default='load')
+    parser.add_argument('--password', default='password123')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='JSON results path (default: benchmarks/results/http-<time>.json)')
+    parser.add_argument('--compare', help='Earlier JSON result to compare p95 latencies with')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed p95 slowdown before failing --compare')
+    args = parser.parse_args()
+
+    teardown, media_root = None, None
+    if args.url:
+        django.setup()
+        base_url = args.url.rstrip('/')
+    else:
+        db_dir = tempfile.mkdtemp()
+        teardown = setup(os.path.join(db_dir, 'http_load.sqlite3'))
+        from django.conf import settings
+        from students.dataset import DatasetGenerator
+
+        media_root = settings.MEDIA_ROOT = tempfile.mkdtemp()
+        DatasetGenerator(
+            students=args.students, courses=args.courses, files=args.files, file_size=args.file_size,
+            seed=args.seed, prefix=args.prefix, password=args.password,
+        ).run()
+        server, base_url = start_server()
+
+    try:
+        students, course_ids = plan(args.prefix, args.clients, args.seed)
+        results, errors = defaultdict(list), defaultdict(list)
+        started = time.perf_counter()
+        warmup_until = started + args.warmup
+        deadline = warmup_until + args.duration
+        threads = [
+            threading.Thread(target=run_client, args=(
+                base_url, student, args.password, course_ids, deadline, warmup_until,
+                args.seed + i, results, errors,
+            ))
+            for i, student in enumerate(students)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        measured = time.perf_counter() - warmup_until
+
+        result = {
+            'meta': {
+                'revision': git_revision(),
+                'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                'url': args.url or 'in-process',
+                'clients': args.clients,
+                'duration_s': round(measured, 2),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'args': vars(args),
+            },
+            'views': {view: summarize(results[view], measured) for view in MIX if results[view]},
+            'total': summarize([s for view in results for s in results[view]], measured),
+            'errors': {view: len(messages) for view, messages in errors.items()},
+        }
+
+        print(f'{args.clients} clients, {measured:.1f}s against {result["meta"]["url"]}')
+        print(f'  {"view":<15} {"requests":>8} {"req/s":>8} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"queries":>8}')
+        for view, stats in [*result['views'].items(), ('total', result['total'])]:
+            queries = stats['queries_per_request']
+            print(f'  {view:<15} {stats["requests"]:>8} {stats["throughput"]:>8.1f} {stats["p50_ms"]:>8.1f} '
+                  f'{stats["p95_ms"]:>8.1f} {stats["p99_ms"]:>8.1f} {queries if queries is not None else "-":>8}')
+        for view, messages in errors.items():
+            print(f'  {len(messages)} errors in {view}, e.g. {messages[0]}')
+
+        output = args.output or os.path.join(
+            os.path.dirname(__file__), 'results', f'http-{datetime.now():%Y%m%d-%H%M%S}.json'
+        )
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, 'w') as f:
+            json.dump(result, f, indent=2)
+        print(f'Results saved to {output}')
+
+        if args.compare and compare(result, args.compare, args.tolerance):
+            raise SystemExit(1)
+    finally:
+        if teardown:
+            server.shutdown()
+            teardown()
+            shutil.rmtree(media_root, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
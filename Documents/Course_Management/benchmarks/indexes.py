@@ -0,0 +1,161 @@
+"""
+Query plans and latencies of the hot lookups without and with the
+access-pattern indexes of migration 0009. The per-student lookups are
+included as a control: they were already served by the student_id index.
+
+    python -m benchmarks.indexes --students 50000 --courses 2000 --files 20000
+"""
+
+import argparse
+import time
+from datetime import timedelta
+
+from benchmarks.common import setup, timed
+
+INDEXES = {
+    'course': ['course_start_date_all_idx'],
+    'enrollment': ['enrollment_course_active_idx', 'enrollment_date_idx'],
+    'fileupload': ['fileupload_course_recent_idx', 'fileupload_timestamp_idx'],
+}
+
+
+def spread_dates(days=730):
+    """Generated rows are all stamped 'now'; spread them over two years."""
+    from django.db import connection
+
+    with connection.cursor() as cursor:
+        for table, column in (('students_enrollment', 'enrollment_date'), ('students_fileupload', 'timestamp')):
+            cursor.execute(
+                f"UPDATE {table} SET {column} = datetime({column}, '-' || ((id * 7919) % {days}) || ' days')"
+            )
+        cursor.execute('ANALYZE')
+
+
+def set_indexes(enabled):
+    from django.apps import apps
+    from django.db import connection
+
+    with connection.schema_editor() as editor:
+        for model_name, names in INDEXES.items():
+            model = apps.get_model('students', model_name)
+            for index in model._meta.indexes:
+                if index.name in names:
+                    (editor.add_index if enabled else editor.remove_index)(model, index)
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+
+def cases(sample_students, big_courses, file_courses):
+    """(label, representative queryset for EXPLAIN, callable to time)."""
+    from django.db.models import Max, Min
+    from django.utils import timezone
+    from students.models import Course, Enrollment, FileUpload, enrollment_count_subquery
+
+    month_end = timezone.now() - timedelta(days=90)
+    month_start = month_end - timedelta(days=30)
+
+    def membership(pk):
+        return Enrollment.objects.filter(student_id=pk, is_active=True).values_list('course_id', flat=True)
+
+    def my_courses(pk):
+        return Enrollment.objects.filter(student_id=pk, is_active=True).select_related('course')
+
+    def roster(pk):
+        return Enrollment.objects.filter(course_id=pk, is_active=True).select_related('student__user')
+
+    def files(pk):
+        return FileUpload.objects.filter(course_id=pk).select_related('uploaded_by').order_by('-timestamp')
+
+    recount = Course.objects.annotate(active=enrollment_count_subquery('course', active_only=True)).values_list('pk', 'active')
+
+    def date_hierarchy(model, field):
+        # What the admin changelist runs: the date range, then a month's rows
+        in_month = model.objects.filter(**{f'{field}__gte': month_start, f'{field}__lt': month_end})
+        return in_month, lambda: (
+            model.objects.aggregate(first=Min(field), last=Max(field)),
+            in_month.count(),
+            list(in_month.order_by('-pk')[:100]),
+        )
+
+    enrollment_dates = date_hierarchy(Enrollment, 'enrollment_date')
+    upload_dates = date_hierarchy(FileUpload, 'timestamp')
+    course_dates = Course.objects.filter(start_date__gte=month_start.date(), start_date__lt=month_end.date() + timedelta(days=150))
+    return [
+        (f'membership x{len(sample_students)}', membership(sample_students[0]),
+         lambda: [list(membership(pk)) for pk in sample_students]),
+        (f'my_courses x{len(sample_students)}', my_courses(sample_students[0]),
+         lambda: [list(my_courses(pk)) for pk in sample_students]),
+        (f'course roster x{len(big_courses)}', roster(big_courses[0]),
+         lambda: [list(roster(pk)) for pk in big_courses]),
+        ('active counter recount', recount, lambda: list(recount.all())),
+        (f'course files x{len(file_courses)}', files(file_courses[0]),
+         lambda: [list(files(pk)) for pk in file_courses]),
+        ('admin dates: enrollment_date', enrollment_dates[0], enrollment_dates[1]),
+        ('admin dates: timestamp', upload_dates[0], upload_dates[1]),
+        ('admin dates: start_date', course_dates, lambda: (
+            Course.objects.aggregate(first=Min('start_date'), last=Max('start_date')),
+            list(course_dates.order_by('-pk')[:100]),
+        )),
+    ]
+
+
+def measure(all_cases, repeat):
+    results = {}
+    for label, queryset, fn in all_cases:
+        fn()
+        results[label] = (timed(fn, repeat), queryset.explain())
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--students', type=int, default=50000)
+    parser.add_argument('--courses', type=int, default=2000)
+    parser.add_argument('--files', type=int, default=20000)
+    parser.add_argument('--sample', type=int, default=200, help='Students or courses per lookup case')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    teardown = setup()
+    try:
+        from django.db.models import Count
+        from students.dataset import DatasetGenerator
+        from students.models import Course, Student
+
+        start = time.perf_counter()
+        generator = DatasetGenerator(
+            students=args.students, courses=args.courses, files=args.files, write_media=False,
+        ).run()
+        spread_dates()
+        print(f'Generated {args.students} students, {generator.enrollments} enrollments and '
+              f'{args.files} files in {time.perf_counter() - start:.1f}s\n')
+
+        step = max(1, args.students // args.sample)
+        sample_students = list(Student.objects.order_by('pk').values_list('pk', flat=True)[::step][:args.sample])
+        big_courses = list(Course.objects.order_by('-active_enrolled_count').values_list('pk', flat=True)[:args.sample // 10])
+        file_courses = list(Course.objects.annotate(n=Count('fileupload')).order_by('-n')
+                            .values_list('pk', flat=True)[:args.sample // 10])
+        all_cases = cases(sample_students, big_courses, file_courses)
+
+        set_indexes(False)
+        before = measure(all_cases, args.repeat)
+        set_indexes(True)
+        after = measure(all_cases, args.repeat)
+
+        print(f'{"case":<32} {"before ms":>10} {"after ms":>10} {"speedup":>8}')
+        for label, _, _ in all_cases:
+            print(f'{label:<32} {before[label][0]:>10.2f} {after[label][0]:>10.2f} '
+                  f'{before[label][0] / after[label][0]:>7.1f}x')
+
+        print('\nQuery plans (before / after)')
+        for label, _, _ in all_cases:
+            print(f'\n{label}')
+            for name, plans in (('before', before), ('after', after)):
+                for line in plans[label][1].splitlines():
+                    print(f'  {name:<7} {line.strip()}')
+    finally:
+        teardown()
+
+
+if __name__ == '__main__':
+    main()
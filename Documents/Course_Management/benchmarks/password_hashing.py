@@ -0,0 +1,51 @@
+"""
+Account provisioning throughput: serial hashing vs a process pool vs forced reset.
+
+    python -m benchmarks.password_hashing --accounts 64 --workers 8
+"""
+
+import argparse
+import os
+import time
+
+from benchmarks.common import setup
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--accounts', type=int, default=64)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    teardown = setup()
+    try:
+        from django.contrib.auth.models import User
+        from students.models import Student
+        from students.provisioning import provision_students
+
+        def run(label, **kwargs):
+            accounts = [
+                {'username': f'{label}{i}', 'password': f'pw-{i}-secret', 'student_id': f'{label[:3].upper()}{i}'}
+                for i in range(args.accounts)
+            ]
+            start = time.perf_counter()
+            result = provision_students(accounts, **kwargs)
+            elapsed = time.perf_counter() - start
+            assert len(result.users) == args.accounts, result.errors
+            print(f'  {label:<12} {elapsed:8.2f} s  {args.accounts / elapsed:9.1f} accounts/s')
+            Student.objects.all().delete()
+            User.objects.all().delete()
+            return elapsed
+
+        print(f'{args.accounts} accounts, {args.workers} workers on {os.cpu_count()} CPUs')
+        serial = run('serial', workers=1)
+        pooled = run('pool', workers=args.workers)
+        reset = run('force-reset', force_reset=True)
+        print(f'  pool speedup over serial:        {serial / pooled:.1f}x')
+        print(f'  force-reset speedup over serial: {serial / reset:.0f}x')
+    finally:
+        teardown()
+
+
+if __name__ == '__main__':
+    main()
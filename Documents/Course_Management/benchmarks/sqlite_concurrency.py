@@ -0,0 +1,169 @@
+"""
+Mixed read/write throughput of the SQLite profiles.
+
+Worker threads act like request handlers: each operation opens (or reuses)
+its connection the way Django does between requests, then runs a course
+page read, an enrollment, or a drop that reads before it writes. The same
+generated database is loaded under the plain development settings and under
+DB_PROFILE=production (WAL, pragmas, persistent connections, immediate
+write transactions).
+
+    python -m benchmarks.sqlite_concurrency --workers 8 --duration 10
+"""
+
+import argparse
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+from benchmarks.common import setup
+
+
+def profiles():
+    from django.conf import settings
+
+    return {
+        'development': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'OPTIONS': {},
+            'CONN_MAX_AGE': 0,
+            'CONN_HEALTH_CHECKS': False,
+        },
+        'production': {
+            'ENGINE': 'course_management.sqlite_backend',
+            'OPTIONS': {'init_command': ';'.join(settings.SQLITE_PRODUCTION_PRAGMAS)},
+            'CONN_MAX_AGE': 600,
+            'CONN_HEALTH_CHECKS': True,
+        },
+    }
+
+
+def read(rng, student_ids, course_ids):
+    from students.models import Course, Enrollment
+
+    Course.objects.get(pk=rng.choice(course_ids))
+    list(Enrollment.objects.filter(student_id=rng.choice(student_ids), is_active=True).values_list('course_id'))
+    list(Course.objects.filter(is_active=True).order_by('title', 'id')[:25])
+
+
+def enroll(rng, student_ids, course_ids):
+    from students.enrollment import EnrollmentError, enroll_student
+    from students.models import Course, Student
+
+    try:
+        enroll_student(Student(pk=rng.choice(student_ids)), Course(pk=rng.choice(course_ids)))
+    except EnrollmentError:
+        pass
+
+
+def drop(rng, student_ids, course_ids):
+    from students.db import immediate_atomic
+    from students.models import Enrollment
+
+    with immediate_atomic():
+        enrollment = Enrollment.objects.filter(student_id=rng.choice(student_ids)).first()
+        if enrollment:
+            enrollment.delete()
+
+
+def worker(seed, write_ratio, deadline, student_ids, course_ids, samples, errors):
+    from django.db import OperationalError, close_old_connections, connection
+
+    rng = random.Random(seed)
+    while time.perf_counter() < deadline:
+        if rng.random() < write_ratio:
+            kind, operation = rng.choice([('enroll', enroll), ('drop', drop)])
+        else:
+            kind, operation = 'read', read
+        close_old_connections()  # request_started
+        start = time.perf_counter()
+        try:
+            operation(rng, student_ids, course_ids)
+            samples[kind].append((time.perf_counter() - start) * 1000)
+        except OperationalError:
+            errors[kind] += 1
+        finally:
+            close_old_connections()  # request_finished
+    connection.close()
+
+
+def run_profile(name, settings_dict, args, student_ids, course_ids):
+    from django.db import connection
+
+    connection.close()
+    settings_dict.update(profiles()[name])
+    samples, errors = defaultdict(list), defaultdict(int)
+    deadline = time.perf_counter() + args.duration
+    threads = [
+        threading.Thread(target=worker, args=(
+            args.seed + i, args.write_ratio, deadline, student_ids, course_ids, samples, errors,
+        ))
+        for i in range(args.workers)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, errors
+
+
+def restore(snapshot, db_name):
+    for suffix in ('-wal', '-shm'):
+        if os.path.exists(db_name + suffix):
+            os.remove(db_name + suffix)
+    shutil.copyfile(snapshot, db_name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10, help='Seconds per profile')
+    parser.add_argument('--write-ratio', type=float, default=0.2)
+    parser.add_argument('--students', type=int, default=2000)
+    parser.add_argument('--courses', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    db_dir = tempfile.mkdtemp()
+    db_name = os.path.join(db_dir, 'concurrency.sqlite3')
+    teardown = setup(db_name)
+    try:
+        from django.conf import settings
+        from django.db import connection
+        from students.dataset import DatasetGenerator
+        from students.models import Course, Student
+
+        # Query logging would dominate the measurements
+        settings.DEBUG = False
+        DatasetGenerator(students=args.students, courses=args.courses, seed=args.seed).run()
+        student_ids = list(Student.objects.values_list('pk', flat=True))
+        course_ids = list(Course.objects.filter(is_active=True).values_list('pk', flat=True))
+        connection.close()
+        snapshot = os.path.join(db_dir, 'snapshot.sqlite3')
+        shutil.copyfile(db_name, snapshot)
+
+        print(f'{args.workers} workers, {args.write_ratio:.0%} writes, {args.duration:.0f}s per profile\n')
+        print(f'{"profile":<12} {"operation":<8} {"ops/s":>8} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"errors":>7}')
+        for name in profiles():
+            restore(snapshot, db_name)
+            samples, errors = run_profile(name, connection.settings_dict, args, student_ids, course_ids)
+            total = sum(len(latencies) for latencies in samples.values())
+            for kind in ('read', 'enroll', 'drop'):
+                latencies = samples[kind] or [0.0]
+                q = statistics.quantiles(latencies, n=100, method='inclusive') if len(latencies) > 1 else latencies * 99
+                print(f'{name:<12} {kind:<8} {len(samples[kind]) / args.duration:>8.0f} '
+                      f'{q[49]:>8.2f} {q[94]:>8.2f} {q[98]:>8.2f} {errors[kind]:>7}')
+            print(f'{name:<12} {"all":<8} {total / args.duration:>8.0f}\n')
+        connection.close()
+    finally:
+        teardown()
+        shutil.rmtree(db_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
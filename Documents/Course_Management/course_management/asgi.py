@@ -2,6 +2,8 @@
 ASGI config for course_management project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Requests are resolved against course_management.asgi_urls, which serves the
+catalog and enrollment pages from async views.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
@@ -9,8 +11,26 @@ https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+from django.core.handlers.asgi import ASGIHandler, ASGIRequest
+from django.db import connections
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'course_management.settings')
 
-application = get_asgi_application()
+
+class AsyncViewsRequest(ASGIRequest):
+    urlconf = 'course_management.asgi_urls'
+
+
+class AsyncViewsHandler(ASGIHandler):
+    request_class = AsyncViewsRequest
+
+
+django.setup(set_prefix=False)
+
+# Django 4.2 runs each request's sync code (and so its queries) in a thread
+# of its own, which a persistent connection would outlive
+for alias in connections:
+    connections.settings[alias]['CONN_MAX_AGE'] = 0
+
+application = AsyncViewsHandler()
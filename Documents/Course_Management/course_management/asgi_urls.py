@@ -0,0 +1,20 @@
+"""
+URL configuration for ASGI requests (see asgi.py).
+
+The catalog and enrollment URLs go to the async views in
+students/asyncviews.py; everything else falls through to the regular
+configuration. Patterns are matched in order, so these come first, and they
+keep the names and paths of the sync routes they shadow.
+"""
+from django.urls import path
+from students import asyncviews
+
+from .urls import urlpatterns as sync_urlpatterns
+
+urlpatterns = [
+    path('', asyncviews.course_list, name='course_list'),
+    path('courses/', asyncviews.course_list, name='course_list'),
+    path('courses/<int:course_id>/', asyncviews.course_detail, name='course_detail'),
+    path('courses/<int:course_id>/enroll/', asyncviews.enroll_course, name='enroll_course'),
+    path('my-courses/', asyncviews.my_courses, name='my_courses'),
+] + sync_urlpatterns
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -41,6 +42,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Outermost so its timings cover the whole middleware stack
+    'students.perf.PerformanceMiddleware',
+    'students.replicas.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -76,11 +80,76 @@ WSGI_APPLICATION = 'course_management.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        # django.db.backends.sqlite3 plus per-connection PRAGMAs and
+        # BEGIN IMMEDIATE for students.db.immediate_atomic()
+        'ENGINE': 'course_management.sqlite_backend',
         'NAME': BASE_DIR / 'db.sqlite3',
     }
 }
 
+# DB_PROFILE=production: WAL, so readers never block the writer and the
+# writer never blocks readers; synchronous=NORMAL, which is safe in WAL (a
+# power cut can lose the last commits, never corrupt the file); a 5 s busy
+# timeout; 64 MiB page cache and 256 MiB of memory-mapped reads per
+# connection; and connections kept for 10 minutes instead of reopened (and
+# re-PRAGMAed) on every request.
+DB_PROFILE = os.environ.get('DB_PROFILE', 'development')
+
+SQLITE_PRODUCTION_PRAGMAS = [
+    'PRAGMA journal_mode = WAL',
+    'PRAGMA synchronous = NORMAL',
+    'PRAGMA busy_timeout = 5000',
+    'PRAGMA cache_size = -65536',
+    'PRAGMA mmap_size = 268435456',
+]
+
+if DB_PROFILE == 'production':
+    DATABASES['default'].update({
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {'init_command': ';'.join(SQLITE_PRODUCTION_PRAGMAS)},
+    })
+
+# Read replicas (students/replicas.py): DB_REPLICAS is a comma-separated list
+# of SQLite files, relative to BASE_DIR, kept up to date with
+# `manage.py sync_replicas --interval 1`. Catalog, course page and admin list
+# reads go to them; a browser stays on the primary for REPLICA_PIN_SECONDS
+# after it writes.
+REPLICA_DATABASES = []
+for number, path in enumerate(filter(None, os.environ.get('DB_REPLICAS', '').split(',')), 1):
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        'NAME': BASE_DIR / path.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+    REPLICA_DATABASES.append(f'replica{number}')
+
+DATABASE_ROUTERS = ['students.replicas.ReplicaRouter']
+REPLICA_PIN_SECONDS = 5
+
+# Seat holds (students/holds.py): how long a held seat waits for confirmation.
+# Expired holds are swept when a full course is claimed, or every few seconds
+# by `manage.py expire_holds --interval 5`.
+SEAT_HOLD_SECONDS = 600
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Enrollment membership (students/membership.py) is invalidated through this
+# cache, so multi-process deployments need a shared backend such as
+# django.core.cache.backends.redis.RedisCache; LocMemCache is per process.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        # Room for a fragment per course card plus membership sets; the
+        # default of 300 entries thrashes on a full catalog
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    }
+}
+
+ENROLLMENT_CACHE_TIMEOUT = 60 * 60
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -123,6 +192,51 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Course files (FileUpload.file) are stored once per distinct content under
+# MEDIA_ROOT/blobs/, named by SHA-256 (students/storage.py). Move files saved
+# before that with `manage.py dedup_uploads`.
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    'course_files': {'BACKEND': 'students.storage.ContentAddressedStorage'},
+}
+
+# File downloads: 'django' streams from the worker; 'nginx' (X-Accel-Redirect)
+# and 'apache' (X-Sendfile) hand the transfer to the front-end server.
+# For nginx, FILE_DOWNLOAD_ACCEL_PREFIX must map to MEDIA_ROOT in an
+# `internal` location block.
+FILE_DOWNLOAD_BACKEND = 'django'
+FILE_DOWNLOAD_ACCEL_PREFIX = '/protected-media/'
+
+# Hash uploads as they stream in so FileUpload.sha256 needs no second read
+FILE_UPLOAD_HANDLERS = [
+    'students.uploadhandlers.HashingMemoryFileUploadHandler',
+    'students.uploadhandlers.HashingTemporaryFileUploadHandler',
+]
+
+# Resumable chunked uploads (students/uploads.py)
+UPLOAD_SESSION_DIR = MEDIA_ROOT / 'upload_sessions'
+UPLOAD_SESSION_MAX_SIZE = 5 * 1024 ** 3
+UPLOAD_SESSION_MAX_AGE_HOURS = 24
+
+# students.perf.PerformanceMiddleware: per-view stats at /perf/stats/ (staff
+# only). Server-Timing headers show app, db and template time in browser
+# devtools; set to False to keep them from clients.
+PERF_SERVER_TIMING = True
+
+# Prometheus scrape target at /metrics (students/metrics.py). Rendered output
+# is cached this many seconds. Staff can always read it; otherwise it needs
+# "Authorization: Bearer <METRICS_TOKEN>", or, with no token set, a scraper on
+# localhost. Behind a reverse proxy REMOTE_ADDR is the proxy, so set a token.
+METRICS_CACHE_TTL = 10
+METRICS_TOKEN = None
+
+# Slow-query log (students/slowqueries.py): set SLOW_QUERY_MS to log queries
+# at or over that many milliseconds, with their EXPLAIN QUERY PLAN, to
+# SLOW_QUERY_LOG. Summarize with `manage.py slow_queries`.
+SLOW_QUERY_MS = None
+SLOW_QUERY_LOG = BASE_DIR / 'slow_queries.jsonl'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -0,0 +1,36 @@
+"""
+SQLite backend with per-connection setup and BEGIN IMMEDIATE.
+
+Same as django.db.backends.sqlite3, plus:
+
+- OPTIONS['init_command']: ';'-separated statements (PRAGMAs) run on every
+  new connection.
+- ``begin_mode``: set by students.db.immediate_atomic() so the next
+  transaction starts with BEGIN IMMEDIATE and takes the write lock up front.
+
+Django 5.1 has both built in (OPTIONS 'init_command' and 'transaction_mode');
+this backend can go once the project is on it.
+"""
+
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.begin_mode = None
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        self.init_command = params.pop('init_command', '')
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for statement in self.init_command.split(';'):
+            if statement.strip():
+                conn.execute(statement)
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute(f'BEGIN {self.begin_mode}' if self.begin_mode else 'BEGIN')
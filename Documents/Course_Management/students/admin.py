@@ -6,7 +6,11 @@ from django.urls import reverse
 from django.utils.safestring import mark_safe
 from django.contrib.contenttypes.models import ContentType
 from django.core.exceptions import PermissionDenied
-from .models import Student, Course, Enrollment, FileUpload
+from django.db.models import Count, Q
+from .models import Student, Course, Enrollment, FileUpload, SeatHold, Waitlist
+from .db import immediate_atomic
+from .membership import invalidate_enrollments
+from .waitlist import schedule_promotion
 
 # Customize the admin site header and title
 admin.site.site_header = "Course Management System Administration"
@@ -32,7 +36,8 @@ class UserAdmin(BaseUserAdmin):
     is_student.short_description = 'Is Student'
     
     def get_queryset(self, request):
-        qs = super().get_queryset(request)
+        # is_student follows the reverse one-to-one for every row
+        qs = super().get_queryset(request).select_related('student')
         if request.user.is_superuser:
             return qs
         # Teachers/Admins can only see students and other teachers, not superusers
@@ -103,19 +108,29 @@ class StudentAdmin(admin.ModelAdmin):
         # Teachers/Admins can view student information
         return request.user.is_staff
     
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('user').annotate(
+            active_enrollments=Count('enrollment', filter=Q(enrollment__is_active=True))
+        )
+    
     def get_full_name(self, obj):
         return f"{obj.user.first_name} {obj.user.last_name}" if obj.user.first_name else obj.user.username
     get_full_name.short_description = 'Full Name'
+    get_full_name.admin_order_field = 'user__first_name'
     
     def get_email(self, obj):
         return obj.user.email
     get_email.short_description = 'Email'
+    get_email.admin_order_field = 'user__email'
     
     def enrollment_count(self, obj):
-        count = obj.enrollment_set.filter(is_active=True).count()
+        count = getattr(obj, 'active_enrollments', None)
+        if count is None:
+            count = obj.enrollment_set.filter(is_active=True).count()
         return format_html('<span style="color: {};">{}/5</span>', 
                           'red' if count >= 5 else 'green', count)
     enrollment_count.short_description = 'Enrollments'
+    enrollment_count.admin_order_field = 'active_enrollments'
     
     def get_enrolled_courses(self, obj):
         enrollments = obj.enrollment_set.filter(is_active=True).select_related('course')
@@ -170,7 +185,7 @@ class CourseAdmin(admin.ModelAdmin):
         return request.user.is_staff
     
     def get_queryset(self, request):
-        qs = super().get_queryset(request)
+        qs = super().get_queryset(request).annotate(file_count=Count('fileupload'))
         if request.user.is_superuser:
             return qs
         # Teachers can see all courses, but could be restricted to their own courses
@@ -193,6 +208,7 @@ class CourseAdmin(admin.ModelAdmin):
             color, enrolled, max_students, int(percentage)
         )
     enrollment_status.short_description = 'Enrollment Status'
+    enrollment_status.admin_order_field = 'enrolled_count'
     
     def get_enrolled_students(self, obj):
         enrollments = obj.enrollment_set.filter(is_active=True).select_related('student__user')
@@ -207,9 +223,12 @@ class CourseAdmin(admin.ModelAdmin):
     get_enrolled_students.short_description = 'Enrolled Students'
     
     def get_file_count(self, obj):
-        count = obj.fileupload_set.count()
+        count = getattr(obj, 'file_count', None)
+        if count is None:
+            count = obj.fileupload_set.count()
         return format_html('<span style="font-weight: bold;">{} files</span>', count)
     get_file_count.short_description = 'Uploaded Files'
+    get_file_count.admin_order_field = 'file_count'
 
 @admin.register(Enrollment)
 class EnrollmentAdmin(admin.ModelAdmin):
@@ -219,6 +238,7 @@ class EnrollmentAdmin(admin.ModelAdmin):
                     'student__student_id', 'course__title')
     readonly_fields = ('enrollment_date',)
     list_editable = ('is_active',)
+    list_select_related = ('student__user', 'course')
     date_hierarchy = 'enrollment_date'
     
     def has_add_permission(self, request):
@@ -237,13 +257,47 @@ class EnrollmentAdmin(admin.ModelAdmin):
         # Teachers/Admins can view enrollments
         return request.user.is_staff
     
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        # Student.__str__ shows the username for every choice
+        if db_field.name == 'student':
+            kwargs['queryset'] = Student.objects.select_related('user')
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+    
     def get_student_name(self, obj):
         return obj.student.user.get_full_name() or obj.student.user.username
     get_student_name.short_description = 'Student Name'
+    get_student_name.admin_order_field = 'student__user__first_name'
     
     def get_student_id(self, obj):
         return obj.student.student_id
     get_student_id.short_description = 'Student ID'
+    get_student_id.admin_order_field = 'student__student_id'
+
+@admin.register(Waitlist)
+class WaitlistAdmin(admin.ModelAdmin):
+    list_display = ('course', 'student', 'position', 'joined_at')
+    list_filter = ('course__difficulty',)
+    search_fields = ('student__user__username', 'student__student_id', 'course__title')
+    readonly_fields = ('joined_at',)
+    list_select_related = ('student__user', 'course')
+    ordering = ('course', 'position')
+    
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == 'student':
+            kwargs['queryset'] = Student.objects.select_related('user')
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+@admin.register(SeatHold)
+class SeatHoldAdmin(admin.ModelAdmin):
+    list_display = ('course', 'student', 'created_at', 'expires_at')
+    search_fields = ('student__user__username', 'student__student_id', 'course__title')
+    readonly_fields = ('student', 'course', 'created_at', 'expires_at')
+    list_select_related = ('student__user', 'course')
+    ordering = ('expires_at',)
+    
+    # Holds are placed through students.holds, which checks capacity; here they can only be released
+    def has_add_permission(self, request):
+        return False
 
 @admin.register(FileUpload)
 class FileUploadAdmin(admin.ModelAdmin):
@@ -251,6 +305,7 @@ class FileUploadAdmin(admin.ModelAdmin):
     list_filter = ('timestamp', 'course', 'course__difficulty')
     search_fields = ('title', 'description', 'uploaded_by__username', 'course__title')
     readonly_fields = ('timestamp', 'get_file_size', 'get_file_info')
+    list_select_related = ('uploaded_by', 'course')
     date_hierarchy = 'timestamp'
     
     fieldsets = (
@@ -294,7 +349,9 @@ class FileUploadAdmin(admin.ModelAdmin):
     get_file_name.short_description = 'File Name'
     
     def get_file_size(self, obj):
-        size = obj.get_file_size()
+        if obj.size is None:
+            return "Unknown"
+        size = obj.size
         if size > 1024 * 1024:  # MB
             return f"{size / (1024 * 1024):.1f} MB"
         elif size > 1024:  # KB
@@ -302,23 +359,24 @@ class FileUploadAdmin(admin.ModelAdmin):
         else:
             return f"{size} bytes"
     get_file_size.short_description = 'File Size'
+    get_file_size.admin_order_field = 'size'
     
     def get_file_info(self, obj):
-        try:
-            file_path = obj.file.path
-            import os
-            return format_html(
-                'Path: {}<br>Exists: {}',
-                file_path,
-                'Yes' if os.path.exists(file_path) else 'No'
-            )
-        except:
-            return "File information not available"
+        # Stored metadata only; run backfill_file_metadata for older rows
+        if obj.size is None:
+            return format_html('Path: {}<br>Metadata not recorded yet', obj.file.name)
+        return format_html(
+            'Path: {}<br>Type: {}<br>SHA-256: {}',
+            obj.file.name, obj.content_type, obj.sha256
+        )
     get_file_info.short_description = 'File Details'
 
 # Custom admin actions
 def activate_courses(modeladmin, request, queryset):
-    queryset.update(is_active=True)
+    with immediate_atomic():
+        course_ids = list(queryset.values_list('pk', flat=True))
+        queryset.update(is_active=True)
+        schedule_promotion(course_ids)
 activate_courses.short_description = "Activate selected courses"
 
 def deactivate_courses(modeladmin, request, queryset):
@@ -326,11 +384,19 @@ def deactivate_courses(modeladmin, request, queryset):
 deactivate_courses.short_description = "Deactivate selected courses"
 
 def activate_enrollments(modeladmin, request, queryset):
-    queryset.update(is_active=True)
+    with immediate_atomic():
+        affected = list(queryset.values_list('course_id', 'student_id'))
+        queryset.update(is_active=True)
+        Course.recount_enrollments({course_id for course_id, _ in affected})
+        invalidate_enrollments(student_id for _, student_id in affected)
 activate_enrollments.short_description = "Activate selected enrollments"
 
 def deactivate_enrollments(modeladmin, request, queryset):
-    queryset.update(is_active=False)
+    with immediate_atomic():
+        affected = list(queryset.values_list('course_id', 'student_id'))
+        queryset.update(is_active=False)
+        Course.recount_enrollments({course_id for course_id, _ in affected})
+        invalidate_enrollments(student_id for _, student_id in affected)
 deactivate_enrollments.short_description = "Deactivate selected enrollments"
 
 # Add actions to admin classes
@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class StudentsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'students'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from django.conf import settings
+        if getattr(settings, 'SLOW_QUERY_MS', None) is not None:
+            from . import slowqueries
+            slowqueries.install()
@@ -0,0 +1,48 @@
+"""
+Authentication for async views.
+
+request.user is a lazy object whose first use runs the session and user
+queries, which the async views must not do on the event loop. aget_user()
+resolves it once in a worker thread; afterwards request.user (including in
+templates) is a plain attribute read. Django 5.0 adds request.auser() and an
+async-aware login_required for the same purpose.
+"""
+
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.contrib.auth.middleware import get_user
+from django.contrib.auth.views import redirect_to_login
+
+from .models import Student
+
+
+async def aget_user(request):
+    return await sync_to_async(get_user)(request)
+
+
+async def aget_student(request):
+    """The logged-in user's Student profile, or None."""
+    if not hasattr(request, '_cached_student'):
+        user = await aget_user(request)
+        student = None
+        if user.is_authenticated:
+            student = await Student.objects.filter(user_id=user.pk).afirst()
+            if student is not None:
+                student.user = user
+            # Later hasattr(user, 'student') checks need no query
+            get_user_model().student.related.set_cached_value(user, student)
+        request._cached_student = student
+    return request._cached_student
+
+
+def alogin_required(view):
+    """login_required for async views."""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        user = await aget_user(request)
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return await view(request, *args, **kwargs)
+    return wrapper
@@ -0,0 +1,138 @@
+"""
+Async versions of the catalog and enrollment views, served under ASGI (see
+course_management/asgi.py and course_management/asgi_urls.py). They behave
+exactly like their counterparts in views.py, but wait on the database
+without holding a thread: reads use the async ORM, and what has no async
+interface in Django 4.2 (transactions, the FTS5 raw query, form validation
+queries, the waitlist) runs through sync_to_async.
+
+Everything handed to a template is already evaluated, since templates render
+on the event loop.
+"""
+
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.http import Http404
+from django.shortcuts import redirect, render
+
+from .asyncauth import aget_student, alogin_required
+from .enrollment import EnrollmentError
+from .forms import CourseEnrollmentForm, CourseFilterForm
+from .membership import aenrolled_course_ids
+from .models import Course, Enrollment, FileUpload, Waitlist
+from .pagination import akeyset_page
+from .search import search_courses
+from .views import COURSES_PER_PAGE, waitlisted_message
+from .waitlist import enroll_or_join_waitlist, waitlist_rank
+
+
+async def aget_object_or_404(queryset, **kwargs):
+    if not hasattr(queryset, 'aget'):
+        queryset = queryset._default_manager.all()
+    try:
+        return await queryset.aget(**kwargs)
+    except queryset.model.DoesNotExist:
+        raise Http404(f'No {queryset.model._meta.object_name} matches the given query.')
+
+
+@alogin_required
+async def course_list(request):
+    filter_form = CourseFilterForm(request.GET)
+    courses = filter_form.filter(Course.objects.filter(is_active=True))
+    query = filter_form.cleaned_data.get('q') if filter_form.is_valid() else ''
+    if query:
+        courses = await sync_to_async(search_courses)(query, courses, limit=COURSES_PER_PAGE)
+    else:
+        courses = await akeyset_page(
+            courses,
+            ('title', 'id'),
+            COURSES_PER_PAGE,
+            after=request.GET.get('after'),
+            before=request.GET.get('before'),
+        )
+    student = await aget_student(request)
+    user_enrollments = await aenrolled_course_ids(student) if student else []
+
+    params = request.GET.copy()
+    params.pop('after', None)
+    params.pop('before', None)
+
+    return render(request, 'students/course_list.html', {
+        'courses': courses,
+        'user_enrollments': user_enrollments,
+        'filter_form': filter_form,
+        'filter_query': params.urlencode(),
+        'query': query,
+    })
+
+
+@alogin_required
+async def course_detail(request, course_id):
+    course = await aget_object_or_404(Course, id=course_id)
+    is_enrolled = False
+    files = []
+
+    student = await aget_student(request)
+    if student:
+        is_enrolled = course.id in await aenrolled_course_ids(student)
+
+        if is_enrolled:
+            files = [
+                file async for file in
+                FileUpload.objects.filter(course=course).select_related('uploaded_by').order_by('-timestamp')
+            ]
+
+    return render(request, 'students/course_detail.html', {
+        'course': course,
+        'is_enrolled': is_enrolled,
+        'files': files
+    })
+
+
+@alogin_required
+async def enroll_course(request, course_id):
+    course = await aget_object_or_404(Course, id=course_id)
+
+    student = await aget_student(request)
+    if not student:
+        messages.error(request, 'Only students can enroll in courses.')
+        return redirect('course_list')
+
+    if request.method == 'POST':
+        form = CourseEnrollmentForm(request.POST, student=student, course=course)
+        if await sync_to_async(form.is_valid)():
+            try:
+                result = await sync_to_async(enroll_or_join_waitlist)(student, course)
+            except EnrollmentError as e:
+                form.add_error(None, str(e))
+            else:
+                if isinstance(result, Waitlist):
+                    rank = await sync_to_async(waitlist_rank)(result)
+                    messages.info(request, waitlisted_message(course, rank))
+                else:
+                    messages.success(request, f'Successfully enrolled in {course.title}!')
+                return redirect('course_detail', course_id=course.id)
+    else:
+        form = CourseEnrollmentForm(student=student, course=course)
+
+    return render(request, 'students/enroll_course.html', {
+        'form': form,
+        'course': course
+    })
+
+
+@alogin_required
+async def my_courses(request):
+    student = await aget_student(request)
+    if not student:
+        messages.error(request, 'Only students can view enrolled courses.')
+        return redirect('course_list')
+
+    enrollments = [
+        enrollment async for enrollment in
+        Enrollment.objects.filter(student=student, is_active=True).select_related('course')
+    ]
+
+    return render(request, 'students/my_courses.html', {
+        'enrollments': enrollments
+    })
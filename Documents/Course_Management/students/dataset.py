@@ -0,0 +1,232 @@
+"""
+Seeded synthetic data for load and capacity testing.
+
+Course popularity follows a Zipf distribution, so the most popular courses
+fill up and later students are turned away to less popular ones, the way
+real enrollment waves behave. Each student takes 0-5 courses; a fraction of
+enrollments are inactive (they still hold their seat, as in production).
+Everything is written with bulk_create, and the denormalized counters are
+set from the generator's own tallies rather than recounted afterwards.
+
+The same seed and sizes always produce the same rows. Course dates are
+drawn around a fixed epoch (DEFAULT_EPOCH) and every timestamp is its
+midnight; pass epoch=date.today() for a catalog whose courses are current.
+"""
+
+import bisect
+import hashlib
+import os
+import random
+from datetime import date, datetime, time, timedelta
+from itertools import accumulate
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import MAX_COURSES_PER_STUDENT, Blob, Course, Enrollment, FileUpload, Student, guess_content_type
+from .storage import blob_name
+
+DEFAULT_EPOCH = date(2025, 9, 1)
+
+SUBJECTS = (
+    'Python', 'Django', 'Data Science', 'Machine Learning', 'Web Development', 'Databases',
+    'SQL', 'Security', 'Cloud Computing', 'Mobile Apps', 'Networks', 'Algorithms',
+    'Statistics', 'Calculus', 'Physics', 'Chemistry', 'Biology', 'History', 'Economics',
+    'Marketing', 'Finance', 'Ethics', 'Robotics', 'Graphics', 'Compilers', 'Operating Systems',
+)
+LEVELS = ('Introduction to', 'Fundamentals of', 'Applied', 'Advanced', 'Topics in', 'Practical')
+NAMES = (
+    'Johnson', 'Chen', 'Wilson', 'Davis', 'Anderson', 'Taylor', 'Martinez', 'Lee', 'Garcia',
+    'Brown', 'Nguyen', 'Okafor', 'Kowalski', 'Haddad', 'Silva', 'Tanaka', 'Smith', 'Khan',
+)
+FILE_EXTENSIONS = ('.pdf', '.pdf', '.pptx', '.mp4', '.zip', '.docx')
+# Weights for taking 0, 1, ... MAX_COURSES_PER_STUDENT courses (mean ~2.7)
+COURSE_LOAD_WEIGHTS = (5, 15, 25, 25, 20, 10)
+
+
+class DatasetGenerator:
+    def __init__(self, students, courses, files=0, seed=0, prefix='load', inactive_rate=0.1,
+                 zipf=1.0, file_size=0, write_media=True, batch_size=5000, password='password123',
+                 epoch=DEFAULT_EPOCH):
+        self.rng = random.Random(seed)
+        self.epoch = epoch
+        self.created_at = timezone.make_aware(datetime.combine(self.epoch, time.min))
+        self.num_students = students
+        self.num_courses = courses
+        self.num_files = files
+        self.prefix = prefix
+        self.inactive_rate = inactive_rate
+        self.zipf = zipf
+        self.file_size = file_size
+        self.write_media = write_media
+        self.batch_size = batch_size
+        self.password = password
+        self.enrollments = 0
+
+    def run(self):
+        # One hash shared by every generated account keeps generation fast
+        self.password_hash = make_password(self.password)
+        self.file_sha256 = zeros_sha256(self.file_size)
+        self.create_courses()
+        self.create_teachers()
+        for start in range(0, self.num_students, self.batch_size):
+            with transaction.atomic():
+                self.create_students(start, min(self.num_students, start + self.batch_size))
+        self.save_course_counters()
+        for start in range(0, self.num_files, self.batch_size):
+            with transaction.atomic():
+                self.create_files(start, min(self.num_files, start + self.batch_size))
+        return self
+
+    @property
+    def full_courses(self):
+        return sum(1 for course, seats in zip(self.courses, self.seats) if course.is_active and not seats)
+
+    def create_courses(self):
+        rng = self.rng
+        courses = []
+        for i in range(self.num_courses):
+            start = self.epoch + timedelta(days=rng.randint(-60, 180))
+            courses.append(Course(
+                title=f'{rng.choice(LEVELS)} {rng.choice(SUBJECTS)} {i + 1}',
+                description=f'{rng.choice(SUBJECTS)} and {rng.choice(SUBJECTS).lower()} for '
+                            f'{rng.choice(["beginners", "practitioners", "researchers"])}.',
+                instructor=f'Dr. {rng.choice(NAMES)}',
+                credits=rng.randint(1, 5),
+                difficulty=rng.choice(['beginner', 'intermediate', 'advanced']),
+                max_students=rng.choice([15, 20, 25, 30, 40, 60, 120]),
+                start_date=start,
+                end_date=start + timedelta(days=rng.choice([60, 90, 120])),
+                is_active=rng.random() >= 0.05,
+            ))
+        self.courses = Course.objects.bulk_create(courses, batch_size=self.batch_size)
+        self.seats = [course.max_students if course.is_active else 0 for course in self.courses]
+        self.active_counts = [0] * len(self.courses)
+
+        # Popularity rank is independent of creation order
+        ranks = list(range(len(self.courses)))
+        rng.shuffle(ranks)
+        self.popularity = [1 / (rank + 1) ** self.zipf for rank in ranks]
+        self.cum_popularity = list(accumulate(self.popularity))
+        self.rebuild_weights()
+
+    def rebuild_weights(self):
+        self.rejected = 0
+        self.cum_weights = list(accumulate(
+            weight if seats else 0 for weight, seats in zip(self.popularity, self.seats)
+        ))
+
+    def pick_courses(self, count):
+        """Up to ``count`` distinct courses with free seats, drawn by popularity."""
+        picked = []
+        for _ in range(count * 20):
+            if len(picked) == count or not self.cum_weights[-1]:
+                break
+            index = bisect.bisect_right(self.cum_weights, self.rng.random() * self.cum_weights[-1])
+            if index in picked:
+                continue
+            if not self.seats[index]:
+                self.rejected += 1
+                if self.rejected > 20:
+                    # Drawing full courses too often: drop them from the distribution
+                    self.rebuild_weights()
+                continue
+            self.seats[index] -= 1
+            picked.append(index)
+        return picked
+
+    def create_users(self, usernames, is_staff=False):
+        return User.objects.bulk_create([
+            User(username=username, email=f'{username}@example.com', password=self.password_hash,
+                 first_name=self.rng.choice(NAMES), last_name=self.rng.choice(NAMES), is_staff=is_staff,
+                 date_joined=self.created_at)
+            for username in usernames
+        ], batch_size=self.batch_size)
+
+    def create_teachers(self):
+        count = max(1, self.num_courses // 50)
+        self.teachers = self.create_users([f'{self.prefix}-teacher{i}' for i in range(count)], is_staff=True)
+
+    def create_students(self, start, stop):
+        rng = self.rng
+        users = self.create_users(f'{self.prefix}{i}' for i in range(start, stop))
+        loads = rng.choices(range(MAX_COURSES_PER_STUDENT + 1), COURSE_LOAD_WEIGHTS, k=len(users))
+        choices = [self.pick_courses(load) for load in loads]
+        students = Student.objects.bulk_create([
+            Student(user_id=user.pk, student_id=f'{self.prefix.upper()}{i}', course_count=len(picked))
+            for i, user, picked in zip(range(start, stop), users, choices)
+        ], batch_size=self.batch_size)
+
+        enrolled_at = connection.ops.adapt_datetimefield_value(self.created_at)
+        enrollments = []
+        for student, picked in zip(students, choices):
+            for index in picked:
+                is_active = rng.random() >= self.inactive_rate
+                self.active_counts[index] += is_active
+                enrollments.append((student.pk, self.courses[index].pk, enrolled_at, is_active))
+        # Enrollment is the largest table; skipping model instances here
+        # roughly halves generation time
+        insert_rows(Enrollment, ['student', 'course', 'enrollment_date', 'is_active'], enrollments)
+        self.enrollments += len(enrollments)
+
+    def save_course_counters(self):
+        for course, seats, active in zip(self.courses, self.seats, self.active_counts):
+            course.enrolled_count = course.max_students - seats if course.is_active else 0
+            course.active_enrolled_count = active
+        Course.objects.bulk_update(self.courses, ['enrolled_count', 'active_enrolled_count'],
+                                   batch_size=self.batch_size)
+
+    def create_files(self, start, stop):
+        rng = self.rng
+        uploads = []
+        # Every generated file holds the same zeros, so they share one blob
+        name = blob_name(self.file_sha256)
+        path = os.path.join(settings.MEDIA_ROOT, name)
+        if self.write_media and not os.path.exists(path):
+            write_sparse_file(path, self.file_size)
+        for i in range(start, stop):
+            # Popular courses get more material, full or not
+            course = rng.choices(self.courses, cum_weights=self.cum_popularity)[0]
+            filename = f'{self.prefix}-{i}{rng.choice(FILE_EXTENSIONS)}'
+            uploads.append(FileUpload(
+                uploaded_by_id=rng.choice(self.teachers).pk,
+                course_id=course.pk,
+                title=f'Lecture {i + 1}',
+                file=name,
+                filename=filename,
+                size=self.file_size,
+                content_type=guess_content_type(filename),
+                sha256=self.file_sha256,
+            ))
+        uploads = FileUpload.objects.bulk_create(uploads, batch_size=self.batch_size)
+        # auto_now_add stamps bulk_create() rows with the current time
+        FileUpload.objects.filter(pk__in=[upload.pk for upload in uploads]).update(timestamp=self.created_at)
+        Blob.acquire(self.file_sha256, self.file_size, count=len(uploads))
+
+
+def insert_rows(model, field_names, rows):
+    """executemany() INSERT of already-adapted values into ``model``'s table."""
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(model._meta.get_field(name).column) for name in field_names)
+    placeholders = ', '.join(['%s'] * len(field_names))
+    with connection.cursor() as cursor:
+        cursor.executemany(f'INSERT INTO {quote(model._meta.db_table)} ({columns}) VALUES ({placeholders})', rows)
+
+
+def write_sparse_file(path, size):
+    """Create ``path`` holding ``size`` zero bytes without writing them."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.truncate(size)
+
+
+def zeros_sha256(size, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    chunk = bytes(chunk_size)
+    while size > 0:
+        digest.update(chunk[:min(size, chunk_size)])
+        size -= chunk_size
+    return digest.hexdigest()
@@ -0,0 +1,28 @@
+"""
+Transaction helpers.
+"""
+
+from contextlib import contextmanager
+
+from django.db import transaction
+
+
+@contextmanager
+def immediate_atomic(using=None):
+    """
+    transaction.atomic() that, as the outermost block on the project's SQLite
+    backend, starts with BEGIN IMMEDIATE. The write lock is then taken at the
+    start, where busy_timeout waits for it, rather than at the first write,
+    where a transaction that has already read fails at once with "database
+    is locked". Nested blocks and other backends get a plain atomic().
+    """
+    connection = transaction.get_connection(using)
+    immediate = hasattr(connection, 'begin_mode') and not connection.in_atomic_block
+    if immediate:
+        connection.begin_mode = 'IMMEDIATE'
+    try:
+        with transaction.atomic(using=using):
+            yield
+    finally:
+        if immediate:
+            connection.begin_mode = None
@@ -0,0 +1,140 @@
+"""
+Streaming file responses for FileUpload downloads.
+
+Files are streamed in fixed-size chunks with single-range (206) support and
+ETag/Last-Modified validators. With FILE_DOWNLOAD_BACKEND set to 'nginx' or
+'apache' the view only does the permission check and hands the transfer to
+the front-end server through X-Accel-Redirect or X-Sendfile.
+"""
+
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe
+
+from .models import guess_content_type
+
+CHUNK_SIZE = 64 * 1024
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def serve_file(request, file_upload):
+    backend = getattr(settings, 'FILE_DOWNLOAD_BACKEND', 'django')
+    if backend == 'nginx':
+        return _offload_response(file_upload, 'X-Accel-Redirect', _accel_path(file_upload))
+    if backend == 'apache':
+        return _offload_response(file_upload, 'X-Sendfile', file_upload.file.path)
+    return _streaming_response(request, file_upload)
+
+
+def _accel_path(file_upload):
+    prefix = getattr(settings, 'FILE_DOWNLOAD_ACCEL_PREFIX', '/protected-media/')
+    return prefix.rstrip('/') + '/' + quote(file_upload.file.name)
+
+
+def _content_type(file_upload):
+    return file_upload.content_type or guess_content_type(file_upload.get_file_name())
+
+
+def _offload_response(file_upload, header, value):
+    # The front-end server sets Content-Length, ranges and validators itself
+    response = HttpResponse(content_type=_content_type(file_upload))
+    response[header] = value
+    response['Content-Disposition'] = content_disposition_header(True, file_upload.get_file_name())
+    return response
+
+
+def _streaming_response(request, file_upload):
+    storage = file_upload.file.storage
+    name = file_upload.file.name
+    if file_upload.size is not None and file_upload.sha256:
+        # Stored at upload time; no storage round-trips before the transfer
+        size = file_upload.size
+        last_modified = int(file_upload.timestamp.timestamp())
+        etag = f'"{file_upload.sha256}"'
+    else:
+        size = storage.size(name)
+        last_modified = int(storage.get_modified_time(name).timestamp())
+        etag = f'"{last_modified:x}-{size:x}"'
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        return response
+
+    byte_range = _requested_range(request, size, etag, last_modified)
+    if byte_range == 'unsatisfiable':
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    start, end = byte_range or (0, size - 1)
+    length = end - start + 1
+    response = StreamingHttpResponse(
+        _file_iterator(storage.open(name, 'rb'), start, length),
+        status=206 if byte_range else 200,
+        content_type=_content_type(file_upload),
+    )
+    if byte_range:
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Content-Length'] = str(length)
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Content-Disposition'] = content_disposition_header(True, file_upload.get_file_name())
+    return response
+
+
+def _requested_range(request, size, etag, last_modified):
+    """
+    Return (start, end) for a satisfiable single byte range, None to serve
+    the whole file, or 'unsatisfiable'. Multi-range requests get the whole
+    file, which RFC 9110 allows.
+    """
+    header = request.META.get('HTTP_RANGE', '').strip()
+    if not header:
+        return None
+
+    if_range = request.META.get('HTTP_IF_RANGE', '').strip()
+    if if_range:
+        if if_range.startswith(('"', 'W/')):
+            if if_range != etag:
+                return None
+        elif parse_http_date_safe(if_range) != last_modified:
+            return None
+
+    match = RANGE_RE.match(header)
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+
+    if not first:
+        # Suffix range: the final N bytes
+        suffix = int(last)
+        if suffix == 0 or size == 0:
+            return 'unsatisfiable'
+        return max(size - suffix, 0), size - 1
+
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        return 'unsatisfiable'
+    return start, min(end, size - 1)
+
+
+def _file_iterator(f, start, length):
+    try:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        f.close()
@@ -0,0 +1,94 @@
+"""
+Race-free enrollment.
+
+A seat is claimed with a single conditional UPDATE on the Course counters
+(``enrolled_count + held_count < max_students``, so seat holds count; see
+students/holds.py), followed by the same kind of UPDATE on the
+Student counter (``course_count < MAX_COURSES_PER_STUDENT``) and the Enrollment
+INSERT, all in one transaction. There is no read between the check and the
+write, so concurrent requests cannot oversubscribe a course or a student.
+The transaction begins IMMEDIATE, so it queues for SQLite's write lock
+instead of failing over to the retry loop below.
+"""
+
+import random
+import time
+
+from django.db import IntegrityError, OperationalError
+from django.db.models import F
+
+from .db import immediate_atomic
+from .models import MAX_COURSES_PER_STUDENT, Course, Enrollment, SeatHold, Student
+
+# SQLite reports write contention as "database is locked"/"table is locked";
+# those transactions rolled back cleanly and are safe to retry.
+LOCK_RETRIES = 50
+LOCK_BACKOFF = 0.005
+
+
+class EnrollmentError(Exception):
+    pass
+
+
+class CourseFullError(EnrollmentError):
+    """The course is active but has no free seat; see students.waitlist."""
+
+
+def enroll_student(student, course):
+    """Enroll ``student`` in ``course`` or raise EnrollmentError."""
+    return retry_locked(_enroll, student, course)
+
+
+def retry_locked(func, *args):
+    """Call ``func(*args)``, an immediate_atomic() block, retrying while the database is locked."""
+    for attempt in range(LOCK_RETRIES):
+        try:
+            return func(*args)
+        except OperationalError as e:
+            if 'locked' not in str(e) or attempt == LOCK_RETRIES - 1:
+                raise
+            time.sleep(LOCK_BACKOFF * random.uniform(1, 2 ** min(attempt, 6)))
+
+
+def claim_seat(course, held=0):
+    """
+    Take a free seat in ``course`` as an enrollment (held=0) or a hold
+    (held=1). Seats under expired holds are swept and retried once. Returns
+    whether a seat was claimed; call inside the transaction that uses it.
+    """
+    for attempt in range(2):
+        claimed = Course.objects.filter(
+            pk=course.pk, is_active=True, enrolled_count__lt=F('max_students') - F('held_count')
+        ).update(
+            enrolled_count=F('enrolled_count') + 1 - held,
+            active_enrolled_count=F('active_enrolled_count') + 1 - held,
+            held_count=F('held_count') + held,
+        )
+        if claimed or not SeatHold.release_expired([course.pk]):
+            return bool(claimed)
+    return False
+
+
+def _enroll(student, course):
+    try:
+        with immediate_atomic():
+            # Lock order is always course row, then student row
+            if not claim_seat(course):
+                if Course.objects.filter(pk=course.pk, is_active=True).exists():
+                    raise CourseFullError("This course is full or inactive.")
+                raise EnrollmentError("This course is full or inactive.")
+
+            claimed = Student.objects.filter(
+                pk=student.pk, course_count__lt=MAX_COURSES_PER_STUDENT
+            ).update(course_count=F('course_count') + 1)
+            if not claimed:
+                raise EnrollmentError(
+                    f"You have reached the maximum number of courses ({MAX_COURSES_PER_STUDENT})."
+                )
+
+            enrollment = Enrollment(student=student, course=course)
+            enrollment._counters_applied = True
+            enrollment.save()
+    except IntegrityError:
+        raise EnrollmentError("You are already enrolled in this course.")
+    return enrollment
@@ -1,7 +1,7 @@
 from django import forms
-from django.contrib.auth.forms import UserCreationForm
+from django.contrib.auth.forms import SetPasswordForm, UserCreationForm
 from django.contrib.auth.models import User, Group
-from .models import Student, Enrollment, FileUpload
+from .models import MAX_COURSES_PER_STUDENT, Student, Course, Enrollment, FileUpload
 
 class StudentRegistrationForm(UserCreationForm):
     email = forms.EmailField(required=True)
@@ -50,16 +50,48 @@ class CourseEnrollmentForm(forms.ModelForm):
         super().__init__(*args, **kwargs)
     
     def clean(self):
+        # Early feedback only; enroll_student() re-checks the limits atomically
         cleaned_data = super().clean()
         if self.student and self.course:
             if not self.student.can_enroll_more_courses():
-                raise forms.ValidationError("You have reached the maximum number of courses (5).")
-            if not self.course.can_enroll():
+                raise forms.ValidationError(f"You have reached the maximum number of courses ({MAX_COURSES_PER_STUDENT}).")
+            # A full course is left to the view, which waitlists the student
+            if not self.course.is_active:
                 raise forms.ValidationError("This course is full or inactive.")
             if Enrollment.objects.filter(student=self.student, course=self.course).exists():
                 raise forms.ValidationError("You are already enrolled in this course.")
         return cleaned_data
 
+class CourseFilterForm(forms.Form):
+    q = forms.CharField(max_length=200, required=False,
+                        widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Search courses', 'type': 'search'}))
+    difficulty = forms.ChoiceField(
+        choices=[('', 'Any level')] + Course.DIFFICULTY_CHOICES, required=False,
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+    instructor = forms.CharField(max_length=100, required=False,
+                                 widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Instructor'}))
+    credits = forms.IntegerField(min_value=0, required=False,
+                                 widget=forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'Credits'}))
+    starts_after = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}))
+    ends_before = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}))
+    
+    def filter(self, queryset):
+        if not self.is_valid():
+            return queryset
+        data = self.cleaned_data
+        if data['difficulty']:
+            queryset = queryset.filter(difficulty=data['difficulty'])
+        if data['instructor']:
+            queryset = queryset.filter(instructor=data['instructor'])
+        if data['credits'] is not None:
+            queryset = queryset.filter(credits=data['credits'])
+        if data['starts_after']:
+            queryset = queryset.filter(start_date__gte=data['starts_after'])
+        if data['ends_before']:
+            queryset = queryset.filter(end_date__lte=data['ends_before'])
+        return queryset
+
 class FileUploadForm(forms.ModelForm):
     class Meta:
         model = FileUpload
@@ -109,3 +141,10 @@ class AdminRegistrationForm(UserCreationForm):
             except Group.DoesNotExist:
                 pass  # Group doesn't exist, skip
         return user
+
+class AccountActivationForm(SetPasswordForm):
+    """First password for accounts provisioned with a forced reset."""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for field in self.fields.values():
+            field.widget.attrs['class'] = 'form-control'
@@ -0,0 +1,141 @@
+"""
+Time-boxed seat holds.
+
+place_hold() sets a seat aside for a student for SEAT_HOLD_SECONDS while
+they check out, and confirm_hold() turns it into an Enrollment. A held seat
+counts against max_students exactly like an enrolled one: it is claimed with
+the same conditional UPDATE as enroll_student() (see students.enrollment),
+adding to Course.held_count instead of enrolled_count. Confirming moves the
+seat from held_count to enrolled_count in one UPDATE, so there is no moment
+at which it is free for somebody else.
+
+Expired holds need no cron job. They are swept lazily, by any claim or
+promotion that finds the course full, and, so waitlisted students do not wait
+for the next claim, by the `expire_holds --interval` worker. A hold that is
+released or swept gives its seat to the waitlist (students.waitlist).
+
+Live holds count towards the per-student course limit, so nobody can hold
+a seat in every course at once during a registration rush; the limit is
+enforced again when a hold is confirmed.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError
+from django.db.models import F
+from django.utils import timezone
+
+from .db import immediate_atomic
+from .enrollment import CourseFullError, EnrollmentError, claim_seat, retry_locked
+from .models import MAX_COURSES_PER_STUDENT, Course, Enrollment, SeatHold, Student
+
+
+def place_hold(student, course):
+    """Hold a seat in ``course`` for ``student`` and return the SeatHold, or raise EnrollmentError."""
+    return retry_locked(_place_hold, student, course)
+
+
+def _place_hold(student, course):
+    now = timezone.now()
+    try:
+        with immediate_atomic():
+            if Enrollment.objects.filter(student=student, course=course).exists():
+                raise EnrollmentError("You are already enrolled in this course.")
+            # The student's own lapsed hold would block the new one
+            SeatHold.objects.filter(student=student, course=course, expires_at__lte=now).delete()
+            if SeatHold.objects.filter(student=student, course=course).exists():
+                raise EnrollmentError("You already hold a seat in this course.")
+            course_count = Student.objects.filter(pk=student.pk).values_list('course_count', flat=True).get()
+            live_holds = SeatHold.objects.filter(student=student, expires_at__gt=now).count()
+            if course_count + live_holds >= MAX_COURSES_PER_STUDENT:
+                raise EnrollmentError(
+                    f"You have reached the maximum number of courses ({MAX_COURSES_PER_STUDENT})."
+                )
+
+            if not claim_seat(course, held=1):
+                if Course.objects.filter(pk=course.pk, is_active=True).exists():
+                    raise CourseFullError("This course is full or inactive.")
+                raise EnrollmentError("This course is full or inactive.")
+
+            hold = SeatHold(
+                student=student, course=course,
+                expires_at=now + timedelta(seconds=settings.SEAT_HOLD_SECONDS),
+            )
+            hold._counters_applied = True
+            hold.save()
+    except IntegrityError:
+        raise EnrollmentError("You already hold a seat in this course.")
+    return hold
+
+
+def confirm_hold(hold):
+    """Turn a live ``hold`` into an Enrollment and return it, or raise EnrollmentError."""
+    return retry_locked(_confirm_hold, hold)
+
+
+def _confirm_hold(hold):
+    try:
+        with immediate_atomic():
+            live = SeatHold.objects.select_for_update().filter(
+                pk=hold.pk, expires_at__gt=timezone.now()
+            ).first()
+            if live is None:
+                raise EnrollmentError("Your seat hold has expired.")
+
+            # The held seat becomes an enrolled one; no other claim can see it free
+            moved = Course.objects.filter(pk=live.course_id, is_active=True, held_count__gt=0).update(
+                held_count=F('held_count') - 1,
+                enrolled_count=F('enrolled_count') + 1,
+                active_enrolled_count=F('active_enrolled_count') + 1,
+            )
+            if not moved:
+                raise EnrollmentError("This course is full or inactive.")
+
+            claimed = Student.objects.filter(
+                pk=live.student_id, course_count__lt=MAX_COURSES_PER_STUDENT
+            ).update(course_count=F('course_count') + 1)
+            if not claimed:
+                raise EnrollmentError(
+                    f"You have reached the maximum number of courses ({MAX_COURSES_PER_STUDENT})."
+                )
+
+            live._converted = True
+            live.delete()
+            enrollment = Enrollment(student_id=live.student_id, course_id=live.course_id)
+            enrollment._counters_applied = True
+            enrollment.save()
+    except IntegrityError:
+        raise EnrollmentError("You are already enrolled in this course.")
+    return enrollment
+
+
+def release_hold(hold):
+    """Give up ``hold``'s seat; returns False if it was already gone."""
+    return retry_locked(_release_hold, hold)
+
+
+def _release_hold(hold):
+    with immediate_atomic():
+        deleted, _ = SeatHold.objects.filter(pk=hold.pk).delete()
+    return bool(deleted)
+
+
+def expire_holds():
+    """Sweep every expired hold, one course per transaction; returns how many were released."""
+    released = 0
+    while True:
+        swept = retry_locked(_expire_next_course)
+        if swept is None:
+            return released
+        released += swept
+
+
+def _expire_next_course():
+    with immediate_atomic():
+        course_id = SeatHold.objects.filter(expires_at__lte=timezone.now()).values_list(
+            'course_id', flat=True
+        ).order_by('expires_at').first()
+        if course_id is None:
+            return None
+        return SeatHold.release_expired([course_id])
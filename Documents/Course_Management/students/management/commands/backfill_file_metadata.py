@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from students.models import FileUpload, file_sha256, guess_content_type
+
+class Command(BaseCommand):
+    help = 'Record size, content type and SHA-256 for FileUploads saved before they were tracked'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--all', action='store_true', help='Recompute metadata for every file, not just missing ones')
+
+    def handle(self, *args, **options):
+        uploads = FileUpload.objects.only('id', 'file', 'filename')
+        if not options['all']:
+            uploads = uploads.filter(size__isnull=True)
+        
+        updated, missing, batch = 0, 0, []
+        for upload in uploads.iterator(chunk_size=options['batch_size']):
+            try:
+                with upload.file.open('rb'):
+                    upload.sha256 = file_sha256(upload.file)
+                upload.size = upload.file.size
+            except OSError:
+                missing += 1
+                self.stdout.write(self.style.WARNING(f'File missing for upload {upload.pk}: {upload.file.name}'))
+                continue
+            upload.content_type = guess_content_type(upload.get_file_name())
+            batch.append(upload)
+            if len(batch) >= options['batch_size']:
+                updated += self.flush(batch)
+        updated += self.flush(batch)
+        
+        self.stdout.write(self.style.SUCCESS(
+            f'Recorded metadata for {updated} files ({missing} missing from storage)'
+        ))
+
+    def flush(self, batch):
+        FileUpload.objects.bulk_update(batch, ['size', 'content_type', 'sha256'])
+        count = len(batch)
+        batch.clear()
+        return count
@@ -0,0 +1,39 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from students.models import UploadSession
+from students.uploads import discard_session, session_dir
+
+class Command(BaseCommand):
+    help = 'Delete abandoned resumable upload sessions and their part files'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-age-hours', type=float,
+            default=getattr(settings, 'UPLOAD_SESSION_MAX_AGE_HOURS', 24),
+            help='Remove sessions with no chunk received for this long',
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options['max_age_hours'])
+        
+        removed = 0
+        for session in UploadSession.objects.filter(updated_at__lt=cutoff).iterator():
+            discard_session(session)
+            removed += 1
+        
+        # Part files whose session row is already gone; the age check keeps
+        # sessions started during this run safe
+        orphans = 0
+        directory = session_dir()
+        if directory.is_dir():
+            live = {str(pk) for pk in UploadSession.objects.values_list('pk', flat=True)}
+            for part in directory.glob('*.part'):
+                if part.stem not in live and part.stat().st_mtime < cutoff.timestamp():
+                    part.unlink(missing_ok=True)
+                    orphans += 1
+        
+        self.stdout.write(self.style.SUCCESS(
+            f'Removed {removed} abandoned upload sessions and {orphans} orphaned part files'
+        ))
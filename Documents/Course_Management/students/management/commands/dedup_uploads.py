@@ -0,0 +1,77 @@
+import os
+import shutil
+
+from django.core.management.base import BaseCommand
+from students.db import immediate_atomic
+from students.models import Blob, FileUpload, file_sha256
+from students.storage import BLOB_DIR, blob_name
+
+class Command(BaseCommand):
+    help = 'Move FileUploads saved under their own names (media/uploads) into content-addressed blobs, storing duplicates once'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--dry-run', action='store_true', help='Report what would be moved and freed without changing anything')
+
+    def handle(self, *args, **options):
+        uploads = FileUpload.objects.exclude(file__startswith=f'{BLOB_DIR}/').only('id', 'file', 'filename')
+        storage = FileUpload._meta.get_field('file').storage
+        dry_run = options['dry_run']
+
+        moved, duplicates, missing, freed, seen = 0, 0, 0, 0, set()
+        for upload in uploads.iterator(chunk_size=options['batch_size']):
+            old = upload.file.name
+            try:
+                with upload.file.open('rb'):
+                    sha256 = file_sha256(upload.file)
+                size = upload.file.size
+            except OSError:
+                missing += 1
+                self.stdout.write(self.style.WARNING(f'File missing for upload {upload.pk}: {old}'))
+                continue
+            name = blob_name(sha256)
+
+            if dry_run:
+                stored = sha256 in seen or storage.exists(name)
+                seen.add(sha256)
+            else:
+                with immediate_atomic():
+                    Blob.acquire(sha256, size)
+                    stored = storage.exists(name)
+                    if not stored:
+                        link_or_copy(storage.path(old), storage.path(name))
+                    FileUpload.objects.filter(pk=upload.pk).update(
+                        file=name, filename=upload.filename or os.path.basename(old), size=size, sha256=sha256,
+                    )
+                # Only once nothing points at it; a crash before this leaves a stray copy, never a missing file
+                if not FileUpload.objects.filter(file=old).exists():
+                    os.remove(storage.path(old))
+            if stored:
+                duplicates += 1
+                freed += size
+            else:
+                moved += 1
+
+        if not dry_run:
+            remove_empty_dirs(storage.path('uploads'))
+        self.stdout.write(self.style.SUCCESS(
+            f'{"Would move" if dry_run else "Moved"} {moved} files into blobs and '
+            f'{"drop" if dry_run else "dropped"} {duplicates} duplicates ({freed} bytes freed, '
+            f'{missing} missing from storage)'
+        ))
+
+
+def link_or_copy(source, target):
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    try:
+        os.link(source, target)
+    except OSError:
+        # Another filesystem, or no hard links. Never leave a partial blob
+        shutil.copyfile(source, target + '.part')
+        os.replace(target + '.part', target)
+
+
+def remove_empty_dirs(root):
+    for dirpath, dirnames, filenames in os.walk(root, topdown=False):
+        if not os.listdir(dirpath):
+            os.rmdir(dirpath)
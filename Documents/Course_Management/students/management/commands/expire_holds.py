@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+from students.holds import expire_holds
+
+class Command(BaseCommand):
+    help = 'Release expired seat holds and promote the waitlists of their courses'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Keep sweeping every this many seconds instead of once')
+
+    def handle(self, *args, **options):
+        while True:
+            released = expire_holds()
+            if released or not options['interval']:
+                self.stdout.write(f'Released {released} expired seat hold(s)')
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,41 @@
+import csv
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from students.roster import FORMATS, RosterImporter, read_rows
+
+class Command(BaseCommand):
+    help = 'Import students and enrollments from a CSV or JSON Lines roster'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Roster file (.csv or .jsonl)')
+        parser.add_argument('--format', choices=FORMATS, help='Defaults to the file extension')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Rows per transaction')
+        parser.add_argument('--errors', help='Where to write rejected rows (default: <path>.errors.csv)')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+        if not os.path.exists(path):
+            raise CommandError(f'{path} does not exist')
+
+        importer = RosterImporter(chunk_size=options['chunk_size'])
+        started = time.perf_counter()
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            importer.run(read_rows(f, fmt))
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {importer.rows} rows in {elapsed:.1f}s ({importer.rows / max(elapsed, 1e-6):.0f} rows/s): '
+            f'{importer.users_created} users, {importer.students_created} students, '
+            f'{importer.enrollments_created} enrollments'
+        ))
+
+        if importer.errors:
+            errors_path = options['errors'] or f'{path}.errors.csv'
+            with open(errors_path, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                writer.writerow(['line', 'student_id', 'error'])
+                writer.writerows(importer.errors)
+            self.stdout.write(self.style.WARNING(f'{len(importer.errors)} rows rejected; see {errors_path}'))
@@ -0,0 +1,52 @@
+import csv
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from students.provisioning import activation_path, provision_students
+from students.roster import FORMATS, read_rows
+
+class Command(BaseCommand):
+    help = 'Create student accounts in bulk, hashing passwords across a process pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Accounts file (.csv or .jsonl) with username, password, student_id, ...')
+        parser.add_argument('--format', choices=FORMATS, help='Defaults to the file extension')
+        parser.add_argument('--workers', type=int, help='Hashing processes (default: one per CPU)')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--force-reset', action='store_true',
+                            help='Skip hashing; students set a password through an activation link')
+        parser.add_argument('--links', help='Where to write activation links (default: <path>.links.csv)')
+        parser.add_argument('--base-url', default='', help='Prefix for activation links, e.g. https://courses.example.com')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+        if not os.path.exists(path):
+            raise CommandError(f'{path} does not exist')
+
+        started = time.perf_counter()
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            result = provision_students(
+                (row for _, row in read_rows(f, fmt) if '_error' not in row),
+                workers=options['workers'],
+                batch_size=options['batch_size'],
+                force_reset=options['force_reset'],
+            )
+        elapsed = time.perf_counter() - started
+
+        created = len(result.users)
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {created} students in {elapsed:.1f}s ({created / max(elapsed, 1e-6):.1f} accounts/s)'
+        ))
+        for username, error in result.errors:
+            self.stdout.write(self.style.WARNING(f'Skipped {username or "<blank>"}: {error}'))
+
+        if options['force_reset'] and result.users:
+            links_path = options['links'] or f'{path}.links.csv'
+            with open(links_path, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                writer.writerow(['username', 'email', 'activation_url'])
+                for user in result.users:
+                    writer.writerow([user.username, user.email, options['base_url'] + activation_path(user)])
+            self.stdout.write(f'Activation links written to {links_path}')
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from students.models import Course
+from students.search import fts_available, install_search_index, rebuild_search_index
+
+class Command(BaseCommand):
+    help = 'Recreate the course full-text search index from the Course table'
+
+    def handle(self, *args, **options):
+        if not fts_available():
+            raise CommandError(f'Full-text search needs SQLite FTS5; {connection.vendor} uses icontains search.')
+        
+        install_search_index()
+        rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt the search index for {Course.objects.count()} courses'
+        ))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from students.models import Course, Student
+
+class Command(BaseCommand):
+    help = 'Recompute the denormalized enrollment and seat hold counters on Course and Student'
+
+    def add_arguments(self, parser):
+        parser.add_argument('course_ids', nargs='*', type=int, help='Only recount these course ids')
+
+    def handle(self, *args, **options):
+        course_ids = options['course_ids'] or None
+        courses = Course.objects.all()
+        if course_ids:
+            courses = courses.filter(pk__in=course_ids)
+        
+        with transaction.atomic():
+            before = self.snapshot(courses)
+            updated = Course.recount_enrollments(course_ids)
+            after = self.snapshot(courses)
+            # A course's students may be enrolled anywhere, so students are
+            # only recounted on a full run
+            students = Student.recount_enrollments() if not course_ids else 0
+        
+        drifted = [pk for pk, count in after.items() if before.get(pk) != count]
+        for pk in drifted:
+            self.stdout.write(f'Course {pk}: {before.get(pk)} -> {after[pk]} (total, active, held)')
+        
+        self.stdout.write(self.style.SUCCESS(
+            f'Recounted {updated} courses ({len(drifted)} had drifted) and {students} students'
+        ))
+
+    def snapshot(self, courses):
+        return {
+            pk: (total, active, held)
+            for pk, total, active, held in courses.values_list(
+                'pk', 'enrolled_count', 'active_enrolled_count', 'held_count'
+            )
+        }
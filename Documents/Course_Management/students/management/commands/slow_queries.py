@@ -0,0 +1,57 @@
+import json
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+class Command(BaseCommand):
+    help = 'Summarize the slow-query log by SQL fingerprint, worst first'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--log', help='Log file (default: SLOW_QUERY_LOG)')
+        parser.add_argument('--top', type=int, default=10)
+        parser.add_argument('--sort', choices=['total', 'count', 'max'], default='total')
+        parser.add_argument('--full-scans', action='store_true', help='Only queries that fully scan a watched table')
+        parser.add_argument('--clear', action='store_true', help='Empty the log after printing')
+
+    def handle(self, *args, **options):
+        path = options['log'] or getattr(settings, 'SLOW_QUERY_LOG', None)
+        if not path:
+            raise CommandError('No log file; set SLOW_QUERY_LOG or pass --log')
+        try:
+            with open(path, encoding='utf-8') as f:
+                entries = [json.loads(line) for line in f if line.strip()]
+        except FileNotFoundError:
+            raise CommandError(f'{path} does not exist; is SLOW_QUERY_MS set?')
+
+        groups = {}
+        for entry in entries:
+            if options['full_scans'] and not entry['full_scans']:
+                continue
+            group = groups.setdefault(entry['fingerprint'], {
+                'count': 0, 'total': 0.0, 'max': 0.0, 'views': Counter(), 'sites': Counter(),
+                'plan': entry['plan'], 'full_scans': set(),
+            })
+            group['count'] += 1
+            group['total'] += entry['ms']
+            group['max'] = max(group['max'], entry['ms'])
+            group['views'][entry.get('route') or entry.get('view') or '(no request)'] += 1
+            group['sites'][entry['stack'][0] if entry['stack'] else '(unknown)'] += 1
+            group['full_scans'].update(entry['full_scans'])
+
+        ranked = sorted(groups.items(), key=lambda item: item[1][options['sort']], reverse=True)
+        self.stdout.write(f'{len(entries)} slow queries, {len(groups)} distinct; top {options["top"]} by {options["sort"]}:')
+        for rank, (sql, group) in enumerate(ranked[:options['top']], start=1):
+            self.stdout.write('')
+            self.stdout.write(self.style.WARNING(
+                f'{rank}. {group["count"]}x, {group["total"]:.1f} ms total, {group["max"]:.1f} ms max'
+                + (f'  FULL SCAN: {", ".join(sorted(group["full_scans"]))}' if group['full_scans'] else '')
+            ))
+            self.stdout.write(f'   {sql[:500]}')
+            self.stdout.write(f'   views: {", ".join(f"{v} ({n})" for v, n in group["views"].most_common(3))}')
+            self.stdout.write(f'   sites: {", ".join(f"{s} ({n})" for s, n in group["sites"].most_common(3))}')
+            for detail in group['plan']:
+                self.stdout.write(f'   plan: {detail}')
+
+        if options['clear']:
+            open(path, 'w').close()
@@ -0,0 +1,32 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from students.replicas import sync_sqlite
+
+class Command(BaseCommand):
+    help = 'Copy the primary SQLite database into the REPLICA_DATABASES files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Keep syncing every this many seconds (replica lag) instead of once')
+
+    def handle(self, *args, **options):
+        replicas = getattr(settings, 'REPLICA_DATABASES', [])
+        if not replicas:
+            raise CommandError('No REPLICA_DATABASES configured; set DB_REPLICAS')
+        primary = connections[DEFAULT_DB_ALIAS]
+        if any(connections[alias].vendor != 'sqlite' for alias in [DEFAULT_DB_ALIAS, *replicas]):
+            raise CommandError("Only SQLite files can be synced; use the database's own replication")
+
+        while True:
+            started = time.perf_counter()
+            for alias in replicas:
+                sync_sqlite(str(primary.settings_dict['NAME']), str(connections[alias].settings_dict['NAME']))
+            self.stdout.write(
+                f'Synced {len(replicas)} replica(s) in {(time.perf_counter() - started) * 1000:.0f}ms'
+            )
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
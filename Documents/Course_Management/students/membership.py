@@ -0,0 +1,59 @@
+"""
+Cached enrollment membership.
+
+Each student's set of actively enrolled course ids is kept in the Django
+cache, so "is this student enrolled here?" checks on the catalog, detail,
+upload and download pages cost a cache hit instead of a query. The Enrollment
+signal handlers and the admin bulk actions invalidate it on every change.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router, transaction
+
+from .models import Enrollment
+
+
+def _key(student_id):
+    return f'students:enrolled-courses:v1:{student_id}'
+
+
+def _enrolled_queryset(student):
+    # From the primary even on replica-routed requests: the set is cached
+    # for an hour, longer than any replica lag
+    return Enrollment.objects.using(router.db_for_write(Enrollment)).filter(
+        student_id=student.pk, is_active=True
+    ).values_list('course_id', flat=True)
+
+
+def enrolled_course_ids(student):
+    """frozenset of course ids the student is actively enrolled in."""
+    key = _key(student.pk)
+    course_ids = cache.get(key)
+    if course_ids is None:
+        course_ids = frozenset(_enrolled_queryset(student))
+        cache.set(key, course_ids, getattr(settings, 'ENROLLMENT_CACHE_TIMEOUT', 3600))
+    return course_ids
+
+
+async def aenrolled_course_ids(student):
+    key = _key(student.pk)
+    course_ids = await cache.aget(key)
+    if course_ids is None:
+        course_ids = frozenset([course_id async for course_id in _enrolled_queryset(student)])
+        await cache.aset(key, course_ids, getattr(settings, 'ENROLLMENT_CACHE_TIMEOUT', 3600))
+    return course_ids
+
+
+def is_enrolled(student, course_id):
+    return course_id in enrolled_course_ids(student)
+
+
+def invalidate_enrollments(student_ids):
+    keys = [_key(student_id) for student_id in set(student_ids)]
+    if not keys:
+        return
+    cache.delete_many(keys)
+    # A concurrent request may re-cache the old rows before this transaction
+    # commits, so drop the keys again once it has
+    transaction.on_commit(lambda: cache.delete_many(keys))
@@ -0,0 +1,175 @@
+"""
+Prometheus metrics.
+
+render_metrics() produces the text exposition format for the /metrics view.
+Nothing here aggregates over Enrollment or FileUpload: seat and enrollment
+gauges come from the Course counters, and the trailing-hour figures are kept
+by TrailingWindow, which reads only rows added since the previous scrape.
+The rendered text is cached for METRICS_CACHE_TTL seconds.
+"""
+
+import os
+import threading
+from collections import deque
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import Course, Enrollment, FileUpload
+
+CACHE_KEY = 'students:metrics:v1'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class TrailingWindow:
+    """
+    Sum of ``value_field`` (or a row count) over rows created in the last
+    ``seconds``. Rows are followed by primary key, so each refresh is an
+    index range read of the new rows only; the first one walks back from
+    the newest row until it passes the window.
+    """
+
+    def __init__(self, model, time_field, value_field=None, seconds=3600, chunk_size=1000):
+        self.model = model
+        self.time_field = time_field
+        self.value_field = value_field
+        self.seconds = seconds
+        self.chunk_size = chunk_size
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.rows = deque()
+        self.total = 0
+        self.last_pk = None
+
+    def _values(self, queryset):
+        fields = ['pk', self.time_field] + ([self.value_field] if self.value_field else [])
+        for row in queryset.values_list(*fields):
+            yield row[0], row[1], (row[2] or 0) if self.value_field else 1
+
+    def _add(self, created, value):
+        self.rows.append((created, value))
+        self.total += value
+
+    def _backfill(self, cutoff):
+        self.last_pk = 0
+        recent = []
+        queryset = self.model.objects.order_by('-pk')
+        while True:
+            chunk = list(self._values(queryset[:self.chunk_size]))
+            if not chunk:
+                break
+            self.last_pk = max(self.last_pk, chunk[0][0])
+            recent.extend(row for row in chunk if row[1] >= cutoff)
+            if len(chunk) < self.chunk_size or chunk[-1][1] < cutoff:
+                break
+            queryset = self.model.objects.filter(pk__lt=chunk[-1][0]).order_by('-pk')
+        for _, created, value in reversed(recent):
+            self._add(created, value)
+
+    def value(self, now=None):
+        now = now or timezone.now()
+        cutoff = now - timedelta(seconds=self.seconds)
+        with self.lock:
+            if self.last_pk is None:
+                self._backfill(cutoff)
+            else:
+                for pk, created, value in self._values(self.model.objects.filter(pk__gt=self.last_pk).order_by('pk')):
+                    self.last_pk = pk
+                    if created >= cutoff:
+                        self._add(created, value)
+            while self.rows and self.rows[0][0] < cutoff:
+                self.total -= self.rows.popleft()[1]
+            return self.total
+
+
+enrollments_last_hour = TrailingWindow(Enrollment, 'enrollment_date')
+upload_bytes_last_hour = TrailingWindow(FileUpload, 'timestamp', 'size')
+
+
+def reset():
+    """Forget window state, e.g. after the database was replaced."""
+    for window in (enrollments_last_hour, upload_bytes_last_hour):
+        with window.lock:
+            window.reset()
+    cache.delete(CACHE_KEY)
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _metric(lines, name, kind, help_text, samples):
+    lines.append(f'# HELP {name} {help_text}')
+    lines.append(f'# TYPE {name} {kind}')
+    for labels, value in samples:
+        label_text = ','.join(f'{key}="{_label(val)}"' for key, val in labels.items())
+        lines.append(f'{name}{{{label_text}}} {value}' if label_text else f'{name} {value}')
+
+
+def _active_sessions(now):
+    if settings.SESSION_ENGINE != 'django.contrib.sessions.backends.db':
+        return None
+    from django.contrib.sessions.models import Session
+    # Range count over the expire_date index
+    return Session.objects.filter(expire_date__gt=now).count()
+
+
+def _sqlite_files():
+    if connection.vendor != 'sqlite':
+        return []
+    name = str(connection.settings_dict['NAME'])
+    if connection.is_in_memory_db() or not os.path.exists(name):
+        return []
+    files = [({'file': 'db'}, os.path.getsize(name))]
+    wal = f'{name}-wal'
+    files.append(({'file': 'wal'}, os.path.getsize(wal) if os.path.exists(wal) else 0))
+    return files
+
+
+def collect():
+    now = timezone.now()
+    lines = []
+    courses = list(Course.objects.filter(is_active=True).order_by('pk').values_list(
+        'pk', 'title', 'max_students', 'enrolled_count', 'held_count'
+    ))
+    # Held seats (students/holds.py) are taken until confirmed or expired
+    _metric(lines, 'course_seats_remaining', 'gauge', 'Free seats in each active course.', [
+        ({'course_id': pk, 'title': title}, max(max_students - enrolled - held, 0))
+        for pk, title, max_students, enrolled, held in courses
+    ])
+    _metric(lines, 'course_seats_held', 'gauge', 'Seats held for checkout in each active course.', [
+        ({'course_id': pk, 'title': title}, held)
+        for pk, title, _, _, held in courses
+    ])
+    _metric(lines, 'courses_full', 'gauge', 'Active courses with no free seats.', [
+        ({}, sum(1 for _, _, max_students, enrolled, held in courses if enrolled + held >= max_students)),
+    ])
+    active = Course.objects.aggregate(total=Sum('active_enrolled_count'))['total'] or 0
+    _metric(lines, 'enrollments_active', 'gauge', 'Active enrollments across all courses.', [({}, active)])
+    _metric(lines, 'enrollments_last_hour', 'gauge', 'Enrollments created in the trailing hour.', [
+        ({}, enrollments_last_hour.value(now)),
+    ])
+    _metric(lines, 'upload_bytes_last_hour', 'gauge', 'Bytes of files uploaded in the trailing hour.', [
+        ({}, upload_bytes_last_hour.value(now)),
+    ])
+    sessions = _active_sessions(now)
+    if sessions is not None:
+        _metric(lines, 'sessions_active', 'gauge', 'Unexpired login sessions.', [({}, sessions)])
+    files = _sqlite_files()
+    if files:
+        _metric(lines, 'sqlite_file_bytes', 'gauge', 'Size of the SQLite database and its WAL.', files)
+    return '\n'.join(lines) + '\n'
+
+
+def render_metrics():
+    text = cache.get(CACHE_KEY)
+    if text is None:
+        text = collect()
+        cache.set(CACHE_KEY, text, getattr(settings, 'METRICS_CACHE_TTL', 10))
+    return text
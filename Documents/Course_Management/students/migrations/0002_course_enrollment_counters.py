@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-17 12:41
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def populate_counters(apps, schema_editor):
+    Course = apps.get_model('students', 'Course')
+    courses = Course.objects.annotate(
+        total=Count('enrollment'),
+        active=Count('enrollment', filter=Q(enrollment__is_active=True)),
+    )
+    for course in courses.iterator():
+        Course.objects.filter(pk=course.pk).update(
+            enrolled_count=course.total, active_enrolled_count=course.active
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='active_enrolled_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='enrolled_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
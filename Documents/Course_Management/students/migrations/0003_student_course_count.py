@@ -0,0 +1,26 @@
+# Generated by Django 4.2.7 on 2026-10-17 12:43
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_course_count(apps, schema_editor):
+    Student = apps.get_model('students', 'Student')
+    for student in Student.objects.annotate(total=Count('enrollment')).iterator():
+        Student.objects.filter(pk=student.pk).update(course_count=student.total)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0002_course_enrollment_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='student',
+            name='course_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_course_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+from django.db import migrations
+
+
+def install(apps, schema_editor):
+    from students.search import install_search_index, rebuild_search_index, fts_available
+    if fts_available(schema_editor.connection):
+        install_search_index(schema_editor.connection)
+        rebuild_search_index(schema_editor.connection)
+
+
+def uninstall(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS students_course_fts')
+        for suffix in ('ai', 'ad', 'au'):
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS students_course_fts_{suffix}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0005_course_catalog_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(install, uninstall),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-17 13:44
+
+from django.db import migrations, models
+import students.models
+import students.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0009_access_pattern_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Blob',
+            fields=[
+                ('sha256', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('size', models.PositiveBigIntegerField()),
+                ('ref_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='fileupload',
+            name='filename',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='fileupload',
+            name='file',
+            field=models.FileField(storage=students.storage.course_file_storage, upload_to=students.models.file_upload_path),
+        ),
+    ]
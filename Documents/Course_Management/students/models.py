@@ -1,7 +1,25 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import Count, Exists, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
+from django.utils import timezone
+import hashlib
+import mimetypes
 import os
+import uuid
+
+from .storage import course_file_storage
+
+MAX_COURSES_PER_STUDENT = 5
+
+def enrollment_count_subquery(field, active_only=False):
+    """COUNT(*) of the enrollments pointing at the outer row through ``field``."""
+    enrollments = Enrollment.objects.filter(**{field: OuterRef('pk')})
+    if active_only:
+        enrollments = enrollments.filter(is_active=True)
+    counts = enrollments.order_by().values(field).annotate(c=Count('pk')).values('c')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
 
 class Student(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
@@ -9,12 +27,26 @@ class Student(models.Model):
     phone_number = models.CharField(max_length=15, blank=True)
     date_of_birth = models.DateField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Denormalized number of Enrollment rows, maintained like Course.enrolled_count
+    course_count = models.PositiveIntegerField(default=0, editable=False)
     
     def __str__(self):
         return f"{self.user.username} - {self.student_id}"
     
     def can_enroll_more_courses(self):
-        return self.enrollment_set.count() < 5
+        return self.course_count < MAX_COURSES_PER_STUDENT
+    
+    @classmethod
+    def recount_enrollments(cls, student_ids=None):
+        """Recompute course_count from the Enrollment table."""
+        students = cls.objects.all()
+        if student_ids is not None:
+            students = students.filter(pk__in=student_ids)
+        return students.update(course_count=enrollment_count_subquery('student'))
+    
+    @classmethod
+    def adjust_course_count(cls, student_id, delta):
+        cls.objects.filter(pk=student_id).update(course_count=F('course_count') + delta)
 
 class Course(models.Model):
     DIFFICULTY_CHOICES = [
@@ -33,15 +65,80 @@ class Course(models.Model):
     end_date = models.DateField()
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Denormalized enrollment counters, maintained by the Enrollment signal
+    # handlers in students/signals.py. Use recount_enrollments() to repair drift.
+    enrolled_count = models.PositiveIntegerField(default=0, editable=False)
+    active_enrolled_count = models.PositiveIntegerField(default=0, editable=False)
+    # SeatHold rows, expired or not until swept; seats taken are enrolled + held
+    held_count = models.PositiveIntegerField(default=0, editable=False)
+    # Bumped on every save(); part of the cache key of the catalog card and
+    # detail page fragments. Writes through queryset.update() to displayed
+    # fields must bump it too.
+    version = models.PositiveIntegerField(default=1, editable=False)
+    
+    class Meta:
+        # Catalog keyset pagination seeks on (title, id) within active courses,
+        # optionally narrowed by one of the equality filters. Partial indexes,
+        # because the ORM renders is_active=True as a bare column test that
+        # cannot drive a composite index.
+        indexes = [
+            models.Index(fields=['title', 'id'], condition=models.Q(is_active=True), name='course_catalog_idx'),
+            models.Index(fields=['difficulty', 'title', 'id'], condition=models.Q(is_active=True), name='course_difficulty_idx'),
+            models.Index(fields=['instructor', 'title', 'id'], condition=models.Q(is_active=True), name='course_instructor_idx'),
+            models.Index(fields=['credits', 'title', 'id'], condition=models.Q(is_active=True), name='course_credits_idx'),
+            models.Index(fields=['start_date'], condition=models.Q(is_active=True), name='course_start_date_idx'),
+            # The admin date_hierarchy reads all courses, active or not
+            models.Index(fields=['start_date'], name='course_start_date_all_idx'),
+        ]
     
     def __str__(self):
         return self.title
     
+    # Only ever changed by conditional UPDATEs; save() must not write back
+    # the values loaded with the instance over concurrent claims
+    COUNTER_FIELDS = ('enrolled_count', 'active_enrolled_count', 'held_count')
+    
+    def save(self, *args, **kwargs):
+        bump = not self._state.adding
+        if bump:
+            self.version = F('version') + 1
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'version'}
+            elif not kwargs.get('force_insert'):
+                kwargs['update_fields'] = [
+                    field.name for field in self._meta.concrete_fields
+                    if not field.primary_key and field.name not in self.COUNTER_FIELDS
+                ]
+        super().save(*args, **kwargs)
+        if bump:
+            self.refresh_from_db(fields=['version', *self.COUNTER_FIELDS])
+    
     def get_enrolled_count(self):
-        return self.enrollment_set.count()
+        return self.enrolled_count
+    
+    @classmethod
+    def recount_enrollments(cls, course_ids=None):
+        """Recompute the enrollment counters from the Enrollment table."""
+        courses = cls.objects.all()
+        if course_ids is not None:
+            courses = courses.filter(pk__in=course_ids)
+        holds = SeatHold.objects.filter(course=OuterRef('pk')).order_by().values('course').annotate(c=Count('pk')).values('c')
+        return courses.update(
+            enrolled_count=enrollment_count_subquery('course'),
+            active_enrolled_count=enrollment_count_subquery('course', active_only=True),
+            held_count=Coalesce(Subquery(holds, output_field=IntegerField()), Value(0)),
+        )
+    
+    @classmethod
+    def adjust_enrollment_counts(cls, course_id, enrolled=0, active=0, held=0):
+        cls.objects.filter(pk=course_id).update(
+            enrolled_count=F('enrolled_count') + enrolled,
+            active_enrolled_count=F('active_enrolled_count') + active,
+            held_count=F('held_count') + held,
+        )
     
     def can_enroll(self):
-        return self.is_active and self.get_enrolled_count() < self.max_students
+        return self.is_active and self.get_enrolled_count() + self.held_count < self.max_students
 
 class Enrollment(models.Model):
     student = models.ForeignKey(Student, on_delete=models.CASCADE)
@@ -51,29 +148,201 @@ class Enrollment(models.Model):
     
     class Meta:
         unique_together = ('student', 'course')
+        # Active enrollments of a course (rosters, active counters) straight
+        # from the index. A student has at most MAX_COURSES_PER_STUDENT rows,
+        # so the student_id index already serves the per-student lookups.
+        indexes = [
+            models.Index(fields=['course', 'student'], condition=models.Q(is_active=True), name='enrollment_course_active_idx'),
+            models.Index(fields=['enrollment_date'], name='enrollment_date_idx'),
+        ]
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored state so the signal handlers can tell what changed
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+    
+    def save(self, *args, **kwargs):
+        # Keep the row write and the Course counter update in one transaction
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
     
     def __str__(self):
         return f"{self.student.user.username} - {self.course.title}"
 
+class Waitlist(models.Model):
+    """A student's place in the queue for a full course; see students/waitlist.py."""
+    student = models.ForeignKey(Student, on_delete=models.CASCADE)
+    course = models.ForeignKey(Course, on_delete=models.CASCADE)
+    # Increasing per course; gaps are left by promotions and departures
+    position = models.PositiveIntegerField()
+    joined_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        # The second also serves the promotion engine's in-order scan
+        unique_together = [('student', 'course'), ('course', 'position')]
+    
+    def __str__(self):
+        return f"{self.student.user.username} - {self.course.title} (#{self.position})"
+    
+    @classmethod
+    def discard_enrolled(cls, student_ids):
+        """Drop the entries of ``student_ids`` for courses they are enrolled in."""
+        enrolled = Enrollment.objects.filter(student_id=OuterRef('student_id'), course_id=OuterRef('course_id'))
+        cls.objects.filter(student_id__in=student_ids).filter(Exists(enrolled)).delete()
+
+class SeatHold(models.Model):
+    """
+    A seat set aside for a student until expires_at, to be confirmed into an
+    Enrollment; see students/holds.py. Counted in Course.held_count.
+    """
+    student = models.ForeignKey(Student, on_delete=models.CASCADE)
+    course = models.ForeignKey(Course, on_delete=models.CASCADE)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+    
+    class Meta:
+        unique_together = ('student', 'course')
+        indexes = [
+            # Per-course sweeps on the claim paths, and the global sweeper
+            models.Index(fields=['course', 'expires_at'], name='seathold_course_expiry_idx'),
+            models.Index(fields=['expires_at'], name='seathold_expiry_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.student.user.username} - {self.course.title} (until {self.expires_at:%H:%M:%S})"
+    
+    @property
+    def is_expired(self):
+        return self.expires_at <= timezone.now()
+    
+    @classmethod
+    def release_expired(cls, course_ids=None):
+        """Delete expired holds, giving their seats back; returns how many."""
+        expired = cls.objects.filter(expires_at__lte=timezone.now())
+        if course_ids is not None:
+            expired = expired.filter(course_id__in=course_ids)
+        deleted, _ = expired.delete()
+        return deleted
+
+def guess_content_type(filename, fallback=None):
+    content_type, encoding = mimetypes.guess_type(filename)
+    if encoding or not content_type:
+        return fallback or 'application/octet-stream'
+    return content_type
+
+def file_sha256(file):
+    digest = hashlib.sha256()
+    for chunk in file.chunks():
+        digest.update(chunk)
+    return digest.hexdigest()
+
 def file_upload_path(instance, filename):
     return f'uploads/{instance.course.title}/{filename}'
 
+class Blob(models.Model):
+    """
+    A file in students.storage.ContentAddressedStorage; ref_count is the
+    number of FileUpload rows stored under it.
+    """
+    sha256 = models.CharField(max_length=64, primary_key=True)
+    size = models.PositiveBigIntegerField()
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.sha256} ({self.ref_count} references)"
+    
+    @classmethod
+    def acquire(cls, sha256, size, count=1):
+        """Add ``count`` references, creating the row for new content."""
+        if cls.objects.filter(pk=sha256).update(ref_count=F('ref_count') + count):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(sha256=sha256, size=size, ref_count=count)
+        except IntegrityError:
+            # Created concurrently
+            cls.objects.filter(pk=sha256).update(ref_count=F('ref_count') + count)
+    
+    @classmethod
+    def release(cls, sha256):
+        """Drop one reference. Returns True if it was the last and the row is gone."""
+        cls.objects.filter(pk=sha256, ref_count__gt=0).update(ref_count=F('ref_count') - 1)
+        deleted, _ = cls.objects.filter(pk=sha256, ref_count=0).delete()
+        return bool(deleted)
+
 class FileUpload(models.Model):
     uploaded_by = models.ForeignKey(User, on_delete=models.CASCADE)
-    file = models.FileField(upload_to=file_upload_path)
+    # Stored by content hash (see students.storage); upload_to only applies
+    # if STORAGES['course_files'] is a name-preserving backend
+    file = models.FileField(upload_to=file_upload_path, storage=course_file_storage)
+    filename = models.CharField(max_length=255, blank=True, editable=False)
     course = models.ForeignKey(Course, on_delete=models.CASCADE)
     title = models.CharField(max_length=200)
     description = models.TextField(blank=True)
     timestamp = models.DateTimeField(auto_now_add=True)
+    # Recorded when the file is saved so display paths never stat storage.
+    # NULL size means the row predates this and needs backfill_file_metadata.
+    size = models.PositiveBigIntegerField(null=True, blank=True, editable=False)
+    content_type = models.CharField(max_length=100, blank=True, editable=False)
+    sha256 = models.CharField(max_length=64, blank=True, editable=False)
+    
+    class Meta:
+        indexes = [
+            # Course page lists a course's files newest first without a sort
+            models.Index(fields=['course', '-timestamp'], name='fileupload_course_recent_idx'),
+            models.Index(fields=['timestamp'], name='fileupload_timestamp_idx'),
+        ]
     
     def __str__(self):
         return f"{self.title} - {self.course.title}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._stored_file_name = dict(zip(field_names, values)).get('file')
+        return instance
+    
+    def save(self, *args, **kwargs):
+        if self.file and not self.file._committed:
+            self.record_file_metadata()
+        super().save(*args, **kwargs)
+        replaced = getattr(self, '_stored_file_name', None)
+        if replaced and replaced != self.file.name:
+            # A new file replaced this one (admin change form)
+            storage = self.file.storage
+            transaction.on_commit(lambda: storage.delete(replaced), using=kwargs.get('using'))
+        self._stored_file_name = self.file.name
+    
+    def record_file_metadata(self):
+        """Fill filename, size, content_type and sha256 from the (not yet stored) file."""
+        upload = self.file.file
+        self.filename = os.path.basename(self.file.name)
+        self.size = self.file.size
+        self.content_type = guess_content_type(self.file.name, getattr(upload, 'content_type', None))
+        self.sha256 = getattr(upload, 'sha256', None) or file_sha256(self.file)
+    
     def get_file_name(self):
-        return os.path.basename(self.file.name)
+        return self.filename or os.path.basename(self.file.name)
     
     def get_file_size(self):
-        try:
-            return self.file.size
-        except:
-            return 0
+        return self.size or 0
+
+class UploadSession(models.Model):
+    """A resumable, chunked upload that becomes a FileUpload once finalized."""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    uploaded_by = models.ForeignKey(User, on_delete=models.CASCADE)
+    course = models.ForeignKey(Course, on_delete=models.CASCADE)
+    title = models.CharField(max_length=200)
+    description = models.TextField(blank=True)
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    sha256 = models.CharField(max_length=64)
+    received_bytes = models.PositiveBigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.filename} ({self.received_bytes}/{self.size}) - {self.course.title}"
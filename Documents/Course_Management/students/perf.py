@@ -0,0 +1,267 @@
+"""
+Per-request performance instrumentation.
+
+PerformanceMiddleware times every request and records, per resolved URL
+name, wall time, DB query count and time (through an execute wrapper on every
+connection), template render time and response size. Times go into fixed-bucket
+histograms, so recording is a bisect and a few additions under a lock and
+memory stays constant. Each response also carries a Server-Timing header.
+
+Stats live in the worker process: with several workers, each reports its own
+share of the traffic.
+"""
+
+import contextvars
+import math
+import threading
+import time
+from bisect import bisect_left
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+# Geometric buckets from 0.1 ms to ~50 s, 25% apart: percentiles read from
+# them are within one bucket of the true value.
+BUCKETS_MS = [0.1 * 1.25 ** i for i in range(60)]
+
+# [template seconds, rendering] and [query count, DB seconds] for the request
+# being handled, if any. Context variables rather than thread state: the
+# async ORM runs queries in a worker thread, which gets a copy of the context.
+_template_time = contextvars.ContextVar('template_time', default=None)
+_db_time = contextvars.ContextVar('db_time', default=None)
+# {'view': dotted path, 'route': URL name} of the request being handled;
+# read by students.slowqueries
+current_request = contextvars.ContextVar('current_request', default=None)
+
+
+class Histogram:
+    __slots__ = ('counts', 'total', 'max')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        self.counts[bisect_left(BUCKETS_MS, value)] += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, fraction, count):
+        """Upper bound of the bucket holding the given fraction of samples."""
+        rank = math.ceil(fraction * count)
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return min(BUCKETS_MS[index], self.max) if index < len(BUCKETS_MS) else self.max
+        return self.max
+
+    def summary(self, count):
+        return {
+            'mean': round(self.total / count, 2),
+            'p50': round(self.percentile(0.50, count), 2),
+            'p95': round(self.percentile(0.95, count), 2),
+            'p99': round(self.percentile(0.99, count), 2),
+            'max': round(self.max, 2),
+        }
+
+
+class RouteStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.count = 0
+        self.wall = Histogram()
+        self.db = Histogram()
+        self.template = Histogram()
+        self.queries = 0
+        self.max_queries = 0
+        self.bytes = 0
+        self.errors = 0
+
+    def record(self, wall_ms, db_ms, queries, template_ms, size, status):
+        with self.lock:
+            self.count += 1
+            self.wall.add(wall_ms)
+            self.db.add(db_ms)
+            self.template.add(template_ms)
+            self.queries += queries
+            self.max_queries = max(self.max_queries, queries)
+            self.bytes += size or 0
+            self.errors += status >= 500
+
+    def summary(self):
+        with self.lock:
+            count = self.count
+            return {
+                'requests': count,
+                'errors': self.errors,
+                'wall_ms': self.wall.summary(count),
+                'db_ms': self.db.summary(count),
+                'template_ms': self.template.summary(count),
+                'queries': {'mean': round(self.queries / count, 2), 'max': self.max_queries},
+                'response_bytes': {'mean': round(self.bytes / count), 'total': self.bytes},
+            }
+
+
+_routes = {}
+_routes_lock = threading.Lock()
+_started = time.time()
+
+
+def route_stats(name):
+    stats = _routes.get(name)
+    if stats is None:
+        with _routes_lock:
+            stats = _routes.setdefault(name, RouteStats())
+    return stats
+
+
+def snapshot():
+    return {
+        'since': _started,
+        'routes': {name: stats.summary() for name, stats in sorted(_routes.items()) if stats.count},
+    }
+
+
+def reset():
+    global _started
+    with _routes_lock:
+        _routes.clear()
+        _started = time.time()
+
+
+def install_execute_wrapper(wrapper, dispatch_uid):
+    """Run ``wrapper`` around every query of every connection, including open ones."""
+    def add(connection, **kwargs):
+        # First in the list: connection.execute_wrapper() blocks pop the
+        # last entry, and this may be added while one is open
+        if wrapper not in connection.execute_wrappers:
+            connection.execute_wrappers.insert(0, wrapper)
+
+    connection_created.connect(add, dispatch_uid=dispatch_uid, weak=False)
+    for connection in connections.all(initialized_only=True):
+        add(connection)
+
+
+def uninstall_execute_wrapper(wrapper, dispatch_uid):
+    connection_created.disconnect(dispatch_uid=dispatch_uid)
+    for connection in connections.all(initialized_only=True):
+        if wrapper in connection.execute_wrappers:
+            connection.execute_wrappers.remove(wrapper)
+
+
+def db_timer(execute, sql, params, many, context):
+    accumulator = _db_time.get()
+    if accumulator is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        accumulator[0] += 1
+        accumulator[1] += time.perf_counter() - start
+
+
+_installed = False
+
+
+def install_template_timer():
+    """Time Django template renders into the current request's accumulator."""
+    global _installed
+    if _installed:
+        return
+    from django.template.backends.django import Template
+
+    render = Template.render
+
+    def timed_render(self, *args, **kwargs):
+        accumulator = _template_time.get()
+        if accumulator is None or accumulator[1]:
+            # Not in a request, or inside another timed render
+            return render(self, *args, **kwargs)
+        accumulator[1] = True
+        start = time.perf_counter()
+        try:
+            return render(self, *args, **kwargs)
+        finally:
+            accumulator[0] += time.perf_counter() - start
+            accumulator[1] = False
+
+    Template.render = timed_render
+    _installed = True
+
+
+class PerformanceMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        install_template_timer()
+        install_execute_wrapper(db_timer, 'students.perf')
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        timing = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            self.stop(timing)
+        return self.finish(request, response, timing)
+
+    async def __acall__(self, request):
+        timing = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            self.stop(timing)
+        return self.finish(request, response, timing)
+
+    def start(self):
+        db, template = [0, 0.0], [0.0, False]
+        tokens = (
+            _db_time.set(db),
+            _template_time.set(template),
+            current_request.set({'view': None, 'route': None}),
+        )
+        return db, template, tokens, time.perf_counter()
+
+    def stop(self, timing):
+        _, _, (db_token, template_token, request_token), _ = timing
+        _db_time.reset(db_token)
+        _template_time.reset(template_token)
+        current_request.reset(request_token)
+
+    def finish(self, request, response, timing):
+        db, template, _, start = timing
+        wall_ms = (time.perf_counter() - start) * 1000
+        db_ms, template_ms = db[1] * 1000, template[0] * 1000
+
+        if response.streaming:
+            size = int(response['Content-Length']) if response.has_header('Content-Length') else None
+        else:
+            size = len(response.content)
+        match = request.resolver_match
+        route_stats(match.view_name if match else '<unresolved>').record(
+            wall_ms, db_ms, db[0], template_ms, size, response.status_code
+        )
+
+        if getattr(settings, 'PERF_SERVER_TIMING', True):
+            response['Server-Timing'] = (
+                f'app;dur={wall_ms:.1f}, db;dur={db_ms:.1f};desc="{db[0]} queries", tpl;dur={template_ms:.1f}'
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = current_request.get()
+        if state is not None:
+            state['view'] = f'{view_func.__module__}.{view_func.__qualname__}'
+            state['route'] = request.resolver_match.view_name
@@ -0,0 +1,140 @@
+"""
+Bulk account provisioning.
+
+Password hashing dominates account creation: at PBKDF2's default iteration
+count one core manages only a few hashes per second. provision_students()
+hashes each batch across a process pool and writes users and students with
+bulk_create. With force_reset=True no password is hashed at all; accounts get
+an unusable password and an activation link (a password reset token) through
+which the student sets one on first login.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.contrib.auth.tokens import default_token_generator
+from django.db import transaction
+from django.urls import reverse
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from .models import Student
+
+
+def _init_worker():
+    # Needed under the spawn start method; a no-op for forked workers
+    import django
+    django.setup()
+
+
+def hashing_pool(workers=None):
+    return ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=_init_worker)
+
+
+def hash_passwords(passwords, pool=None):
+    """make_password() for each password, in order; serially without a pool."""
+    passwords = list(passwords)
+    if pool is None:
+        return [make_password(password) for password in passwords]
+    # Each hash takes far longer than shipping it to a worker
+    return list(pool.map(make_password, passwords))
+
+
+def activation_path(user):
+    """Relative URL where a force-reset account sets its first password."""
+    return reverse('activate_account', args=[
+        urlsafe_base64_encode(force_bytes(user.pk)), default_token_generator.make_token(user),
+    ])
+
+
+class Provisioner:
+    """
+    Create students from account dicts with the keys username, password,
+    student_id and optionally email, first_name, last_name and phone_number.
+    Usernames or student ids that already exist are reported in ``errors``
+    and skipped.
+    """
+
+    def __init__(self, pool=None, batch_size=1000, force_reset=False):
+        self.pool = pool
+        self.batch_size = batch_size
+        self.force_reset = force_reset
+        self.errors = []
+        self.users = []
+
+    def run(self, accounts):
+        accounts = iter(accounts)
+        while True:
+            batch = list(islice(accounts, self.batch_size))
+            if not batch:
+                return self
+            self.create_batch(batch)
+
+    def create_batch(self, batch):
+        batch = self.drop_duplicates(batch)
+        if self.force_reset:
+            hashes = [make_password(None) for _ in batch]
+        else:
+            hashes = hash_passwords([account['password'] for account in batch], self.pool)
+
+        with transaction.atomic():
+            users = User.objects.bulk_create([
+                User(
+                    username=account['username'],
+                    email=account.get('email', ''),
+                    first_name=account.get('first_name', ''),
+                    last_name=account.get('last_name', ''),
+                    password=password,
+                )
+                for account, password in zip(batch, hashes)
+            ])
+            user_pks = dict(User.objects.filter(
+                username__in=[user.username for user in users]
+            ).values_list('username', 'pk'))
+            for user in users:
+                user.pk = user_pks[user.username]
+            Student.objects.bulk_create([
+                Student(
+                    user_id=user.pk,
+                    student_id=account['student_id'],
+                    phone_number=account.get('phone_number', ''),
+                )
+                for account, user in zip(batch, users)
+            ])
+        self.users.extend(users)
+
+    def drop_duplicates(self, batch):
+        # Rows missing either key are reported below
+        usernames = set(User.objects.filter(
+            username__in=[account.get('username') for account in batch if account.get('username')]
+        ).values_list('username', flat=True))
+        student_ids = set(Student.objects.filter(
+            student_id__in=[account.get('student_id') for account in batch if account.get('student_id')]
+        ).values_list('student_id', flat=True))
+
+        accepted = []
+        for account in batch:
+            if not account.get('username') or not account.get('student_id'):
+                self.errors.append((account.get('username', ''), 'username and student_id are required'))
+            elif not self.force_reset and not account.get('password'):
+                self.errors.append((account['username'], 'password is required unless forcing a reset'))
+            elif account['username'] in usernames:
+                self.errors.append((account['username'], 'username already exists'))
+            elif account['student_id'] in student_ids:
+                self.errors.append((account['username'], f"student_id {account['student_id']} already exists"))
+            else:
+                usernames.add(account['username'])
+                student_ids.add(account['student_id'])
+                accepted.append(account)
+        return accepted
+
+
+def provision_students(accounts, workers=None, batch_size=1000, force_reset=False):
+    """Create students in bulk; returns the Provisioner with users and errors."""
+    if force_reset or workers == 1:
+        return Provisioner(batch_size=batch_size, force_reset=force_reset).run(accounts)
+    with hashing_pool(workers) as pool:
+        return Provisioner(pool, batch_size).run(accounts)
@@ -0,0 +1,116 @@
+"""
+Read replicas.
+
+ReplicaMiddleware marks the GET/HEAD requests of REPLICA_ROUTES (the
+catalog, course pages and admin change lists) as safe to serve from a
+replica, and ReplicaRouter sends those requests' reads to a random entry of
+REPLICA_DATABASES. Everything else, all writes and the sessions table stay
+on the primary.
+
+A replica lags the primary, so a browser that has just written (any
+unsafe-method request, e.g. enrolling or uploading) gets a cookie pinning it
+to the primary for REPLICA_PIN_SECONDS and sees its own writes.
+
+With SQLite, ``manage.py sync_replicas`` copies the primary into the
+replica files.
+"""
+
+import contextvars
+import random
+import sqlite3
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+PIN_COOKIE = 'primary_pin'
+REPLICA_ROUTES = {'course_list', 'course_detail'}
+# Session rows are written by the request that reads them next
+PRIMARY_ONLY_APPS = {'sessions'}
+
+# True while handling a request whose reads may be served by a replica
+replica_reads = contextvars.ContextVar('replica_reads', default=False)
+
+
+def replica_route(match):
+    return match.url_name in REPLICA_ROUTES or (
+        match.namespace == 'admin' and match.url_name.endswith('_changelist')
+    )
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = getattr(settings, 'REPLICA_DATABASES', [])
+        if replicas and replica_reads.get() and model._meta.app_label not in PRIMARY_ONLY_APPS:
+            return random.choice(replicas)
+        return None
+
+    def db_for_write(self, model, **hints):
+        # Also for instances read from a replica, which would otherwise be
+        # saved back to it
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Every alias holds the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in getattr(settings, 'REPLICA_DATABASES', []):
+            return False
+        return None
+
+
+class ReplicaMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        token = replica_reads.set(False)
+        try:
+            response = self.get_response(request)
+        finally:
+            replica_reads.reset(token)
+        return self.pin(request, response)
+
+    async def __acall__(self, request):
+        token = replica_reads.set(False)
+        try:
+            response = await self.get_response(request)
+        finally:
+            replica_reads.reset(token)
+        return self.pin(request, response)
+
+    def pin(self, request, response):
+        if request.method not in ('GET', 'HEAD', 'OPTIONS', 'TRACE') and getattr(settings, 'REPLICA_DATABASES', []):
+            seconds = getattr(settings, 'REPLICA_PIN_SECONDS', 5)
+            response.set_cookie(PIN_COOKIE, '1', max_age=seconds, httponly=True, samesite='Lax')
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (request.method in ('GET', 'HEAD') and PIN_COOKIE not in request.COOKIES
+                and replica_route(request.resolver_match)):
+            replica_reads.set(True)
+
+
+def sync_sqlite(source, target):
+    """
+    Copy the SQLite database ``source`` into ``target`` with the online
+    backup API: a consistent snapshot, even while ``source`` takes writes,
+    copied in place so connections already open on ``target`` see the new
+    data on their next read.
+    """
+    src = sqlite3.connect(source)
+    dst = sqlite3.connect(target, timeout=30)
+    try:
+        src.backup(dst)
+    finally:
+        dst.close()
+        src.close()
@@ -0,0 +1,199 @@
+"""
+Bulk roster import.
+
+Rows are streamed from CSV or JSON Lines and processed in chunks, each in
+its own transaction. Per chunk, existing students, users, courses and
+enrollments are resolved with one set-based query each, new rows are written
+with bulk_create, and the per-student course limit and per-course capacity
+are enforced before any Enrollment is inserted.
+
+Row fields: student_id (required), username (defaults to student_id),
+email, first_name, last_name, phone_number, and courses, a ';'-separated
+list of course titles. A student may appear on several rows.
+"""
+
+import csv
+import json
+from collections import defaultdict
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+
+from .db import immediate_atomic
+from .membership import invalidate_enrollments
+from .models import MAX_COURSES_PER_STUDENT, Course, Enrollment, Student, Waitlist
+
+FORMATS = ('csv', 'jsonl')
+
+
+def read_rows(f, fmt):
+    """Yield (line number, row dict) from an open text file."""
+    if fmt == 'csv':
+        reader = csv.DictReader(f)
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        for line_num, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield line_num, {'_error': f'Invalid JSON: {e}'}
+                continue
+            yield line_num, row if isinstance(row, dict) else {'_error': 'Expected a JSON object'}
+
+
+class RosterImporter:
+    def __init__(self, chunk_size=2000):
+        self.chunk_size = chunk_size
+        self.errors = []
+        self.rows = 0
+        self.users_created = 0
+        self.students_created = 0
+        self.enrollments_created = 0
+
+    def error(self, line_num, student_id, message):
+        self.errors.append((line_num, student_id, message))
+
+    def run(self, rows):
+        rows = iter(rows)
+        while True:
+            chunk = list(islice(rows, self.chunk_size))
+            if not chunk:
+                return self
+            self.rows += len(chunk)
+            with immediate_atomic():
+                self.import_chunk(chunk)
+
+    def import_chunk(self, chunk):
+        students = self.parse(chunk)
+        if not students:
+            return
+        student_pks = self.create_students(students)
+        self.create_enrollments(students, student_pks)
+
+    def parse(self, chunk):
+        """Merge the chunk's rows into {student_id: {'line', 'fields', 'courses'}}."""
+        students = {}
+        for line_num, row in chunk:
+            if '_error' in row:
+                self.error(line_num, '', row['_error'])
+                continue
+            student_id = str(row.get('student_id') or '').strip()
+            if not student_id or len(student_id) > 20:
+                self.error(line_num, student_id, 'student_id is required (max 20 characters)')
+                continue
+            courses = row.get('courses') or []
+            if isinstance(courses, str):
+                courses = courses.split(';')
+            elif not isinstance(courses, list):
+                self.error(line_num, student_id, "courses must be a ';'-separated string or a list of titles")
+                continue
+            entry = students.setdefault(student_id, {'line': line_num, 'fields': {}, 'courses': []})
+            for field in ('username', 'email', 'first_name', 'last_name', 'phone_number'):
+                if row.get(field):
+                    entry['fields'][field] = str(row[field]).strip()
+            entry['courses'].extend((line_num, str(title).strip()) for title in courses if str(title).strip())
+        return students
+
+    def create_students(self, students):
+        """Create missing users and students; return {student_id: Student pk}."""
+        student_pks = dict(Student.objects.filter(
+            student_id__in=students
+        ).values_list('student_id', 'pk'))
+
+        new = {sid: entry for sid, entry in students.items() if sid not in student_pks}
+        usernames = {sid: entry['fields'].get('username', sid) for sid, entry in new.items()}
+        taken = set(User.objects.filter(username__in=usernames.values()).values_list('username', flat=True))
+
+        users = []
+        for sid, entry in new.items():
+            username = usernames[sid]
+            if username in taken:
+                self.error(entry['line'], sid, f'Username {username!r} already belongs to another account')
+                continue
+            taken.add(username)
+            fields = entry['fields']
+            users.append(User(
+                username=username,
+                email=fields.get('email', ''),
+                first_name=fields.get('first_name', '')[:150],
+                last_name=fields.get('last_name', '')[:150],
+                # Accounts start without a usable password; students set one
+                # through password reset
+                password=make_password(None),
+            ))
+        User.objects.bulk_create(users)
+        self.users_created += len(users)
+
+        user_pks = dict(User.objects.filter(
+            username__in=[user.username for user in users]
+        ).values_list('username', 'pk'))
+        created = Student.objects.bulk_create([
+            Student(
+                user_id=user_pks[usernames[sid]],
+                student_id=sid,
+                phone_number=new[sid]['fields'].get('phone_number', '')[:15],
+            )
+            for sid in new if usernames[sid] in user_pks
+        ])
+        self.students_created += len(created)
+        student_pks.update(Student.objects.filter(
+            student_id__in=[student.student_id for student in created]
+        ).values_list('student_id', 'pk'))
+        return student_pks
+
+    def create_enrollments(self, students, student_pks):
+        titles = {title for entry in students.values() for _, title in entry['courses']}
+        if not titles:
+            return
+
+        # Locks the courses (a no-op on SQLite, where the writes above already
+        # hold the database write lock) so capacity cannot change under us
+        by_title = defaultdict(list)
+        for course in Course.objects.select_for_update().filter(title__in=titles).only(
+            'pk', 'title', 'is_active', 'max_students', 'enrolled_count', 'held_count'
+        ):
+            by_title[course.title].append(course)
+        seats = {course.pk: course.max_students - course.enrolled_count - course.held_count
+                 for courses in by_title.values() for course in courses}
+
+        pks = [student_pks[sid] for sid in students if sid in student_pks]
+        existing = set(Enrollment.objects.filter(student_id__in=pks).values_list('student_id', 'course_id'))
+        course_counts = dict(Student.objects.filter(pk__in=pks).values_list('pk', 'course_count'))
+
+        enrollments = []
+        for sid, entry in students.items():
+            student_pk = student_pks.get(sid)
+            if student_pk is None:
+                continue
+            for line_num, title in entry['courses']:
+                matches = by_title.get(title, [])
+                if len(matches) != 1:
+                    self.error(line_num, sid, f'Course {title!r} ' + ('not found' if not matches else 'is ambiguous'))
+                    continue
+                course = matches[0]
+                if (student_pk, course.pk) in existing:
+                    continue
+                if course_counts.get(student_pk, 0) >= MAX_COURSES_PER_STUDENT:
+                    self.error(line_num, sid, f'Already enrolled in the maximum of {MAX_COURSES_PER_STUDENT} courses')
+                    continue
+                if not course.is_active or seats[course.pk] <= 0:
+                    self.error(line_num, sid, f'Course {title!r} is full or inactive')
+                    continue
+                existing.add((student_pk, course.pk))
+                course_counts[student_pk] = course_counts.get(student_pk, 0) + 1
+                seats[course.pk] -= 1
+                enrollments.append(Enrollment(student_id=student_pk, course_id=course.pk))
+
+        # bulk_create skips the signal handlers, so maintain the counters and
+        # membership cache for the whole chunk at once
+        Enrollment.objects.bulk_create(enrollments)
+        self.enrollments_created += len(enrollments)
+        if enrollments:
+            Course.recount_enrollments({e.course_id for e in enrollments})
+            Student.recount_enrollments({e.student_id for e in enrollments})
+            invalidate_enrollments(e.student_id for e in enrollments)
+            Waitlist.discard_enrolled({e.student_id for e in enrollments})
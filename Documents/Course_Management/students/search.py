@@ -0,0 +1,140 @@
+"""
+Course full-text search.
+
+On SQLite, courses are indexed in an external-content FTS5 table kept in sync
+by triggers on students_course, so every write path (ORM saves, bulk_create,
+queryset.update, admin edits) updates the index. Other databases fall back to
+the icontains search the admin uses.
+"""
+
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+FTS_TABLE = 'students_course_fts'
+
+# Marker characters used by snippet()/highlight(); the text around them is
+# HTML-escaped before they are turned into <mark> tags.
+MARK_START = '\x02'
+MARK_END = '\x03'
+
+INSTALL_SQL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, instructor, description,
+        content='students_course', content_rowid='id',
+        tokenize='porter unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON students_course BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, instructor, description)
+        VALUES (new.id, new.title, new.instructor, new.description);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON students_course BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, instructor, description)
+        VALUES ('delete', old.id, old.title, old.instructor, old.description);
+    END""",
+    # Only the indexed columns: enrollment counter updates must not touch the index
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF title, instructor, description
+    ON students_course BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, instructor, description)
+        VALUES ('delete', old.id, old.title, old.instructor, old.description);
+        INSERT INTO {FTS_TABLE}(rowid, title, instructor, description)
+        VALUES (new.id, new.title, new.instructor, new.description);
+    END""",
+]
+
+
+def fts_available(using=connection):
+    return using.vendor == 'sqlite'
+
+
+def install_search_index(using=connection):
+    """
+    Create the FTS table and triggers if missing. Safe to re-run; it is called
+    after every migrate because SQLite table rebuilds drop the triggers.
+    """
+    if not fts_available(using) or 'students_course' not in using.introspection.table_names():
+        return
+    with using.cursor() as cursor:
+        for statement in INSTALL_SQL:
+            cursor.execute(statement)
+
+
+def rebuild_search_index(using=connection):
+    with using.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def match_expression(query):
+    """Turn free text into an FTS5 query: every word must match, as a prefix."""
+    terms = re.findall(r'\w+', query or '')
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def icontains_q(query):
+    """The admin-style search: every word appears somewhere, case-insensitively."""
+    condition = Q()
+    for term in (query or '').split():
+        condition &= Q(title__icontains=term) | Q(instructor__icontains=term) | Q(description__icontains=term)
+    return condition
+
+
+def highlighted(text):
+    if not text:
+        return ''
+    return mark_safe(escape(text).replace(MARK_START, '<mark>').replace(MARK_END, '</mark>'))
+
+
+def _course_conditions(queryset):
+    """
+    SQL restricting students_course rows to ``queryset``. Filters on Course's
+    own columns are inlined so each FTS match is checked by primary key;
+    anything involving joins falls back to an IN subquery.
+    """
+    query = queryset.query
+    if not query.where:
+        return '1', []
+    if len(query.alias_map) == 1:
+        compiler = query.get_compiler(queryset.db)
+        return compiler.compile(query.where)
+    subquery, params = queryset.values('id').query.sql_with_params()
+    return f'students_course.id IN ({subquery})', list(params)
+
+
+def search_courses(query, queryset, limit=50):
+    """
+    Return up to ``limit`` courses from ``queryset`` matching ``query``, best
+    first. Each course carries ``title_html`` and ``snippet_html`` with the
+    matched terms wrapped in <mark>.
+    """
+    from .models import Course
+
+    match = match_expression(query)
+    if not match:
+        return []
+
+    if not fts_available():
+        courses = list(queryset.filter(icontains_q(query)).order_by('title', 'id')[:limit])
+        for course in courses:
+            course.title_html = escape(course.title)
+            course.snippet_html = escape(course.description[:200])
+        return courses
+
+    where, params = _course_conditions(queryset)
+    courses = list(Course.objects.raw(
+        f"""SELECT students_course.*,
+               highlight({FTS_TABLE}, 0, %s, %s) AS title_marked,
+               snippet({FTS_TABLE}, 2, %s, %s, '…', 24) AS snippet_marked
+            FROM {FTS_TABLE}
+            JOIN students_course ON students_course.id = {FTS_TABLE}.rowid
+            WHERE {FTS_TABLE} MATCH %s AND {where}
+            ORDER BY bm25({FTS_TABLE}, 10.0, 5.0, 1.0)
+            LIMIT %s""",
+        [MARK_START, MARK_END, MARK_START, MARK_END, match, *params, limit],
+    ))
+    for course in courses:
+        course.title_html = highlighted(course.title_marked)
+        course.snippet_html = highlighted(course.snippet_marked)
+    return courses
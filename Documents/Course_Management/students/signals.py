@@ -0,0 +1,94 @@
+from django.db import connections, transaction
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.dispatch import receiver
+from .models import Course, Enrollment, FileUpload, SeatHold, Student, Waitlist
+from .membership import invalidate_enrollments
+from .search import install_search_index
+from .waitlist import schedule_promotion
+
+
+@receiver(post_save, sender=Enrollment)
+def enrollment_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    loaded = getattr(instance, '_loaded_values', {})
+    invalidate_enrollments([instance.student_id, loaded.get('student_id', instance.student_id)])
+    if created:
+        # students.enrollment.enroll_student() claims the seat itself
+        if not getattr(instance, '_counters_applied', False):
+            Course.adjust_enrollment_counts(instance.course_id, enrolled=1, active=int(instance.is_active))
+            Student.adjust_course_count(instance.student_id, 1)
+        Waitlist.objects.filter(student_id=instance.student_id, course_id=instance.course_id).delete()
+        # Enrolled without confirming a hold; its seat is no longer needed
+        SeatHold.objects.filter(student_id=instance.student_id, course_id=instance.course_id).delete()
+    elif not {'course_id', 'student_id', 'is_active'} <= loaded.keys():
+        # Saved without a known previous state (e.g. deferred fields)
+        Course.recount_enrollments([instance.course_id])
+        Student.recount_enrollments([instance.student_id])
+    else:
+        if loaded['course_id'] != instance.course_id:
+            # Enrollment moved to another course (admin change form)
+            Course.recount_enrollments([loaded['course_id'], instance.course_id])
+            schedule_promotion([loaded['course_id']])
+        elif loaded['is_active'] != instance.is_active:
+            Course.adjust_enrollment_counts(instance.course_id, active=1 if instance.is_active else -1)
+        if loaded['student_id'] != instance.student_id:
+            Student.recount_enrollments([loaded['student_id'], instance.student_id])
+    instance._loaded_values = {
+        'course_id': instance.course_id,
+        'student_id': instance.student_id,
+        'is_active': instance.is_active,
+    }
+
+
+@receiver(post_delete, sender=Enrollment)
+def enrollment_deleted(sender, instance, using, **kwargs):
+    loaded = getattr(instance, '_loaded_values', {})
+    course_id = loaded.get('course_id', instance.course_id)
+    Course.adjust_enrollment_counts(
+        course_id,
+        enrolled=-1,
+        active=-1 if loaded.get('is_active', instance.is_active) else 0,
+    )
+    Student.adjust_course_count(loaded.get('student_id', instance.student_id), -1)
+    invalidate_enrollments([loaded.get('student_id', instance.student_id)])
+    # Once per course and transaction, however many rows are deleted
+    schedule_promotion([course_id], using=using)
+
+
+@receiver(post_save, sender=SeatHold)
+def seat_hold_saved(sender, instance, created, raw=False, **kwargs):
+    # students.holds.place_hold() claims the seat itself
+    if created and not raw and not getattr(instance, '_counters_applied', False):
+        Course.adjust_enrollment_counts(instance.course_id, held=1)
+
+
+@receiver(post_delete, sender=SeatHold)
+def seat_hold_deleted(sender, instance, using, **kwargs):
+    # students.holds.confirm_hold() moves the seat to the new enrollment
+    if getattr(instance, '_converted', False):
+        return
+    Course.adjust_enrollment_counts(instance.course_id, held=-1)
+    schedule_promotion([instance.course_id], using=using)
+
+
+@receiver(post_save, sender=Course)
+def course_saved(sender, instance, created, raw=False, using=None, **kwargs):
+    # max_students may have been raised or the course reactivated
+    if not created and not raw:
+        schedule_promotion([instance.pk], using=using)
+
+
+@receiver(post_delete, sender=FileUpload)
+def file_upload_deleted(sender, instance, using, **kwargs):
+    # Drops the row's reference to its blob; the last one deletes the file
+    if instance.file:
+        storage, name = instance.file.storage, instance.file.name
+        transaction.on_commit(lambda: storage.delete(name), using=using)
+
+
+@receiver(post_migrate)
+def restore_search_index(sender, using, **kwargs):
+    # SQLite migrations that rebuild students_course drop its FTS triggers
+    if sender.name == 'students':
+        install_search_index(connections[using])
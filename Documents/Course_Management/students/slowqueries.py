@@ -0,0 +1,137 @@
+"""
+Slow-query log.
+
+Opt-in: with SLOW_QUERY_MS set, every database connection gets an execute
+wrapper that times each query. Queries at or over the threshold are appended
+to SLOW_QUERY_LOG as JSON lines with their normalized fingerprint, the view
+and URL name being served (from students.perf.PerformanceMiddleware), the
+innermost project stack frame and, on SQLite, the EXPLAIN QUERY PLAN output
+with full scans of the large tables flagged. Fast queries cost one
+perf_counter() pair.
+
+``manage.py slow_queries`` aggregates the log by fingerprint.
+"""
+
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+
+from .perf import current_request, install_execute_wrapper, uninstall_execute_wrapper
+
+logger = logging.getLogger(__name__)
+
+# Full scans of these tables grow with the data and are flagged in the log
+WATCHED_TABLES = ('students_enrollment', 'students_fileupload')
+
+# FROM "students_enrollment" U0, INNER JOIN "students_student" T3 ...
+TABLE_ALIAS_RE = re.compile(r'(?:FROM|JOIN)\s+"(\w+)"\s+(?:AS\s+)?"?(\w+)"?', re.I)
+
+_write_lock = threading.Lock()
+_THIS_FILE = os.path.abspath(__file__)
+# Execute wrappers between the caller and this one are not call sites
+_WRAPPER_FILES = {_THIS_FILE, os.path.join(os.path.dirname(_THIS_FILE), 'perf.py')}
+
+
+def fingerprint(sql):
+    """SQL with literals and placeholder lists collapsed, for grouping."""
+    sql = re.sub(r"'(?:[^']|'')*'", '?', sql)
+    sql = re.sub(r'\b\d+(\.\d+)?\b', '?', sql)
+    sql = re.sub(r'%s|\?', '?', sql)
+    sql = re.sub(r'\(\s*\?(\s*,\s*\?)*\s*\)', '(...)', sql)
+    return re.sub(r'\s+', ' ', sql).strip()
+
+
+def stack_sites(limit=5):
+    """Innermost-first 'path:line in function' frames from project code."""
+    root = str(settings.BASE_DIR) + os.sep
+    sites = []
+    frame = sys._getframe(2)
+    while frame is not None and len(sites) < limit:
+        filename = os.path.abspath(frame.f_code.co_filename)
+        if filename.startswith(root) and filename not in _WRAPPER_FILES and 'site-packages' not in filename:
+            sites.append(f'{os.path.relpath(filename, root)}:{frame.f_lineno} in {frame.f_code.co_name}')
+        frame = frame.f_back
+    return sites
+
+
+def explain(connection, sql, params):
+    """EXPLAIN QUERY PLAN rows, run on a raw cursor so it is not logged itself."""
+    if connection.vendor != 'sqlite' or not re.match(r'\s*(SELECT|UPDATE|DELETE|INSERT|WITH)\b', sql, re.I):
+        return []
+    from django.db.backends.sqlite3.base import SQLiteCursorWrapper
+
+    cursor = connection.connection.cursor(factory=SQLiteCursorWrapper)
+    try:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params or ())
+        return [row[-1] for row in cursor.fetchall()]
+    except Exception:
+        return []
+    finally:
+        cursor.close()
+
+
+def full_scans(plan, sql=''):
+    """Watched tables the plan reads end to end (SCAN rather than SEARCH),
+    including scans of a covering index: those grow with the table too.
+    Plans name aliased tables by alias (Django's subqueries use U0, U1...),
+    so ``sql`` is needed to map those back."""
+    aliases = dict((alias, table) for table, alias in TABLE_ALIAS_RE.findall(sql))
+    scanned = []
+    for detail in plan:
+        match = re.match(r'SCAN (?:TABLE )?(\w+)', detail)
+        table = match and aliases.get(match.group(1), match.group(1))
+        if table in WATCHED_TABLES:
+            scanned.append(table)
+    return scanned
+
+
+def record(sql, params, many, elapsed_ms, connection):
+    request = current_request.get() or {}
+    plan = [] if many else explain(connection, sql, params)
+    entry = {
+        'time': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'ms': round(elapsed_ms, 2),
+        'fingerprint': fingerprint(sql),
+        'sql': sql[:4000],
+        'view': request.get('view'),
+        'route': request.get('route'),
+        'stack': stack_sites(),
+        'plan': plan,
+        'full_scans': full_scans(plan, sql),
+    }
+    logger.warning('Slow query (%.1f ms) at %s: %s', elapsed_ms, entry['stack'][:1], entry['fingerprint'][:200])
+    path = getattr(settings, 'SLOW_QUERY_LOG', None)
+    if path:
+        line = json.dumps(entry) + '\n'
+        with _write_lock, open(path, 'a', encoding='utf-8') as f:
+            f.write(line)
+
+
+def slow_query_wrapper(execute, sql, params, many, context):
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        threshold = getattr(settings, 'SLOW_QUERY_MS', None)
+        if threshold is not None and elapsed_ms >= threshold:
+            try:
+                record(sql, params, many, elapsed_ms, context['connection'])
+            except Exception:
+                logger.exception('Could not record slow query')
+
+
+def install():
+    """Time queries on every connection, including ones already open."""
+    install_execute_wrapper(slow_query_wrapper, 'students.slowqueries')
+
+
+def uninstall():
+    uninstall_execute_wrapper(slow_query_wrapper, 'students.slowqueries')
@@ -0,0 +1,67 @@
+"""
+Content-addressed storage for course files.
+
+Every distinct file is stored once, under blobs/ab/cd/<sha256>, whatever
+name it is saved under: the same slide deck uploaded to five sections is one
+file with five references, and renaming a course moves nothing. The name a
+file was uploaded with is kept on FileUpload.filename.
+
+References are counted in Blob rows. save() adds one (writing the file only
+for new content) and delete() drops one, removing the file with the last.
+Both change the count and the file in a single immediate_atomic() block, so
+a delete never removes a blob that a concurrent upload has just reused.
+
+Files saved under their own names before this storage (see the
+dedup_uploads command) are deleted outright.
+"""
+
+import re
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage, storages
+
+BLOB_DIR = 'blobs'
+
+BLOB_NAME_RE = re.compile(rf'^{BLOB_DIR}/([0-9a-f]{{2}})/([0-9a-f]{{2}})/(\1\2[0-9a-f]{{60}})$')
+
+
+def blob_name(sha256):
+    return f'{BLOB_DIR}/{sha256[:2]}/{sha256[2:4]}/{sha256}'
+
+
+def blob_sha256(name):
+    """The SHA-256 a blob name was derived from, or None for any other name."""
+    match = BLOB_NAME_RE.match(name)
+    return match.group(3) if match else None
+
+
+def course_file_storage():
+    return storages['course_files']
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    def save(self, name, content, max_length=None):
+        from .db import immediate_atomic
+        from .models import Blob, file_sha256
+
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        # The hashing upload handlers have already computed it
+        sha256 = getattr(content, 'sha256', None) or file_sha256(content)
+        name = blob_name(sha256)
+        with immediate_atomic():
+            Blob.acquire(sha256, content.size)
+            if not self.exists(name):
+                self._save(name, content)
+        return name
+
+    def delete(self, name):
+        from .db import immediate_atomic
+        from .models import Blob
+
+        sha256 = blob_sha256(name)
+        if sha256 is None:
+            return super().delete(name)
+        with immediate_atomic():
+            if Blob.release(sha256):
+                super().delete(name)
@@ -1,3 +1,1803 @@
-from django.test import TestCase
+import csv
+import hashlib
+import json
+import os
+import random
+import re
+import shutil
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from io import StringIO
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.conf import settings
+from django.db import OperationalError, connection, transaction
+from django.db.models import F, Q
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .admin import FileUploadAdmin, activate_enrollments, deactivate_enrollments
+from .dataset import DEFAULT_EPOCH, DatasetGenerator
+from .db import immediate_atomic
+from .enrollment import CourseFullError, EnrollmentError, enroll_student
+from .holds import confirm_hold, expire_holds, place_hold, release_hold
+from .membership import enrolled_course_ids
+from .models import MAX_COURSES_PER_STUDENT, Blob, Course, Enrollment, FileUpload, SeatHold, Student, UploadSession, Waitlist
+from .pagination import encode_cursor, keyset_page
+from .provisioning import activation_path, provision_students
+from .search import search_courses
+from .storage import blob_name
+from .uploads import part_path
+from .waitlist import PendingPromotion, enroll_or_join_waitlist, join_waitlist, promote
+from . import asyncviews, metrics, perf, replicas, slowqueries, views
+
+
+class CacheResetMixin:
+    # Cached state is keyed by row ids, which the test database reuses after
+    # each test's rollback
+    def setUp(self):
+        cache.clear()
+        super().setUp()
+
+
+def make_course(title='Course', **kwargs):
+    defaults = {
+        'description': 'A course',
+        'instructor': 'Dr. Test',
+        'start_date': date.today(),
+        'end_date': date.today() + timedelta(days=90),
+    }
+    defaults.update(kwargs)
+    return Course.objects.create(title=title, **defaults)
+
+
+def make_student(username='student', student_id=None):
+    user = User.objects.create_user(username=username, password='password123')
+    return Student.objects.create(user=user, student_id=student_id or username.upper())
+
+
+class EnrollmentCounterTests(CacheResetMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.course = make_course()
+        self.students = [make_student(f'student{i}') for i in range(3)]
+
+    def assertCounts(self, total, active):
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.enrolled_count, total)
+        self.assertEqual(self.course.active_enrolled_count, active)
+
+    def test_create_toggle_and_delete(self):
+        enrollments = [Enrollment.objects.create(student=s, course=self.course) for s in self.students]
+        self.assertCounts(3, 3)
+
+        enrollment = Enrollment.objects.get(pk=enrollments[0].pk)
+        enrollment.is_active = False
+        enrollment.save()
+        enrollment.save()
+        self.assertCounts(3, 2)
+
+        enrollment.delete()
+        self.assertCounts(2, 2)
+
+        Enrollment.objects.filter(course=self.course).delete()
+        self.assertCounts(0, 0)
+
+    def test_cascade_delete_from_student(self):
+        for student in self.students:
+            Enrollment.objects.create(student=student, course=self.course)
+        self.students[0].user.delete()
+        self.assertCounts(2, 2)
+
+    def test_admin_actions_keep_counts(self):
+        for student in self.students:
+            Enrollment.objects.create(student=student, course=self.course)
+        deactivate_enrollments(None, None, Enrollment.objects.exclude(student=self.students[0]))
+        self.assertCounts(3, 1)
+        activate_enrollments(None, None, Enrollment.objects.all())
+        self.assertCounts(3, 3)
+
+    def test_saving_a_stale_course_keeps_counters(self):
+        stale = Course.objects.get(pk=self.course.pk)
+        enroll_student(self.students[0], self.course)
+        stale.max_students = 50
+        stale.save()
+        self.assertCounts(1, 1)
+        self.assertEqual(self.course.max_students, 50)
+        self.assertEqual(stale.enrolled_count, 1)
+
+    def test_recount_command_repairs_drift(self):
+        Enrollment.objects.create(student=self.students[0], course=self.course)
+        Course.objects.filter(pk=self.course.pk).update(enrolled_count=17, active_enrolled_count=9)
+        out = StringIO()
+        call_command('recount_enrollments', stdout=out)
+        self.assertCounts(1, 1)
+        self.assertIn('1 had drifted', out.getvalue())
+
+    def test_catalog_query_count_is_constant(self):
+        student = self.students[0]
+        self.client.force_login(student.user)
+        url = reverse('course_list')
+
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(url)
+        for i in range(20):
+            course = make_course(f'Extra {i}')
+            Enrollment.objects.create(student=student, course=course)
+        with CaptureQueriesContext(connection) as large:
+            self.client.get(url)
+        self.assertEqual(len(small), len(large))
+
+
+class EnrollmentServiceTests(CacheResetMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.student = make_student()
+
+    def test_enroll_updates_counters(self):
+        course = make_course()
+        enroll_student(self.student, course)
+        course.refresh_from_db()
+        self.student.refresh_from_db()
+        self.assertEqual((course.enrolled_count, course.active_enrolled_count), (1, 1))
+        self.assertEqual(self.student.course_count, 1)
+
+    def test_full_and_inactive_courses_are_rejected(self):
+        full = make_course('Full', max_students=1)
+        enroll_student(make_student('other'), full)
+        with self.assertRaisesMessage(EnrollmentError, 'full or inactive'):
+            enroll_student(self.student, full)
+        with self.assertRaisesMessage(EnrollmentError, 'full or inactive'):
+            enroll_student(self.student, make_course('Closed', is_active=False))
+        full.refresh_from_db()
+        self.assertEqual(full.enrolled_count, 1)
+
+    def test_student_course_limit(self):
+        for i in range(5):
+            enroll_student(self.student, make_course(f'Course {i}'))
+        extra = make_course('Extra')
+        with self.assertRaisesMessage(EnrollmentError, 'maximum number of courses'):
+            enroll_student(self.student, extra)
+        extra.refresh_from_db()
+        self.assertEqual(extra.enrolled_count, 0)
+
+    def test_duplicate_enrollment_rolls_back(self):
+        course = make_course()
+        enroll_student(self.student, course)
+        with self.assertRaisesMessage(EnrollmentError, 'already enrolled'):
+            enroll_student(self.student, course)
+        course.refresh_from_db()
+        self.student.refresh_from_db()
+        self.assertEqual(course.enrolled_count, 1)
+        self.assertEqual(self.student.course_count, 1)
+
+    def test_enroll_view(self):
+        course = make_course()
+        self.client.force_login(self.student.user)
+        response = self.client.post(reverse('enroll_course', args=[course.id]))
+        self.assertRedirects(response, reverse('course_detail', args=[course.id]))
+        self.assertTrue(Enrollment.objects.filter(student=self.student, course=course).exists())
+
+
+class WaitlistTests(CacheResetMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.course = make_course('Popular', max_students=2)
+        self.enrolled = [make_student(f'enrolled{i}') for i in range(2)]
+        for student in self.enrolled:
+            enroll_student(student, self.course)
+        self.waiting = [make_student(f'waiting{i}') for i in range(3)]
+        for student in self.waiting:
+            join_waitlist(student, self.course)
+
+    def assertEnrolled(self, students):
+        self.assertEqual(
+            set(Enrollment.objects.filter(course=self.course).values_list('student__user__username', flat=True)),
+            {student.user.username for student in students},
+        )
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.enrolled_count, len(students))
+
+    def test_full_course_enroll_view_joins_waitlist(self):
+        student = make_student('late')
+        self.client.force_login(student.user)
+        response = self.client.get(reverse('enroll_course', args=[self.course.id]))
+        self.assertContains(response, 'Join Waitlist')
+
+        response = self.client.post(reverse('enroll_course', args=[self.course.id]), follow=True)
+        self.assertRedirects(response, reverse('course_detail', args=[self.course.id]))
+        self.assertContains(response, 'You are number 4 on the waitlist')
+        self.assertEqual(Waitlist.objects.get(student=student).position, 4)
+
+        response = self.client.post(reverse('enroll_course', args=[self.course.id]))
+        self.assertContains(response, 'already on the waitlist')
+
+    def test_freed_seat_goes_to_next_in_line(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Enrollment.objects.get(student=self.enrolled[0]).delete()
+        self.assertEnrolled([self.enrolled[1], self.waiting[0]])
+        self.assertEqual(list(Waitlist.objects.values_list('student', flat=True)), [s.pk for s in self.waiting[1:]])
+        self.waiting[0].refresh_from_db()
+        self.assertEqual(self.waiting[0].course_count, 1)
+        self.assertIn(self.course.id, enrolled_course_ids(self.waiting[0]))
+
+    def test_students_at_course_limit_are_skipped(self):
+        for i in range(5):
+            enroll_student(self.waiting[0], make_course(f'Other {i}'))
+        self.course.refresh_from_db()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.course.max_students = 3
+            self.course.save()
+        self.assertEnrolled([*self.enrolled, self.waiting[1]])
+        self.assertTrue(Waitlist.objects.filter(student=self.waiting[0]).exists())
+
+    def test_deactivated_enrollment_keeps_its_seat(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            deactivate_enrollments(None, None, Enrollment.objects.filter(student=self.enrolled[0]))
+        self.assertEnrolled(self.enrolled)
+        self.assertEqual(Waitlist.objects.count(), 3)
+
+    def test_direct_enrollment_leaves_waitlist(self):
+        Course.objects.filter(pk=self.course.pk).update(max_students=3)
+        enroll_student(self.waiting[2], self.course)
+        self.assertFalse(Waitlist.objects.filter(student=self.waiting[2]).exists())
+
+    def test_live_holds_count_towards_the_course_limit(self):
+        elsewhere = [make_course(f'Other {i}') for i in range(MAX_COURSES_PER_STUDENT)]
+        for course in elsewhere[:-1]:
+            enroll_student(self.waiting[0], course)
+        place_hold(self.waiting[0], elsewhere[-1])
+        with self.captureOnCommitCallbacks(execute=True):
+            Enrollment.objects.get(student=self.enrolled[0]).delete()
+        self.assertEnrolled([self.enrolled[1], self.waiting[1]])
+        self.assertTrue(Waitlist.objects.filter(student=self.waiting[0]).exists())
+
+    def test_waiting_holder_is_enrolled_into_their_hold(self):
+        Course.objects.filter(pk=self.course.pk).update(max_students=4)
+        holder = make_student('holder')
+        place_hold(holder, self.course)
+        join_waitlist(holder, self.course)
+        # One free seat: the first in line takes it, the holder uses their own
+        self.assertEqual(len(promote([self.course.pk])), 2)
+        self.assertEnrolled([*self.enrolled, self.waiting[0], holder])
+        self.assertEqual(self.course.held_count, 0)
+        self.assertFalse(SeatHold.objects.exists())
+        self.assertEqual(list(Waitlist.objects.values_list('student', flat=True)), [s.pk for s in self.waiting[1:]])
+
+    def test_mass_drop_is_promoted_in_one_batch(self):
+        def promotion_queries(drop):
+            with self.captureOnCommitCallbacks() as callbacks:
+                Enrollment.objects.filter(course=self.course, student__in=drop).delete()
+            promotions = [callback for callback in callbacks if isinstance(callback, PendingPromotion)]
+            self.assertEqual(len(promotions), 1)
+            with CaptureQueriesContext(connection) as queries:
+                promotions[0]()
+            return len(queries)
+
+        one = promotion_queries(self.enrolled[:1])
+        self.assertEnrolled([self.enrolled[1], self.waiting[0]])
+
+        Course.objects.filter(pk=self.course.pk).update(max_students=30)
+        crowd = [
+            Student.objects.create(user=User.objects.create(username=f'crowd{i}'), student_id=f'CROWD{i}')
+            for i in range(25)
+        ]
+        for student in crowd:
+            join_waitlist(student, self.course)
+        Course.objects.filter(pk=self.course.pk).update(max_students=2)
+        self.assertEqual(promote([self.course.pk]), [])
+
+        everyone = [self.enrolled[1], self.waiting[0]]
+        Course.objects.filter(pk=self.course.pk).update(max_students=25)
+        self.assertEqual(promotion_queries(everyone), one)
+        self.assertEnrolled([*self.waiting[1:], *crowd[:23]])
+        self.assertEqual(Waitlist.objects.count(), 2)
+
+
+class SeatHoldTests(CacheResetMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.course = make_course('Checkout', max_students=2)
+        self.holder = make_student('holder')
+
+    def expire(self, *holds):
+        SeatHold.objects.filter(pk__in=[hold.pk for hold in holds]).update(
+            expires_at=timezone.now() - timedelta(seconds=1)
+        )
+
+    def assertSeats(self, enrolled, held):
+        self.course.refresh_from_db()
+        self.assertEqual((self.course.enrolled_count, self.course.held_count), (enrolled, held))
+
+    def test_hold_takes_a_seat_until_confirmed(self):
+        hold = place_hold(self.holder, self.course)
+        enroll_student(make_student('other'), self.course)
+        self.assertSeats(1, 1)
+        with self.assertRaises(CourseFullError):
+            enroll_student(make_student('late'), self.course)
+        with self.assertRaisesMessage(EnrollmentError, 'already hold'):
+            place_hold(self.holder, self.course)
+
+        enrollment = confirm_hold(hold)
+        self.assertEqual(enrollment.student, self.holder)
+        self.assertSeats(2, 0)
+        self.assertFalse(SeatHold.objects.exists())
+        self.holder.refresh_from_db()
+        self.assertEqual(self.holder.course_count, 1)
+        self.assertIn(self.course.id, enrolled_course_ids(self.holder))
+
+    def test_expired_hold_is_swept_by_the_next_claim(self):
+        hold = place_hold(self.holder, self.course)
+        place_hold(make_student('other'), self.course)
+        self.expire(hold)
+        late = make_student('late')
+        enroll_student(late, self.course)
+        self.assertSeats(1, 1)
+        with self.assertRaisesMessage(EnrollmentError, 'expired'):
+            confirm_hold(hold)
+        self.assertFalse(Enrollment.objects.filter(student=self.holder).exists())
+
+    def test_expired_hold_cannot_be_confirmed(self):
+        hold = place_hold(self.holder, self.course)
+        self.expire(hold)
+        with self.assertRaisesMessage(EnrollmentError, 'expired'):
+            confirm_hold(hold)
+        self.assertSeats(0, 1)
+        self.assertEqual(expire_holds(), 1)
+        self.assertSeats(0, 0)
+        # A fresh hold replaces the student's own lapsed one
+        place_hold(self.holder, self.course)
+        self.expire(*SeatHold.objects.all())
+        confirm_hold(place_hold(self.holder, self.course))
+        self.assertSeats(1, 0)
+
+    def test_live_holds_count_towards_the_course_limit(self):
+        courses = [make_course(f'Elective {i}') for i in range(MAX_COURSES_PER_STUDENT + 1)]
+        enroll_student(self.holder, courses[0])
+        holds = [place_hold(self.holder, course) for course in courses[1:-1]]
+        with self.assertRaisesMessage(EnrollmentError, 'maximum number of courses'):
+            place_hold(self.holder, courses[-1])
+        courses[-1].refresh_from_db()
+        self.assertEqual(courses[-1].held_count, 0)
+
+        self.expire(holds[0])
+        place_hold(self.holder, courses[-1])
+
+    def test_released_and_expired_holds_promote_the_waitlist(self):
+        hold = place_hold(self.holder, self.course)
+        other = place_hold(make_student('other'), self.course)
+        waiting = [make_student(f'waiting{i}') for i in range(2)]
+        for student in waiting:
+            self.assertIsInstance(enroll_or_join_waitlist(student, self.course), Waitlist)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(release_hold(hold))
+        self.assertSeats(1, 1)
+        self.assertTrue(Enrollment.objects.filter(student=waiting[0]).exists())
+
+        self.expire(other)
+        with self.captureOnCommitCallbacks(execute=True):
+            expire_holds()
+        self.assertSeats(2, 0)
+        self.assertFalse(Waitlist.objects.exists())
+
+    def test_checkout_views(self):
+        self.client.force_login(self.holder.user)
+        response = self.client.get(reverse('enroll_course', args=[self.course.id]))
+        self.assertContains(response, 'Hold a Seat')
+
+        response = self.client.post(reverse('hold_seat', args=[self.course.id]))
+        self.assertRedirects(response, reverse('seat_hold', args=[self.course.id]))
+        response = self.client.get(reverse('seat_hold', args=[self.course.id]))
+        self.assertContains(response, 'Your Seat Is Held')
+
+        response = self.client.post(reverse('seat_hold', args=[self.course.id]), {'action': 'confirm'})
+        self.assertRedirects(response, reverse('course_detail', args=[self.course.id]))
+        self.assertTrue(Enrollment.objects.filter(student=self.holder, course=self.course).exists())
+        self.assertEqual(self.client.get(reverse('seat_hold', args=[self.course.id])).status_code, 404)
+
+
+class EnrollmentConcurrencyTests(CacheResetMixin, TransactionTestCase):
+    SEATS = 50
+    REQUESTS = 300
+    MIN_ENROLLMENTS_PER_SECOND = 50
+
+    def test_parallel_enrollments_on_a_hot_course(self):
+        course = make_course('Hot', max_students=self.SEATS)
+        students = [
+            Student.objects.create(
+                user=User.objects.create(username=f'rush{i}'), student_id=f'RUSH{i}'
+            )
+            for i in range(self.REQUESTS)
+        ]
+
+        def attempt(student):
+            try:
+                enroll_student(student, course)
+                return True
+            except EnrollmentError:
+                return False
+            finally:
+                connection.close()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=32) as pool:
+            results = list(pool.map(attempt, students))
+        elapsed = time.perf_counter() - start
+
+        course.refresh_from_db()
+        self.assertEqual(results.count(True), self.SEATS)
+        self.assertEqual(Enrollment.objects.filter(course=course).count(), self.SEATS)
+        self.assertEqual(course.enrolled_count, self.SEATS)
+        self.assertEqual(Student.objects.filter(course_count=1).count(), self.SEATS)
+        self.assertGreater(self.REQUESTS / elapsed, self.MIN_ENROLLMENTS_PER_SECOND)
+
+
+class SeatHoldStressTests(CacheResetMixin, TransactionTestCase):
+    SEATS = 20
+    STUDENTS = 120
+
+    @override_settings(SEAT_HOLD_SECONDS=0.05)
+    def test_holds_expiring_and_confirming_never_oversubscribe(self):
+        course = make_course('Checkout rush', max_students=self.SEATS)
+        students = [
+            Student.objects.create(user=User.objects.create(username=f'buyer{i}'), student_id=f'BUYER{i}')
+            for i in range(self.STUDENTS)
+        ]
+        done = threading.Event()
+        samples = []
+
+        def checkout(index):
+            rng = random.Random(index)
+            student = students[index]
+            try:
+                if index % 4 == 0:
+                    enroll_or_join_waitlist(student, course)
+                    return
+                hold = place_hold(student, course)
+                # Some confirm in time, some too late, some give up
+                time.sleep(rng.choice([0, 0.01, 0.1]))
+                if rng.random() < 0.2:
+                    release_hold(hold)
+                else:
+                    confirm_hold(hold)
+            except EnrollmentError:
+                pass
+            finally:
+                connection.close()
+
+        def sweep():
+            try:
+                while not done.is_set():
+                    expire_holds()
+                    time.sleep(0.01)
+            finally:
+                connection.close()
+
+        def sample():
+            try:
+                while not done.is_set():
+                    try:
+                        samples.append(Course.objects.values_list('enrolled_count', 'held_count').get(pk=course.pk))
+                    except OperationalError:
+                        # The shared-cache test database locks tables for readers too
+                        pass
+                    time.sleep(0.005)
+            finally:
+                connection.close()
+
+        background = [threading.Thread(target=sweep), threading.Thread(target=sample)]
+        for thread in background:
+            thread.start()
+        try:
+            with ThreadPoolExecutor(max_workers=16) as pool:
+                list(pool.map(checkout, range(self.STUDENTS)))
+        finally:
+            done.set()
+            for thread in background:
+                thread.join()
+
+        self.assertTrue(samples)
+        self.assertLessEqual(max(enrolled + held for enrolled, held in samples), self.SEATS)
+        course.refresh_from_db()
+        enrollments = Enrollment.objects.filter(course=course).count()
+        self.assertLessEqual(enrollments, self.SEATS)
+        self.assertGreater(enrollments, 0)
+        self.assertEqual(course.enrolled_count, enrollments)
+        self.assertEqual(course.held_count, SeatHold.objects.filter(course=course).count())
+        self.assertEqual(
+            Student.objects.filter(course_count=1).count(), Enrollment.objects.values('student').distinct().count()
+        )
+        Course.recount_enrollments()
+        course.refresh_from_db()
+        self.assertEqual((course.enrolled_count, course.held_count), (enrollments, SeatHold.objects.count()))
+
+
+class SQLiteProfileTests(CacheResetMixin, TransactionTestCase):
+    def begins(self, block):
+        with CaptureQueriesContext(connection) as queries:
+            block()
+        return [q['sql'] for q in queries.captured_queries if q['sql'].startswith('BEGIN')]
+
+    def test_immediate_atomic_takes_the_write_lock_at_begin(self):
+        def block():
+            with immediate_atomic():
+                Course.objects.count()
+            with transaction.atomic():
+                Course.objects.count()
+        self.assertEqual(self.begins(block), ['BEGIN IMMEDIATE', 'BEGIN'])
+
+    def test_nested_immediate_atomic_joins_the_outer_transaction(self):
+        def block():
+            with transaction.atomic():
+                with immediate_atomic():
+                    Course.objects.count()
+        self.assertEqual(self.begins(block), ['BEGIN'])
+
+    def test_enrollment_runs_in_an_immediate_transaction(self):
+        course, student = make_course('Algorithms'), make_student()
+        self.assertEqual(self.begins(lambda: enroll_student(student, course)), ['BEGIN IMMEDIATE'])
+
+    def test_production_pragmas_are_applied_on_connect(self):
+        from course_management.sqlite_backend.base import DatabaseWrapper
+
+        db_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, db_dir)
+        production = DatabaseWrapper({
+            **connection.settings_dict,
+            'NAME': f'{db_dir}/production.sqlite3',
+            'OPTIONS': {'init_command': ';'.join(settings.SQLITE_PRODUCTION_PRAGMAS)},
+        }, alias='production')
+        self.addCleanup(production.close)
+        with production.cursor() as cursor:
+            values = {}
+            for pragma in ('journal_mode', 'synchronous', 'busy_timeout', 'cache_size', 'mmap_size'):
+                cursor.execute(f'PRAGMA {pragma}')
+                values[pragma] = cursor.fetchone()[0]
+        self.assertEqual(values, {
+            'journal_mode': 'wal', 'synchronous': 1, 'busy_timeout': 5000,
+            'cache_size': -65536, 'mmap_size': 268435456,
+        })
+
+
+class DownloadTests(CacheResetMixin, TestCase):
+    CONTENT = bytes(range(256)) * 1024
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.settings_override = override_settings(MEDIA_ROOT=media_root)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+        self.student = make_student()
+        self.course = make_course()
+        enroll_student(self.student, self.course)
+        self.upload = FileUpload.objects.create(
+            uploaded_by=self.student.user,
+            course=self.course,
+            title='Lecture',
+            file=SimpleUploadedFile('lecture.mp4', self.CONTENT),
+        )
+        self.url = reverse('download_file', args=[self.upload.id])
+        self.client.force_login(self.student.user)
+
+    def test_full_download_is_streamed(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(b''.join(response.streaming_content), self.CONTENT)
+        self.assertEqual(response['Content-Length'], str(len(self.CONTENT)))
+        self.assertEqual(response['Content-Type'], 'video/mp4')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+
+    def test_byte_ranges(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=100-199')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 100-199/{len(self.CONTENT)}')
+        self.assertEqual(b''.join(response.streaming_content), self.CONTENT[100:200])
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-10')
+        self.assertEqual(b''.join(response.streaming_content), self.CONTENT[-10:])
+
+        response = self.client.get(self.url, HTTP_RANGE=f'bytes={len(self.CONTENT)}-')
+        self.assertEqual(response.status_code, 416)
+
+    def test_conditional_requests(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(FILE_DOWNLOAD_BACKEND='nginx', FILE_DOWNLOAD_ACCEL_PREFIX='/protected/')
+    def test_nginx_offload(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected/' + self.upload.file.name)
+        self.assertEqual(response.content, b'')
+
+    @override_settings(FILE_DOWNLOAD_BACKEND='apache')
+    def test_apache_offload(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Sendfile'], self.upload.file.path)
+
+    def test_unenrolled_student_is_refused(self):
+        self.client.force_login(make_student('outsider').user)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+
+class ResumableUploadTests(CacheResetMixin, TestCase):
+    CONTENT = b'0123456789abcdef' * 10000
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(
+            MEDIA_ROOT=media_root, UPLOAD_SESSION_DIR=f'{media_root}/upload_sessions'
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.student = make_student()
+        self.course = make_course()
+        enroll_student(self.student, self.course)
+        self.client.force_login(self.student.user)
+
+    def start(self, content=None, sha256=None):
+        content = self.CONTENT if content is None else content
+        response = self.client.post(
+            reverse('upload_session_start', args=[self.course.id]),
+            json.dumps({
+                'title': 'Recording',
+                'filename': 'lecture.bin',
+                'size': len(content),
+                'sha256': sha256 or hashlib.sha256(content).hexdigest(),
+            }),
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 201)
+        return response.json()
+
+    def put(self, session, start, data):
+        return self.client.put(
+            session['url'], data, content_type='application/octet-stream',
+            HTTP_CONTENT_RANGE=f'bytes {start}-{start + len(data) - 1}/{len(self.CONTENT)}',
+        )
+
+    def test_chunked_upload_and_resume(self):
+        session = self.start()
+        self.assertEqual(self.put(session, 0, self.CONTENT[:50000]).json()['offset'], 50000)
+        # A gap is refused and the client is told where to resume
+        response = self.put(session, 90000, self.CONTENT[90000:100000])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['offset'], 50000)
+        # Re-sending an overlapping chunk is fine
+        self.assertEqual(self.put(session, 40000, self.CONTENT[40000:]).json()['offset'], len(self.CONTENT))
+
+        response = self.client.post(session['finalize_url'])
+        self.assertEqual(response.status_code, 201)
+        upload = FileUpload.objects.get(pk=response.json()['id'])
+        with upload.file.open('rb') as f:
+            self.assertEqual(f.read(), self.CONTENT)
+        self.assertFalse(UploadSession.objects.exists())
+
+    def test_checksum_mismatch_is_rejected(self):
+        session = self.start(sha256='0' * 64)
+        self.put(session, 0, self.CONTENT)
+        response = self.client.post(session['finalize_url'])
+        self.assertEqual(response.status_code, 422)
+        self.assertFalse(FileUpload.objects.exists())
+
+    def test_incomplete_upload_cannot_be_finalized(self):
+        session = self.start()
+        self.put(session, 0, self.CONTENT[:10])
+        self.assertEqual(self.client.post(session['finalize_url']).status_code, 409)
+
+    def test_sessions_are_private(self):
+        session = self.start()
+        self.client.force_login(make_student('other').user)
+        self.assertEqual(self.client.get(session['url']).status_code, 404)
+
+    def test_cleanup_command_removes_abandoned_sessions(self):
+        session = UploadSession.objects.get(pk=self.start()['id'])
+        fresh = UploadSession.objects.get(pk=self.start()['id'])
+        UploadSession.objects.filter(pk=session.pk).update(updated_at=session.updated_at - timedelta(days=2))
+        call_command('cleanup_upload_sessions', stdout=StringIO())
+        self.assertFalse(part_path(session).exists())
+        self.assertEqual(list(UploadSession.objects.all()), [fresh])
+
+
+class CourseCatalogPaginationTests(CacheResetMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        Course.objects.bulk_create([
+            Course(
+                title=f'Course {i % 7}',  # duplicate titles exercise the id tie-breaker
+                description='d', instructor='Dr. A' if i % 2 else 'Dr. B',
+                difficulty='advanced' if i % 3 == 0 else 'beginner',
+                credits=3, start_date=date(2026, 1, 1) + timedelta(days=i), end_date=date(2026, 12, 31),
+            )
+            for i in range(60)
+        ])
+        self.client.force_login(make_student().user)
+
+    def walk(self, params=None):
+        ids, params = [], dict(params or {})
+        while True:
+            response = self.client.get(reverse('course_list'), params)
+            page = response.context['courses']
+            ids.extend(c.id for c in page)
+            if not page.has_next:
+                return ids, page
+            params['after'] = page.next_cursor
+
+    def test_forward_walk_visits_every_course_once_in_order(self):
+        ids, _ = self.walk()
+        expected = list(Course.objects.order_by('title', 'id').values_list('id', flat=True))
+        self.assertEqual(ids, expected)
+
+    def test_previous_cursor_returns_previous_page(self):
+        first = keyset_page(Course.objects.all(), ('title', 'id'), 10)
+        second = keyset_page(Course.objects.all(), ('title', 'id'), 10, after=first.next_cursor)
+        back = keyset_page(Course.objects.all(), ('title', 'id'), 10, before=second.previous_cursor)
+        self.assertEqual([c.id for c in back], [c.id for c in first])
+        self.assertFalse(back.has_previous)
+
+    def test_filters_apply_across_pages(self):
+        ids, _ = self.walk({'difficulty': 'advanced', 'instructor': 'Dr. A'})
+        expected = Course.objects.filter(difficulty='advanced', instructor='Dr. A').order_by('title', 'id')
+        self.assertEqual(ids, list(expected.values_list('id', flat=True)))
+
+    def test_malformed_cursor_falls_back_to_first_page(self):
+        response = self.client.get(reverse('course_list'), {'after': 'not-a-cursor'})
+        self.assertEqual(len(response.context['courses']), views.COURSES_PER_PAGE)
+
+    def test_mistyped_cursor_falls_back_to_first_page(self):
+        self.async_client.force_login(User.objects.get(username='student'))
+        first = list(Course.objects.order_by('title', 'id').values_list('id', flat=True)[:views.COURSES_PER_PAGE])
+        for cursor in (['a', 'b'], [1, 'x']):
+            for param in ('after', 'before'):
+                params = {param: encode_cursor(cursor)}
+                for response in (
+                    self.client.get(reverse('course_list'), params),
+                    async_to_sync(self.async_client.get)(reverse('course_list'), params),
+                ):
+                    self.assertEqual([c.id for c in response.context['courses']], first)
+
+    def test_deep_pages_seek_through_the_index(self):
+        _, last = self.walk()
+        course = last.items[0]
+        queryset = Course.objects.filter(is_active=True).filter(
+            Q(title__gt=course.title) | Q(title=course.title, id__gt=course.id)
+        ).order_by('title', 'id')[:25]
+        self.assertIn('course_catalog_idx', queryset.explain())
+
+
+class CourseSearchTests(CacheResetMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.python = make_course('Python Programming', description='Functions, <b>classes</b> and generators.')
+        self.django = make_course('Web Development', description='Build sites with Django and Python.')
+        self.other = make_course('Cybersecurity', description='Threat analysis.', instructor='Dr. Python')
+        make_course('Old Python', is_active=False)
+        self.client.force_login(make_student().user)
+
+    def test_ranked_results_prefer_title_matches(self):
+        results = search_courses('python', Course.objects.filter(is_active=True))
+        self.assertEqual(results[0], self.python)
+        self.assertEqual(set(results), {self.python, self.django, self.other})
+
+    def test_querysets_with_joins(self):
+        student = make_student('searcher')
+        enroll_student(student, self.django)
+        mine = Course.objects.filter(enrollment__student=student)
+        self.assertEqual(search_courses('python', mine), [self.django])
+
+    def test_prefix_and_stemmed_matches(self):
+        active = Course.objects.filter(is_active=True)
+        self.assertEqual(search_courses('progr', active), [self.python])
+        self.assertEqual(search_courses('generator', active), [self.python])
+
+    def test_index_follows_updates_and_deletes(self):
+        active = Course.objects.filter(is_active=True)
+        Course.objects.filter(pk=self.other.pk).update(title='Quantum Computing')
+        self.assertEqual(search_courses('quantum', active), [self.other])
+        self.other.delete()
+        self.assertEqual(search_courses('quantum', active), [])
+
+    def test_snippets_are_escaped_and_highlighted(self):
+        course = search_courses('classes', Course.objects.all())[0]
+        self.assertIn('<mark>classes</mark>', course.snippet_html)
+        self.assertIn('&lt;b&gt;', course.snippet_html)
+
+    def test_catalog_search_box_and_json_endpoint(self):
+        response = self.client.get(reverse('course_list'), {'q': 'django', 'difficulty': 'beginner'})
+        self.assertEqual(list(response.context['courses']), [self.django])
+        response = self.client.get(reverse('course_search'), {'q': 'threat'})
+        self.assertEqual([r['id'] for r in response.json()['results']], [self.other.id])
+
+    def test_rebuild_command(self):
+        with connection.cursor() as cursor:
+            cursor.execute("INSERT INTO students_course_fts(students_course_fts) VALUES ('delete-all')")
+        self.assertEqual(search_courses('python', Course.objects.all()), [])
+        call_command('rebuild_course_search', stdout=StringIO())
+        self.assertEqual(len(search_courses('python', Course.objects.all())), 4)
+
+
+class AdminChangelistQueryTests(CacheResetMixin, TestCase):
+    CHANGELISTS = ['auth_user', 'students_student', 'students_course', 'students_enrollment', 'students_fileupload']
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'admin123')
+        self.client.force_login(self.admin)
+        self.created = 0
+
+    def add_rows(self, count):
+        for i in range(self.created, self.created + count):
+            student = make_student(f'pupil{i}')
+            course = make_course(f'Course {i}')
+            enroll_student(student, course)
+            FileUpload.objects.create(
+                uploaded_by=student.user, course=course, title=f'Notes {i}',
+                file=SimpleUploadedFile(f'notes{i}.txt', b'notes'),
+            )
+        self.created += count
+
+    def changelist_queries(self, name, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse(f'admin:{name}_changelist'), params or {})
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        self.add_rows(2)
+        small = {name: self.changelist_queries(name) for name in self.CHANGELISTS}
+        self.add_rows(30)
+        large = {name: self.changelist_queries(name) for name in self.CHANGELISTS}
+        self.assertEqual(small, large)
+
+    def test_annotated_columns_are_sortable(self):
+        self.add_rows(3)
+        # Column indexes follow list_display; the checkbox column is 0
+        self.changelist_queries('students_student', {'o': '5'})
+        self.changelist_queries('students_course', {'o': '5'})
+        self.changelist_queries('students_enrollment', {'o': '1.2'})
+
+
+class AccessPatternIndexTests(CacheResetMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.course = make_course('Algorithms')
+
+    def test_course_files_are_read_newest_first_from_the_index(self):
+        plan = FileUpload.objects.filter(course=self.course).order_by('-timestamp').explain()
+        self.assertIn('fileupload_course_recent_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_active_enrollments_of_a_course_use_the_partial_index(self):
+        plan = Enrollment.objects.filter(course=self.course, is_active=True).explain()
+        self.assertIn('enrollment_course_active_idx', plan)
+
+    def test_date_hierarchy_ranges_use_an_index(self):
+        now = timezone.now()
+        for queryset in (
+            Enrollment.objects.filter(enrollment_date__gte=now - timedelta(days=30), enrollment_date__lt=now),
+            FileUpload.objects.filter(timestamp__gte=now - timedelta(days=30), timestamp__lt=now),
+            Course.objects.filter(start_date__gte=date.today(), start_date__lt=date.today() + timedelta(days=30)),
+        ):
+            self.assertIn('USING INDEX', queryset.explain())
+
+
+class FileMetadataTests(CacheResetMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.student = make_student()
+        self.course = make_course()
+        enroll_student(self.student, self.course)
+        self.client.force_login(self.student.user)
+
+    def test_upload_view_records_metadata_while_streaming(self):
+        content = b'%PDF-1.4 slides' * 1000
+        self.client.post(reverse('upload_file', args=[self.course.id]), {
+            'title': 'Slides', 'file': SimpleUploadedFile('slides.pdf', content),
+        })
+        upload = FileUpload.objects.get()
+        self.assertEqual(upload.size, len(content))
+        self.assertEqual(upload.content_type, 'application/pdf')
+        self.assertEqual(upload.sha256, hashlib.sha256(content).hexdigest())
+
+    def test_display_paths_do_not_touch_storage(self):
+        upload = FileUpload.objects.create(
+            uploaded_by=self.student.user, course=self.course, title='Notes',
+            file=SimpleUploadedFile('notes.txt', b'hello'),
+        )
+        upload.file.storage.delete(upload.file.name)
+        self.assertEqual(upload.get_file_size(), 5)
+        self.assertIn(upload.sha256, FileUploadAdmin(FileUpload, admin.site).get_file_info(upload))
+
+    def test_backfill_command(self):
+        upload = FileUpload.objects.create(
+            uploaded_by=self.student.user, course=self.course, title='Notes',
+            file=SimpleUploadedFile('notes.txt', b'hello'),
+        )
+        FileUpload.objects.update(size=None, content_type='', sha256='')
+        call_command('backfill_file_metadata', stdout=StringIO())
+        upload.refresh_from_db()
+        self.assertEqual((upload.size, upload.content_type), (5, 'text/plain'))
+        self.assertEqual(upload.sha256, hashlib.sha256(b'hello').hexdigest())
+
+
+class ContentAddressedStorageTests(CacheResetMixin, TestCase):
+    CONTENT = b'%PDF-1.4 deck' * 100
+
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.teacher = User.objects.create_user(username='teacher', password='password123', is_staff=True)
+        self.courses = [make_course(f'Section {i}') for i in range(3)]
+        self.sha256 = hashlib.sha256(self.CONTENT).hexdigest()
+
+    def upload(self, course, filename='deck.pdf', content=None):
+        return FileUpload.objects.create(
+            uploaded_by=self.teacher, course=course, title='Deck',
+            file=SimpleUploadedFile(filename, content or self.CONTENT),
+        )
+
+    def stored_files(self):
+        return sorted(
+            os.path.relpath(os.path.join(dirpath, name), self.media_root)
+            for dirpath, _, names in os.walk(self.media_root) for name in names
+        )
+
+    def test_same_content_is_stored_once(self):
+        uploads = [self.upload(course, f'deck-{i}.pdf') for i, course in enumerate(self.courses)]
+        self.assertEqual({upload.file.name for upload in uploads}, {blob_name(self.sha256)})
+        self.assertEqual(self.stored_files(), [blob_name(self.sha256)])
+        self.assertEqual(Blob.objects.get().ref_count, 3)
+        self.assertEqual(uploads[1].get_file_name(), 'deck-1.pdf')
+
+        self.courses[0].title = 'Renamed'
+        self.courses[0].save()
+        with uploads[0].file.open('rb') as f:
+            self.assertEqual(f.read(), self.CONTENT)
+
+    def test_blob_deleted_with_last_reference(self):
+        first, second = self.upload(self.courses[0]), self.upload(self.courses[1])
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertEqual(self.stored_files(), [blob_name(self.sha256)])
+        self.assertEqual(Blob.objects.get().ref_count, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.courses[1].delete()
+        self.assertEqual(self.stored_files(), [])
+        self.assertFalse(Blob.objects.exists())
+
+    def test_replacing_the_file_releases_the_old_blob(self):
+        upload = FileUpload.objects.get(pk=self.upload(self.courses[0]).pk)
+        upload.file = SimpleUploadedFile('notes.txt', b'new notes')
+        with self.captureOnCommitCallbacks(execute=True):
+            upload.save()
+        new_sha256 = hashlib.sha256(b'new notes').hexdigest()
+        self.assertEqual(self.stored_files(), [blob_name(new_sha256)])
+        self.assertEqual(list(Blob.objects.values_list('sha256', 'ref_count')), [(new_sha256, 1)])
+
+    def test_download_keeps_the_uploaded_name(self):
+        upload = self.upload(self.courses[0], 'Week 1.pdf')
+        self.client.force_login(self.teacher)
+        response = self.client.get(reverse('download_file', args=[upload.id]))
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertIn('Week 1.pdf', response['Content-Disposition'])
+
+    def test_dedup_uploads_command(self):
+        legacy = {}
+        for i, course in enumerate(self.courses):
+            name = f'uploads/{course.title}/deck.pdf'
+            os.makedirs(os.path.join(self.media_root, os.path.dirname(name)))
+            with open(os.path.join(self.media_root, name), 'wb') as f:
+                f.write(self.CONTENT if i < 2 else b'other')
+            legacy[name] = course
+        FileUpload.objects.bulk_create([
+            FileUpload(uploaded_by=self.teacher, course=course, title='Deck', file=name)
+            for name, course in legacy.items()
+        ])
+
+        out = StringIO()
+        call_command('dedup_uploads', '--dry-run', stdout=out)
+        self.assertIn('Would move 2 files into blobs and drop 1 duplicates', out.getvalue())
+        self.assertEqual(len(self.stored_files()), 3)
+
+        call_command('dedup_uploads', stdout=StringIO())
+        other = hashlib.sha256(b'other').hexdigest()
+        self.assertEqual(self.stored_files(), sorted([blob_name(self.sha256), blob_name(other)]))
+        self.assertFalse(os.path.exists(os.path.join(self.media_root, 'uploads')))
+        self.assertEqual(dict(Blob.objects.values_list('sha256', 'ref_count')), {self.sha256: 2, other: 1})
+        upload = FileUpload.objects.get(course=self.courses[0])
+        self.assertEqual((upload.file.name, upload.get_file_name()), (blob_name(self.sha256), 'deck.pdf'))
+        self.assertEqual(upload.size, len(self.CONTENT))
+
+
+class EnrollmentMembershipCacheTests(CacheResetMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.student = make_student()
+        self.course = make_course()
+        enroll_student(self.student, self.course)
+        self.client.force_login(self.student.user)
+
+    def enrollment_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        return [q['sql'] for q in queries if 'students_enrollment' in q['sql']]
+
+    def test_hot_pages_skip_enrollment_queries_once_cached(self):
+        enrolled_course_ids(self.student)
+        self.assertEqual(self.enrollment_queries(reverse('course_list')), [])
+        self.assertEqual(self.enrollment_queries(reverse('course_detail', args=[self.course.id])), [])
+
+    def test_enroll_and_drop_invalidate(self):
+        other = make_course('Other')
+        self.assertEqual(enrolled_course_ids(self.student), {self.course.id})
+        enroll_student(self.student, other)
+        self.assertEqual(enrolled_course_ids(self.student), {self.course.id, other.id})
+
+        enrollment = Enrollment.objects.get(student=self.student, course=other)
+        enrollment.is_active = False
+        enrollment.save()
+        self.assertEqual(enrolled_course_ids(self.student), {self.course.id})
+
+        deactivate_enrollments(None, None, Enrollment.objects.all())
+        self.assertEqual(enrolled_course_ids(self.student), frozenset())
+
+    def test_course_delete_invalidates(self):
+        enrolled_course_ids(self.student)
+        self.course.delete()
+        self.assertEqual(enrolled_course_ids(self.student), frozenset())
+
+
+class CourseFragmentCacheTests(CacheResetMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.course = make_course('Algorithms', description='Sorting and searching.')
+        self.student = make_student()
+        self.client.force_login(self.student.user)
+
+    def test_save_bumps_version_and_refreshes_fragments(self):
+        for url in (reverse('course_list'), reverse('course_detail', args=[self.course.id])):
+            self.assertContains(self.client.get(url), 'Sorting and searching.')
+
+        # Bypassing save() keeps the cached fragment
+        Course.objects.filter(pk=self.course.pk).update(description='Graphs.')
+        self.assertContains(self.client.get(reverse('course_list')), 'Sorting and searching.')
+
+        course = Course.objects.get(pk=self.course.pk)
+        course.description = 'Dynamic programming.'
+        course.save()
+        self.assertEqual(course.version, 2)
+        for url in (reverse('course_list'), reverse('course_detail', args=[self.course.id])):
+            self.assertContains(self.client.get(url), 'Dynamic programming.')
+
+    def test_per_user_state_stays_outside_the_fragment(self):
+        self.client.get(reverse('course_list'))
+        enroll_student(self.student, self.course)
+        response = self.client.get(reverse('course_list'))
+        self.assertContains(response, 'Enrolled')
+        self.assertContains(response, '1/30')
+
+        self.client.force_login(make_student('other').user)
+        response = self.client.get(reverse('course_list'))
+        self.assertNotContains(response, 'fa-check me-1"></i>Enrolled')
+        self.assertContains(response, reverse('enroll_course', args=[self.course.id]))
+
+
+class RosterImportTests(CacheResetMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.algorithms = make_course('Algorithms', max_students=2)
+        self.databases = make_course('Databases')
+
+    def import_roster(self, name, content, *args):
+        path = f'{self.tmpdir}/{name}'
+        with open(path, 'w') as f:
+            f.write(content)
+        out = StringIO()
+        call_command('import_roster', path, *args, stdout=out)
+        return path, out.getvalue()
+
+    def test_csv_import_creates_users_students_and_enrollments(self):
+        existing = make_student('alice', 'S1')
+        enrolled_course_ids(existing)
+        path, out = self.import_roster('roster.csv', (
+            'student_id,username,email,first_name,last_name,courses\n'
+            'S1,alice,,,,Algorithms\n'
+            'S2,bob,bob@example.com,Bob,Jones,Algorithms;Databases\n'
+            'S3,carol,,,,Algorithms\n'
+            'S3,,,,,Nonexistent\n'
+            ',nobody,,,,Databases\n'
+        ), '--chunk-size', '2')
+
+        self.assertIn('Imported 5 rows', out)
+        bob = Student.objects.get(student_id='S2')
+        self.assertEqual(bob.user.email, 'bob@example.com')
+        self.assertFalse(bob.user.has_usable_password())
+        self.assertEqual(bob.course_count, 2)
+        self.algorithms.refresh_from_db()
+        self.assertEqual(self.algorithms.enrolled_count, 2)
+        self.assertEqual(enrolled_course_ids(existing), frozenset([self.algorithms.id]))
+
+        with open(f'{path}.errors.csv') as f:
+            errors = list(csv.reader(f))[1:]
+        self.assertEqual([line for line, _, _ in errors], ['4', '5', '6'])
+        self.assertIn('full or inactive', errors[0][2])
+        self.assertIn('not found', errors[1][2])
+
+    def test_jsonl_import_enforces_course_limit(self):
+        courses = [make_course(f'Course {i}').title for i in range(6)]
+        self.import_roster('roster.jsonl', (
+            json.dumps({'student_id': 'S1', 'courses': courses}) + '\n'
+            + 'not json\n'
+        ))
+        student = Student.objects.get(student_id='S1')
+        self.assertEqual(student.course_count, 5)
+        self.assertEqual(Enrollment.objects.filter(student=student).count(), 5)
+
+    def test_jsonl_rejects_malformed_courses(self):
+        path, out = self.import_roster('roster.jsonl', (
+            json.dumps({'student_id': 'S1', 'courses': 5}) + '\n'
+            + json.dumps({'student_id': 'S2', 'courses': ['Databases']}) + '\n'
+        ))
+        self.assertIn('Imported 2 rows', out)
+        self.assertEqual(list(Enrollment.objects.values_list('student__student_id', flat=True)), ['S2'])
+        with open(f'{path}.errors.csv') as f:
+            errors = list(csv.reader(f))[1:]
+        self.assertEqual([(line, sid) for line, sid, _ in errors], [('1', 'S1')])
+        self.assertIn('courses must be', errors[0][2])
+
+    def test_reimport_is_idempotent(self):
+        roster = 'student_id,courses\nS1,Algorithms;Databases\n'
+        self.import_roster('roster.csv', roster)
+        self.import_roster('roster.csv', roster)
+        self.assertEqual(User.objects.count(), 1)
+        self.assertEqual(Enrollment.objects.count(), 2)
+        self.assertEqual(Student.objects.get().course_count, 2)
+
+    def test_queries_do_not_grow_with_rows(self):
+        rows = ''.join(f'S{i},Databases\n' for i in range(20))
+        with CaptureQueriesContext(connection) as small:
+            self.import_roster('small.csv', 'student_id,courses\n' + rows[:rows.index('S2,')])
+        with CaptureQueriesContext(connection) as large:
+            self.import_roster('large.csv', 'student_id,courses\n' + rows.replace('S', 'T'))
+        self.assertEqual(len(small), len(large))
+
+
+class ProvisioningTests(CacheResetMixin, TestCase):
+    def accounts(self, count, prefix='new'):
+        return [
+            {'username': f'{prefix}{i}', 'password': f'pw-{i}-secret', 'student_id': f'{prefix.upper()}{i}'}
+            for i in range(count)
+        ]
+
+    def test_pool_hashes_match_serial_semantics(self):
+        result = provision_students(self.accounts(3), workers=2, batch_size=2)
+        self.assertEqual(len(result.users), 3)
+        for i in range(3):
+            user = User.objects.get(username=f'new{i}')
+            self.assertTrue(user.check_password(f'pw-{i}-secret'))
+            self.assertEqual(user.student.student_id, f'NEW{i}')
+
+    def test_existing_accounts_are_skipped(self):
+        make_student('new0')
+        result = provision_students(self.accounts(2), workers=1)
+        self.assertEqual([user.username for user in result.users], ['new1'])
+        self.assertEqual(result.errors, [('new0', 'username already exists')])
+
+    def test_incomplete_rows_are_reported_not_fatal(self):
+        accounts = self.accounts(3)
+        del accounts[0]['student_id']
+        del accounts[1]['username']
+        result = provision_students(accounts, workers=1)
+        self.assertEqual([user.username for user in result.users], ['new2'])
+        self.assertEqual(result.errors, [
+            ('new0', 'username and student_id are required'),
+            ('', 'username and student_id are required'),
+        ])
+
+    def test_force_reset_accounts_activate_through_link(self):
+        result = provision_students(self.accounts(2), force_reset=True)
+        user = result.users[0]
+        self.assertFalse(User.objects.get(pk=user.pk).has_usable_password())
+        self.assertFalse(self.client.login(username=user.username, password='pw-0-secret'))
+
+        link = activation_path(user)
+        response = self.client.get(link, follow=True)
+        self.assertContains(response, 'Choose a password')
+        response = self.client.post(response.redirect_chain[-1][0], {
+            'new_password1': 'correct-horse-battery', 'new_password2': 'correct-horse-battery',
+        })
+        self.assertRedirects(response, reverse('login'))
+        self.assertTrue(self.client.login(username=user.username, password='correct-horse-battery'))
+
+        # The token is single use
+        self.client.logout()
+        self.assertContains(self.client.get(link, follow=True), 'invalid')
+
+
+class DatasetGeneratorTests(CacheResetMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.settings_override = override_settings(MEDIA_ROOT=media_root)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+    def generate(self, **kwargs):
+        options = {'students': 300, 'courses': 20, 'files': 5, 'file_size': 1000, 'batch_size': 70}
+        options.update(kwargs)
+        return DatasetGenerator(**options).run()
+
+    def test_limits_and_counters_hold(self):
+        generator = self.generate()
+        self.assertEqual(Student.objects.count(), 300)
+        self.assertEqual(Enrollment.objects.count(), generator.enrollments)
+        self.assertGreater(generator.full_courses, 0)
+        self.assertTrue(Enrollment.objects.filter(is_active=False).exists())
+        self.assertFalse(Course.objects.filter(enrolled_count__gt=F('max_students')).exists())
+        self.assertFalse(Student.objects.filter(course_count__gt=5).exists())
+        self.assertFalse(Enrollment.objects.filter(course__is_active=False).exists())
+
+        counters = list(Course.objects.order_by('pk').values_list('enrolled_count', 'active_enrolled_count'))
+        Course.recount_enrollments()
+        self.assertEqual(counters, list(Course.objects.order_by('pk').values_list('enrolled_count', 'active_enrolled_count')))
+        course_counts = list(Student.objects.order_by('pk').values_list('course_count', flat=True))
+        Student.recount_enrollments()
+        self.assertEqual(course_counts, list(Student.objects.order_by('pk').values_list('course_count', flat=True)))
+
+        upload = FileUpload.objects.first()
+        self.assertEqual(upload.file.size, 1000)
+        self.assertEqual(upload.sha256, hashlib.sha256(bytes(1000)).hexdigest())
+
+    def test_same_seed_same_data(self):
+        def snapshot():
+            return list(Enrollment.objects.order_by('pk').values_list(
+                'student__student_id', 'course__title', 'course__start_date', 'enrollment_date', 'is_active'
+            ))
+
+        # Not today's date: the default epoch is fixed
+        epoch = DEFAULT_EPOCH
+        self.generate(prefix='a')
+        first = snapshot()
+        self.assertTrue(all(
+            epoch - timedelta(days=60) <= start <= epoch + timedelta(days=180) for _, _, start, _, _ in first
+        ))
+        self.assertEqual({timezone.localdate(enrolled) for _, _, _, enrolled, _ in first}, {epoch})
+        self.assertEqual(set(FileUpload.objects.values_list('timestamp__date', flat=True)), {epoch})
+        FileUpload.objects.all().delete()
+        Course.objects.all().delete()
+        User.objects.all().delete()
+        self.generate(prefix='a')
+        self.assertEqual(snapshot(), first)
+
+
+class QueryBudgetTests(CacheResetMixin, TestCase):
+    """
+    Every student-facing URL and admin page must issue the same number of
+    queries whether the database holds a little data or more of it; a
+    difference means a per-row query (N+1) crept into a view or template.
+    """
+    SMALL, LARGE = 2, 7
+    MAX_QUERIES = 25
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.settings_override = override_settings(
+            MEDIA_ROOT=media_root, UPLOAD_SESSION_DIR=f'{media_root}/upload_sessions'
+        )
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+        self.student = make_student()
+        self.admin_user = User.objects.create_superuser('root', 'root@example.com', 'password123')
+        self.courses, self.others = [], []
+
+    def grow(self, size):
+        """Bring every table up to ``size`` rows that the pages list."""
+        for i in range(len(self.courses), size):
+            course = make_course(f'Course {i}', max_students=100)
+            self.courses.append(course)
+            other = make_student(f'other{i}')
+            self.others.append(other)
+            Enrollment.objects.create(student=other, course=self.courses[0])
+            if i < 5:
+                Enrollment.objects.create(student=self.student, course=course, is_active=i != 4)
+            FileUpload.objects.create(
+                uploaded_by=other.user, course=self.courses[0], title=f'File {i}',
+                file=SimpleUploadedFile(f'file{i}.txt', b'content'),
+            )
+            UploadSession.objects.create(
+                uploaded_by=self.student.user, course=self.courses[0], title=f'Upload {i}',
+                filename=f'upload{i}.txt', size=10, sha256='0' * 64,
+            )
+
+    def student_requests(self):
+        course = self.courses[0]
+        session = UploadSession.objects.filter(uploaded_by=self.student.user).first()
+        upload = FileUpload.objects.filter(course=course).first()
+        return [
+            ('get', reverse('course_list'), {}),
+            ('get', reverse('course_list'), {'difficulty': 'beginner', 'credits': 3}),
+            ('get', reverse('course_list'), {'q': 'course'}),
+            ('get', reverse('course_search'), {'q': 'course'}),
+            ('get', reverse('course_detail', args=[course.id]), {}),
+            ('get', reverse('enroll_course', args=[self.courses[-1].id]), {}),
+            ('get', reverse('my_courses'), {}),
+            ('get', reverse('upload_file', args=[course.id]), {}),
+            ('post', reverse('upload_session_start', args=[course.id]), {}),
+            ('get', reverse('upload_session', args=[session.pk]), {}),
+            ('post', reverse('upload_session_finalize', args=[session.pk]), {}),
+            ('get', reverse('download_file', args=[upload.id]), {}),
+            ('get', reverse('delete_file', args=[upload.id]), {}),
+        ]
+
+    def anonymous_requests(self):
+        return [
+            ('get', reverse('register'), {}),
+            ('get', reverse('admin_register'), {}),
+            ('get', reverse('login'), {}),
+            ('get', activation_path(self.student.user), {}),
+            ('get', reverse('metrics'), {}),
+        ]
+
+    def admin_requests(self):
+        requests = [('get', reverse('perf_stats'), {})]
+        for model in admin.site._registry:
+            opts = model._meta
+            obj = model.objects.order_by('pk').first()
+            requests.append(('get', reverse(f'admin:{opts.app_label}_{opts.model_name}_changelist'), {}))
+            if obj is not None:
+                requests.append(('get', reverse(f'admin:{opts.app_label}_{opts.model_name}_change', args=[obj.pk]), {}))
+        return requests
+
+    def measure(self, user, requests):
+        counts = {}
+        for method, url, data in requests:
+            if user:
+                self.client.force_login(user)
+            else:
+                self.client.logout()
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                response = getattr(self.client, method)(url, data)
+                if hasattr(response, 'streaming_content'):
+                    b''.join(response.streaming_content)
+            self.assertLess(response.status_code, 500, url)
+            counts[(method, url, tuple(sorted(data.items())))] = [q['sql'] for q in queries.captured_queries]
+        return counts
+
+    def measure_all(self):
+        return {
+            **self.measure(self.student.user, self.student_requests()),
+            **self.measure(None, self.anonymous_requests()),
+            **self.measure(self.admin_user, self.admin_requests()),
+        }
+
+    def test_query_counts_do_not_grow_with_data(self):
+        self.grow(self.SMALL)
+        # Fills per-process caches (content types, permissions) first
+        self.measure_all()
+        small = self.measure_all()
+        self.grow(self.LARGE)
+        large = self.measure_all()
+
+        for key, queries in large.items():
+            method, url, data = key
+            with self.subTest(method=method, url=url, data=data):
+                self.assertLessEqual(len(queries), self.MAX_QUERIES, format_queries(queries))
+                if key in small:
+                    self.assertEqual(
+                        len(queries), len(small[key]),
+                        f'{len(small[key])} queries with {self.SMALL} rows, {len(queries)} with '
+                        f'{self.LARGE}:\n{format_queries(queries)}'
+                    )
+
+
+def format_queries(queries):
+    """Numbered SQL, with repeated statements (likely N+1s) counted first."""
+    shapes = Counter(re.sub(r'\b\d+\b', 'N', sql) for sql in queries)
+    repeated = [f'  {count}x {shape}' for shape, count in shapes.most_common() if count > 1]
+    lines = ['Repeated statements:', *repeated, ''] if repeated else []
+    lines.extend(f'{i}. {sql}' for i, sql in enumerate(queries, start=1))
+    return '\n'.join(lines)
+
+
+class PerformanceMiddlewareTests(CacheResetMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        perf.reset()
+        self.addCleanup(perf.reset)
+        make_course('Algorithms')
+        self.student = make_student()
+        self.client.force_login(self.student.user)
+
+    def test_server_timing_and_stats(self):
+        response = self.client.get(reverse('course_list'))
+        match = re.fullmatch(
+            r'app;dur=([\d.]+), db;dur=([\d.]+);desc="(\d+) queries", tpl;dur=([\d.]+)',
+            response['Server-Timing'],
+        )
+        self.assertIsNotNone(match, response['Server-Timing'])
+        self.assertGreater(int(match.group(3)), 0)
+        self.assertGreater(float(match.group(4)), 0)
+
+        staff = User.objects.create_user('teacher', password='password123', is_staff=True)
+        self.client.force_login(staff)
+        stats = self.client.get(reverse('perf_stats')).json()['routes']['course_list']
+        self.assertEqual(stats['requests'], 1)
+        self.assertEqual(stats['queries']['mean'], int(match.group(3)))
+        self.assertEqual(stats['response_bytes']['total'], len(response.content))
+        self.assertGreater(stats['template_ms']['p50'], 0)
+
+        self.client.post(reverse('perf_stats'))
+        self.assertNotIn('course_list', self.client.get(reverse('perf_stats')).json()['routes'])
+
+    def test_stats_are_staff_only(self):
+        response = self.client.get(reverse('perf_stats'))
+        self.assertEqual(response.status_code, 302)
+        self.assertNotIn('routes', response.content.decode())
+
+    def test_histogram_percentiles(self):
+        histogram = perf.Histogram()
+        for ms in range(1, 101):
+            histogram.add(ms)
+        summary = histogram.summary(100)
+        self.assertEqual(summary['max'], 100)
+        self.assertEqual(summary['mean'], 50.5)
+        # Bucket bounds are 25% apart
+        self.assertTrue(50 <= summary['p50'] <= 50 * 1.25)
+        self.assertTrue(95 <= summary['p95'] <= 100)
+
+
+class MetricsTests(CacheResetMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.settings_override = override_settings(MEDIA_ROOT=media_root)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        self.course = make_course('Algorithms "A"', max_students=3)
+        self.student = make_student()
+        enroll_student(self.student, self.course)
+
+    def scrape(self):
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response['Content-Type'], metrics.CONTENT_TYPE)
+        return dict(
+            line.rsplit(' ', 1) for line in response.content.decode().splitlines() if not line.startswith('#')
+        )
+
+    def test_gauges(self):
+        FileUpload.objects.create(
+            uploaded_by=self.student.user, course=self.course, title='Notes',
+            file=SimpleUploadedFile('notes.txt', b'x' * 100),
+        )
+        samples = self.scrape()
+        self.assertEqual(samples[f'course_seats_remaining{{course_id="{self.course.id}",title="Algorithms \\"A\\""}}'], '2')
+        self.assertEqual(samples['enrollments_active'], '1')
+        self.assertEqual(samples['enrollments_last_hour'], '1')
+        self.assertEqual(samples['upload_bytes_last_hour'], '100')
+        self.assertIn('sessions_active', samples)
+
+    def test_held_seats_are_not_free(self):
+        place_hold(make_student('holder'), self.course)
+        enroll_student(make_student('other'), self.course)
+        samples = self.scrape()
+        labels = f'{{course_id="{self.course.id}",title="Algorithms \\"A\\""}}'
+        self.assertEqual(samples[f'course_seats_remaining{labels}'], '0')
+        self.assertEqual(samples[f'course_seats_held{labels}'], '1')
+        self.assertEqual(samples['courses_full'], '1')
+
+    def test_refresh_reads_only_new_rows(self):
+        self.scrape()
+        enroll_student(make_student('other'), self.course)
+        # Cached until the TTL expires
+        self.assertEqual(self.scrape()['enrollments_last_hour'], '1')
+
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            samples = self.scrape()
+        self.assertEqual(samples['enrollments_last_hour'], '2')
+        self.assertNotIn('enrollments_created_total', samples)
+        for query in queries.captured_queries:
+            sql = query['sql']
+            if 'students_enrollment' in sql or 'students_fileupload' in sql:
+                self.assertNotRegex(sql, r'COUNT|SUM')
+                self.assertIn('"id" >', sql)
+
+    def test_old_rows_leave_the_window(self):
+        Enrollment.objects.update(enrollment_date=timezone.now() - timedelta(hours=2))
+        self.assertEqual(self.scrape()['enrollments_last_hour'], '0')
+
+    @override_settings(METRICS_TOKEN='s3cret')
+    def test_token(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 401)
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer s3cret')
+        self.assertEqual(response.status_code, 200)
+
+    def test_remote_clients_need_staff_or_a_token(self):
+        remote = {'REMOTE_ADDR': '203.0.113.7'}
+        self.assertEqual(self.client.get(reverse('metrics'), **remote).status_code, 403)
+        self.client.force_login(self.student.user)
+        self.assertEqual(self.client.get(reverse('metrics'), **remote).status_code, 403)
+        self.client.force_login(User.objects.create_user('ops', is_staff=True))
+        self.assertEqual(self.client.get(reverse('metrics'), **remote).status_code, 200)
+
+
+class SlowQueryLogTests(CacheResetMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        log_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, log_dir)
+        self.log = f'{log_dir}/slow.jsonl'
+        self.settings_override = override_settings(SLOW_QUERY_MS=0, SLOW_QUERY_LOG=self.log)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        self.course = make_course('Algorithms')
+        self.student = make_student()
+        enroll_student(self.student, self.course)
+        slowqueries.install()
+        self.addCleanup(slowqueries.uninstall)
+        # The JSON log is what is checked; keep warnings out of the test output
+        slowqueries.logger.disabled = True
+        self.addCleanup(setattr, slowqueries.logger, 'disabled', False)
+
+    def entries(self):
+        with open(self.log) as f:
+            return [json.loads(line) for line in f]
+
+    def test_logs_view_site_and_full_scans(self):
+        self.client.force_login(self.student.user)
+        self.client.get(reverse('course_detail', args=[self.course.id]))
+        Enrollment.objects.filter(is_active=True).count()
+
+        entries = self.entries()
+        in_view = [e for e in entries if e['route'] == 'course_detail']
+        self.assertTrue(in_view)
+        self.assertEqual(in_view[0]['view'], 'students.views.course_detail')
+
+        scan = next(e for e in entries if e['full_scans'])
+        self.assertEqual(scan['full_scans'], ['students_enrollment'])
+        self.assertIsNone(scan['view'])
+        self.assertRegex(scan['stack'][0], r'^students/tests\.py:\d+ in test_logs_view_site_and_full_scans$')
+
+        # Looked up by primary key: no scan flagged
+        lookup = next(e for e in entries if 'FROM "students_course" WHERE "students_course"."id" = ?' in e['fingerprint'])
+        self.assertEqual(lookup['full_scans'], [])
+        self.assertTrue(lookup['plan'])
+
+    def test_full_scan_in_subquery(self):
+        list(Course.objects.filter(pk__in=Enrollment.objects.filter(is_active=False).values('course_id')))
+        scan = next(e for e in self.entries() if 'U0' in e['fingerprint'])
+        self.assertIn('SCAN U0', scan['plan'])
+        self.assertEqual(scan['full_scans'], ['students_enrollment'])
+
+    def test_threshold(self):
+        with override_settings(SLOW_QUERY_MS=10000):
+            Course.objects.count()
+        with self.assertRaises(FileNotFoundError):
+            self.entries()
+
+    def test_fingerprint(self):
+        self.assertEqual(
+            slowqueries.fingerprint("SELECT * FROM t WHERE a IN (%s, %s, %s) AND b = 'x''y' LIMIT 21"),
+            'SELECT * FROM t WHERE a IN (...) AND b = ? LIMIT ?',
+        )
+
+    def test_command_prints_top_offenders(self):
+        for _ in range(3):
+            Enrollment.objects.filter(is_active=True).count()
+        out = StringIO()
+        call_command('slow_queries', '--full-scans', '--top', '1', stdout=out)
+        output = out.getvalue()
+        self.assertIn('1. 3x', output)
+        self.assertIn('FULL SCAN: students_enrollment', output)
+        self.assertIn('plan: SCAN students_enrollment', output)
+
+
+class RecordingReplicaRouter(replicas.ReplicaRouter):
+    """Records where reads would go, then runs them on the test database."""
+    reads = []
+
+    def db_for_read(self, model, **hints):
+        self.reads.append((model._meta.label, super().db_for_read(model, **hints)))
+        return None
+
+
+@override_settings(DATABASE_ROUTERS=['students.tests.RecordingReplicaRouter'], REPLICA_DATABASES=['replica1'])
+class ReplicaRoutingTests(CacheResetMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.course = make_course('Algorithms')
+        self.student = make_student()
+        self.client.force_login(self.student.user)
+        RecordingReplicaRouter.reads = []
+
+    def routed(self, label):
+        return {alias for model, alias in RecordingReplicaRouter.reads if model == label}
+
+    def test_catalog_and_course_pages_read_from_the_replica(self):
+        for url in (reverse('course_list'), reverse('course_detail', args=[self.course.id])):
+            RecordingReplicaRouter.reads = []
+            self.client.get(url)
+            self.assertEqual(self.routed('students.Course'), {'replica1'})
+            # Sessions are read back right after they are written
+            self.assertEqual(self.routed('sessions.Session'), {None})
+
+    def test_other_pages_read_from_the_primary(self):
+        self.client.get(reverse('my_courses'))
+        self.assertEqual(self.routed('students.Enrollment'), {None})
+
+    def test_admin_change_lists_read_from_the_replica(self):
+        admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'password123')
+        self.client.force_login(admin_user)
+        RecordingReplicaRouter.reads = []
+        self.client.get(reverse('admin:students_course_changelist'))
+        self.assertEqual(self.routed('students.Course'), {'replica1'})
+        RecordingReplicaRouter.reads = []
+        self.client.get(reverse('admin:students_course_change', args=[self.course.id]))
+        self.assertEqual(self.routed('students.Course'), {None})
+
+    def test_writes_pin_the_browser_to_the_primary(self):
+        response = self.client.post(reverse('enroll_course', args=[self.course.id]))
+        self.assertEqual(response.cookies[replicas.PIN_COOKIE]['max-age'], 5)
+        RecordingReplicaRouter.reads = []
+        self.client.get(reverse('course_detail', args=[self.course.id]))
+        self.assertEqual(self.routed('students.Course'), {None})
+
+        del self.client.cookies[replicas.PIN_COOKIE]
+        RecordingReplicaRouter.reads = []
+        self.client.get(reverse('course_detail', args=[self.course.id]))
+        self.assertEqual(self.routed('students.Course'), {'replica1'})
+
+    def test_writes_go_to_the_primary(self):
+        router = replicas.ReplicaRouter()
+        course = Course.objects.get(pk=self.course.pk)
+        course._state.db = 'replica1'
+        self.assertEqual(router.db_for_write(Course, instance=course), 'default')
+        self.assertFalse(router.allow_migrate('replica1', 'students'))
+        self.assertIsNone(router.allow_migrate('default', 'students'))
+
+
+class SyncReplicasTests(CacheResetMixin, TestCase):
+    def test_sync_sqlite_copies_a_consistent_snapshot(self):
+        import sqlite3
+
+        db_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, db_dir)
+        primary, replica = f'{db_dir}/primary.sqlite3', f'{db_dir}/replica.sqlite3'
+        conn = sqlite3.connect(primary)
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.execute('CREATE TABLE t (n INTEGER)')
+        conn.executemany('INSERT INTO t VALUES (?)', [(n,) for n in range(100)])
+        conn.commit()
+
+        replicas.sync_sqlite(primary, replica)
+        reader = sqlite3.connect(replica)
+        self.assertEqual(reader.execute('SELECT count(*) FROM t').fetchone(), (100,))
+
+        # Connections already open on the replica see later syncs
+        conn.execute('DELETE FROM t WHERE n < 40')
+        conn.commit()
+        replicas.sync_sqlite(primary, replica)
+        self.assertEqual(reader.execute('SELECT count(*) FROM t').fetchone(), (60,))
+        reader.close()
+        conn.close()
+
+    def test_command_requires_replicas(self):
+        with self.assertRaisesMessage(CommandError, 'No REPLICA_DATABASES configured'):
+            call_command('sync_replicas')
+
+
+@override_settings(ROOT_URLCONF='course_management.asgi_urls')
+class AsyncViewTests(CacheResetMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.course = make_course('Algorithms')
+        self.other = make_course('Compilers')
+        self.student = make_student()
+        enroll_student(self.student, self.course)
+        self.async_client.force_login(self.student.user)
+        self.client.force_login(self.student.user)
+
+    def queries(self, response):
+        return int(re.search(r'desc="(\d+) queries"', response['Server-Timing']).group(1))
+
+    async def test_pages_are_served_by_the_async_views(self):
+        pages = [
+            ('course_list', [], asyncviews.course_list),
+            ('course_detail', [self.course.id], asyncviews.course_detail),
+            ('enroll_course', [self.other.id], asyncviews.enroll_course),
+            ('my_courses', [], asyncviews.my_courses),
+        ]
+        for name, args, view in pages:
+            response = await self.async_client.get(reverse(name, args=args))
+            self.assertEqual(response.status_code, 200)
+            self.assertIs(response.resolver_match.func, view)
+        self.assertContains(response, 'Algorithms')
+
+    async def test_same_queries_as_the_sync_views(self):
+        for name, args in [('course_list', []), ('course_detail', [self.course.id]), ('my_courses', [])]:
+            url = reverse(name, args=args)
+            cache.clear()
+            sync_response = await sync_to_async(self.client.get)(url)
+            cache.clear()
+            async_response = await self.async_client.get(url)
+            self.assertEqual(sync_response.content, async_response.content, name)
+            self.assertEqual(self.queries(async_response), self.queries(sync_response), name)
+
+    async def test_enroll(self):
+        response = await self.async_client.post(reverse('enroll_course', args=[self.other.id]))
+        self.assertRedirects(response, reverse('course_detail', args=[self.other.id]), fetch_redirect_response=False)
+        other = await Course.objects.aget(pk=self.other.pk)
+        self.assertEqual(other.enrolled_count, 1)
+
+        response = await self.async_client.post(reverse('enroll_course', args=[self.other.id]))
+        self.assertContains(response, 'already enrolled')
+
+    async def test_login_required(self):
+        await sync_to_async(self.async_client.logout)()
+        response = await self.async_client.get(reverse('my_courses'))
+        self.assertRedirects(response, f"{reverse('login')}?next={reverse('my_courses')}", fetch_redirect_response=False)
+
+    async def test_staff_without_student_profile(self):
+        staff = await User.objects.acreate(username='teacher', is_staff=True)
+        await sync_to_async(self.async_client.force_login)(staff)
+        response = await self.async_client.post(reverse('enroll_course', args=[self.other.id]))
+        self.assertRedirects(response, reverse('course_list'), fetch_redirect_response=False)
+        response = await self.async_client.get(reverse('course_detail', args=[self.course.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.context['is_enrolled'])
+
+    async def test_missing_course(self):
+        response = await self.async_client.get(reverse('course_detail', args=[0]))
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,146 @@
+"""
+Chunked, resumable uploads.
+
+A client starts an UploadSession with the file's name, size and SHA-256, PUTs
+the bytes in any number of chunks (each one written straight to a part file
+at its offset), and finalizes. Finalizing checks the whole-file checksum and
+moves the part file into FileUpload.file without copying it through memory
+(or just drops it, when the same content is already stored).
+Abandoned sessions are removed by the cleanup_upload_sessions command.
+"""
+
+import os
+import re
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import FileUpload, UploadSession, file_sha256, guess_content_type
+
+CHUNK_SIZE = 64 * 1024
+
+SHA256_RE = re.compile(r'^[0-9a-f]{64}$')
+
+
+class UploadError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class PartFile(File):
+    """A finished part file; FileSystemStorage moves it instead of copying."""
+    def temporary_file_path(self):
+        return self.name
+
+
+def session_dir():
+    return Path(getattr(settings, 'UPLOAD_SESSION_DIR', Path(settings.MEDIA_ROOT) / 'upload_sessions'))
+
+
+def part_path(session):
+    return session_dir() / f'{session.pk}.part'
+
+
+def start_session(user, course, title, filename, size, sha256, description=''):
+    filename = os.path.basename(str(filename or '')).strip()
+    if not filename or not title:
+        raise UploadError('A title and a filename are required.')
+    try:
+        size = int(size)
+    except (TypeError, ValueError):
+        raise UploadError('size must be an integer.')
+    max_size = getattr(settings, 'UPLOAD_SESSION_MAX_SIZE', 5 * 1024 ** 3)
+    if size < 0 or size > max_size:
+        raise UploadError(f'size must be between 0 and {max_size} bytes.', status=413)
+    sha256 = str(sha256 or '').lower()
+    if not SHA256_RE.match(sha256):
+        raise UploadError('sha256 must be a hex SHA-256 digest.')
+
+    session = UploadSession.objects.create(
+        uploaded_by=user,
+        course=course,
+        title=title,
+        description=description,
+        filename=filename,
+        size=size,
+        sha256=sha256,
+    )
+    session_dir().mkdir(parents=True, exist_ok=True)
+    part_path(session).touch()
+    return session
+
+
+def write_chunk(session, offset, length, stream):
+    """
+    Copy ``length`` bytes from ``stream`` into the part file at ``offset``.
+    Chunks may be re-sent, but must not leave a gap after the bytes already
+    received. Returns the session's new received_bytes.
+    """
+    if offset > session.received_bytes:
+        raise UploadError(f'Expected a chunk at offset {session.received_bytes} or earlier.', status=409)
+    if offset + length > session.size:
+        raise UploadError('Chunk extends past the declared file size.', status=416)
+
+    written = 0
+    with open(part_path(session), 'r+b') as part:
+        part.seek(offset)
+        while written < length:
+            data = stream.read(min(CHUNK_SIZE, length - written))
+            if not data:
+                break
+            part.write(data)
+            written += len(data)
+
+    UploadSession.objects.filter(pk=session.pk).update(
+        received_bytes=Greatest(F('received_bytes'), offset + written),
+        updated_at=timezone.now(),
+    )
+    session.refresh_from_db(fields=['received_bytes', 'updated_at'])
+    if written < length:
+        raise UploadError('Connection closed before the chunk was complete; resume from the returned offset.')
+    return session.received_bytes
+
+
+def finalize_session(session):
+    if session.received_bytes != session.size:
+        raise UploadError(f'Upload incomplete: {session.received_bytes}/{session.size} bytes received.', status=409)
+    path = part_path(session)
+    with open(path, 'rb') as part:
+        checksum = file_sha256(File(part))
+    if checksum != session.sha256:
+        raise UploadError('Checksum mismatch; re-send the corrupted chunks.', status=422)
+
+    with transaction.atomic():
+        file_upload = FileUpload(
+            uploaded_by=session.uploaded_by,
+            course=session.course,
+            title=session.title,
+            description=session.description,
+            filename=session.filename,
+            size=session.size,
+            content_type=guess_content_type(session.filename),
+            sha256=checksum,
+        )
+        with open(path, 'rb') as part:
+            part_file = PartFile(part, name=str(path))
+            part_file.sha256 = checksum
+            file_upload.file.save(session.filename, part_file, save=False)
+        file_upload.save()
+        session.delete()
+    # Still there if the content was already stored
+    path.unlink(missing_ok=True)
+    return file_upload
+
+
+def discard_session(session):
+    try:
+        part_path(session).unlink()
+    except FileNotFoundError:
+        pass
+    session.delete()
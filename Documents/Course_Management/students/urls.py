@@ -1,6 +1,7 @@
-from django.urls import path
+from django.urls import path, reverse_lazy
 from django.contrib.auth import views as auth_views
 from . import views
+from .forms import AccountActivationForm
 
 urlpatterns = [
     path('', views.course_list, name='course_list'),
@@ -8,11 +9,24 @@ urlpatterns = [
     path('admin-register/', views.admin_register, name='admin_register'),
     path('login/', auth_views.LoginView.as_view(template_name='registration/login.html'), name='login'),
     path('logout/', auth_views.LogoutView.as_view(), name='logout'),
+    path('activate/<uidb64>/<token>/', auth_views.PasswordResetConfirmView.as_view(
+        template_name='registration/activate_account.html',
+        form_class=AccountActivationForm,
+        success_url=reverse_lazy('login'),
+    ), name='activate_account'),
     path('courses/', views.course_list, name='course_list'),
+    path('courses/search/', views.course_search, name='course_search'),
     path('courses/<int:course_id>/', views.course_detail, name='course_detail'),
     path('courses/<int:course_id>/enroll/', views.enroll_course, name='enroll_course'),
+    path('courses/<int:course_id>/hold/', views.hold_seat, name='hold_seat'),
+    path('courses/<int:course_id>/hold/checkout/', views.seat_hold, name='seat_hold'),
     path('my-courses/', views.my_courses, name='my_courses'),
     path('courses/<int:course_id>/upload/', views.upload_file, name='upload_file'),
+    path('courses/<int:course_id>/uploads/', views.upload_session_start, name='upload_session_start'),
+    path('uploads/<uuid:session_id>/', views.upload_session, name='upload_session'),
+    path('uploads/<uuid:session_id>/finalize/', views.upload_session_finalize, name='upload_session_finalize'),
     path('files/<int:file_id>/download/', views.download_file, name='download_file'),
     path('files/<int:file_id>/delete/', views.delete_file, name='delete_file'),
+    path('perf/stats/', views.perf_stats, name='perf_stats'),
+    path('metrics', views.metrics_view, name='metrics'),
 ]
@@ -1,12 +1,29 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.conf import settings
+from django.urls import reverse
 from django.contrib.auth import login, authenticate
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import HttpResponse, Http404
+from django.http import HttpResponse, Http404, JsonResponse
+from django.views.decorators.http import require_http_methods, require_POST
 from django.core.exceptions import PermissionDenied
 from django.db.models import Q
-from .models import Student, Course, Enrollment, FileUpload
-from .forms import StudentRegistrationForm, CourseEnrollmentForm, FileUploadForm, AdminRegistrationForm
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+from .models import Student, Course, Enrollment, FileUpload, SeatHold, UploadSession, Waitlist
+from .forms import StudentRegistrationForm, CourseEnrollmentForm, CourseFilterForm, FileUploadForm, AdminRegistrationForm
+from .enrollment import EnrollmentError
+from .downloads import serve_file
+from .holds import confirm_hold, place_hold, release_hold
+from .membership import enrolled_course_ids
+from .pagination import keyset_page
+from . import metrics, perf
+from .search import search_courses
+from .uploads import UploadError, discard_session, finalize_session, start_session, write_chunk
+from .waitlist import enroll_or_join_waitlist, waitlist_rank
+import json
+import re
 
 def register(request):
     if request.method == 'POST':
@@ -32,22 +49,57 @@ def admin_register(request):
         form = AdminRegistrationForm()
     return render(request, 'registration/admin_register.html', {'form': form})
 
+COURSES_PER_PAGE = 24
+
 @login_required
 def course_list(request):
-    courses = Course.objects.filter(is_active=True).order_by('title')
+    filter_form = CourseFilterForm(request.GET)
+    courses = filter_form.filter(Course.objects.filter(is_active=True))
+    query = filter_form.cleaned_data.get('q') if filter_form.is_valid() else ''
+    if query:
+        # Ranked search results are a single page
+        courses = search_courses(query, courses, limit=COURSES_PER_PAGE)
+    else:
+        courses = keyset_page(
+            courses,
+            ('title', 'id'),
+            COURSES_PER_PAGE,
+            after=request.GET.get('after'),
+            before=request.GET.get('before'),
+        )
     user_enrollments = []
     
     if hasattr(request.user, 'student'):
-        user_enrollments = Enrollment.objects.filter(
-            student=request.user.student,
-            is_active=True
-        ).values_list('course_id', flat=True)
+        user_enrollments = enrolled_course_ids(request.user.student)
+    
+    # Filters without the cursor, for building next/previous links
+    params = request.GET.copy()
+    params.pop('after', None)
+    params.pop('before', None)
     
     return render(request, 'students/course_list.html', {
         'courses': courses,
-        'user_enrollments': user_enrollments
+        'user_enrollments': user_enrollments,
+        'filter_form': filter_form,
+        'filter_query': params.urlencode(),
+        'query': query,
     })
 
+@login_required
+def course_search(request):
+    courses = search_courses(request.GET.get('q', ''), Course.objects.filter(is_active=True), limit=10)
+    return JsonResponse({'results': [
+        {
+            'id': course.id,
+            'title': course.title,
+            'title_html': course.title_html,
+            'snippet_html': course.snippet_html,
+            'instructor': course.instructor,
+            'url': reverse('course_detail', args=[course.id]),
+        }
+        for course in courses
+    ]})
+
 @login_required
 def course_detail(request, course_id):
     course = get_object_or_404(Course, id=course_id)
@@ -55,14 +107,10 @@ def course_detail(request, course_id):
     files = []
     
     if hasattr(request.user, 'student'):
-        is_enrolled = Enrollment.objects.filter(
-            student=request.user.student,
-            course=course,
-            is_active=True
-        ).exists()
+        is_enrolled = course.id in enrolled_course_ids(request.user.student)
         
         if is_enrolled:
-            files = FileUpload.objects.filter(course=course).order_by('-timestamp')
+            files = FileUpload.objects.filter(course=course).select_related('uploaded_by').order_by('-timestamp')
     
     return render(request, 'students/course_detail.html', {
         'course': course,
@@ -83,9 +131,16 @@ def enroll_course(request, course_id):
     if request.method == 'POST':
         form = CourseEnrollmentForm(request.POST, student=student, course=course)
         if form.is_valid():
-            enrollment = Enrollment.objects.create(student=student, course=course)
-            messages.success(request, f'Successfully enrolled in {course.title}!')
-            return redirect('course_detail', course_id=course.id)
+            try:
+                result = enroll_or_join_waitlist(student, course)
+            except EnrollmentError as e:
+                form.add_error(None, str(e))
+            else:
+                if isinstance(result, Waitlist):
+                    messages.info(request, waitlisted_message(course, waitlist_rank(result)))
+                else:
+                    messages.success(request, f'Successfully enrolled in {course.title}!')
+                return redirect('course_detail', course_id=course.id)
     else:
         form = CourseEnrollmentForm(student=student, course=course)
     
@@ -94,6 +149,55 @@ def enroll_course(request, course_id):
         'course': course
     })
 
+@login_required
+@require_POST
+def hold_seat(request, course_id):
+    course = get_object_or_404(Course, id=course_id)
+    if not hasattr(request.user, 'student'):
+        messages.error(request, 'Only students can enroll in courses.')
+        return redirect('course_list')
+    try:
+        place_hold(request.user.student, course)
+    except EnrollmentError as e:
+        messages.error(request, str(e))
+        return redirect('enroll_course', course_id=course.id)
+    return redirect('seat_hold', course_id=course.id)
+
+@login_required
+def seat_hold(request, course_id):
+    if not hasattr(request.user, 'student'):
+        raise Http404
+    hold = get_object_or_404(
+        SeatHold.objects.select_related('course'), student=request.user.student, course_id=course_id
+    )
+    course = hold.course
+    
+    if request.method == 'POST':
+        if request.POST.get('action') == 'release':
+            release_hold(hold)
+            messages.info(request, f'Your seat in {course.title} has been released.')
+            return redirect('course_detail', course_id=course.id)
+        try:
+            confirm_hold(hold)
+        except EnrollmentError as e:
+            messages.error(request, str(e))
+            return redirect('enroll_course', course_id=course.id)
+        messages.success(request, f'Successfully enrolled in {course.title}!')
+        return redirect('course_detail', course_id=course.id)
+    
+    if hold.is_expired:
+        messages.error(request, 'Your seat hold has expired.')
+        return redirect('enroll_course', course_id=course.id)
+    return render(request, 'students/seat_hold.html', {
+        'hold': hold,
+        'course': course,
+        'seconds_left': int((hold.expires_at - timezone.now()).total_seconds()),
+    })
+
+def waitlisted_message(course, rank):
+    return (f'{course.title} is full. You are number {rank} on the waitlist and will be '
+            'enrolled automatically when a seat frees up.')
+
 @login_required
 def my_courses(request):
     if not hasattr(request.user, 'student'):
@@ -115,11 +219,7 @@ def upload_file(request, course_id):
     
     # Check if user is enrolled in the course
     if hasattr(request.user, 'student'):
-        if not Enrollment.objects.filter(
-            student=request.user.student,
-            course=course,
-            is_active=True
-        ).exists():
+        if course.id not in enrolled_course_ids(request.user.student):
             messages.error(request, 'You must be enrolled in this course to upload files.')
             return redirect('course_detail', course_id=course.id)
     
@@ -140,24 +240,92 @@ def upload_file(request, course_id):
         'course': course
     })
 
+def _upload_session_json(session):
+    return {
+        'id': str(session.pk),
+        'filename': session.filename,
+        'size': session.size,
+        'offset': session.received_bytes,
+        'url': reverse('upload_session', args=[session.pk]),
+        'finalize_url': reverse('upload_session_finalize', args=[session.pk]),
+    }
+
+@login_required
+@require_POST
+def upload_session_start(request, course_id):
+    course = get_object_or_404(Course, id=course_id)
+    
+    if hasattr(request.user, 'student'):
+        if course.id not in enrolled_course_ids(request.user.student):
+            return JsonResponse({'error': 'You must be enrolled in this course to upload files.'}, status=403)
+    
+    try:
+        data = json.loads(request.body)
+        session = start_session(
+            request.user,
+            course,
+            title=data.get('title'),
+            description=data.get('description', ''),
+            filename=data.get('filename'),
+            size=data.get('size'),
+            sha256=data.get('sha256'),
+        )
+    except (ValueError, AttributeError):
+        return JsonResponse({'error': 'Expected a JSON object.'}, status=400)
+    except UploadError as e:
+        return JsonResponse({'error': str(e)}, status=e.status)
+    return JsonResponse(_upload_session_json(session), status=201)
+
+CONTENT_RANGE_RE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+
+@login_required
+@require_http_methods(['GET', 'PUT', 'DELETE'])
+def upload_session(request, session_id):
+    session = get_object_or_404(UploadSession, pk=session_id, uploaded_by=request.user)
+    
+    if request.method == 'DELETE':
+        discard_session(session)
+        return HttpResponse(status=204)
+    
+    if request.method == 'PUT':
+        # Content-Range: bytes <first>-<last>/<size>
+        match = CONTENT_RANGE_RE.match(request.headers.get('Content-Range', ''))
+        if not match or int(match.group(3)) != session.size or int(match.group(2)) < int(match.group(1)):
+            return JsonResponse({'error': 'A valid Content-Range header is required.'}, status=400)
+        offset = int(match.group(1))
+        try:
+            write_chunk(session, offset, int(match.group(2)) - offset + 1, request)
+        except UploadError as e:
+            return JsonResponse(dict(_upload_session_json(session), error=str(e)), status=e.status)
+    
+    return JsonResponse(_upload_session_json(session))
+
+@login_required
+@require_POST
+def upload_session_finalize(request, session_id):
+    session = get_object_or_404(UploadSession, pk=session_id, uploaded_by=request.user)
+    try:
+        file_upload = finalize_session(session)
+    except UploadError as e:
+        return JsonResponse(dict(_upload_session_json(session), error=str(e)), status=e.status)
+    return JsonResponse({
+        'id': file_upload.id,
+        'title': file_upload.title,
+        'download_url': reverse('download_file', args=[file_upload.id]),
+    }, status=201)
+
 @login_required
 def download_file(request, file_id):
     file_upload = get_object_or_404(FileUpload, id=file_id)
     
     # Check if user is enrolled in the course
     if hasattr(request.user, 'student'):
-        if not Enrollment.objects.filter(
-            student=request.user.student,
-            course=file_upload.course,
-            is_active=True
-        ).exists() and not request.user.is_staff:
+        if file_upload.course_id not in enrolled_course_ids(request.user.student) and not request.user.is_staff:
             raise PermissionDenied("You don't have permission to download this file.")
     
     try:
-        response = HttpResponse(file_upload.file.read(), content_type='application/octet-stream')
-        response['Content-Disposition'] = f'attachment; filename="{file_upload.get_file_name()}"'
-        return response
-    except:
+        return serve_file(request, file_upload)
+    except (OSError, ValueError):
         raise Http404("File not found.")
 
 @login_required
@@ -178,3 +346,27 @@ def delete_file(request, file_id):
     return render(request, 'students/delete_file.html', {
         'file_upload': file_upload
     })
+
+@staff_member_required
+@require_http_methods(['GET', 'POST'])
+def perf_stats(request):
+    """Request timing histograms for this worker process; POST resets them."""
+    if request.method == 'POST':
+        perf.reset()
+    return JsonResponse(perf.snapshot())
+
+LOOPBACK_ADDRESSES = ('127.0.0.1', '::1')
+
+def metrics_view(request):
+    """
+    Prometheus scrape target for staff, for the METRICS_TOKEN bearer token
+    when one is set, and otherwise for scrapers on this host only.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if token:
+        allowed = constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}')
+    else:
+        allowed = request.META.get('REMOTE_ADDR') in LOOPBACK_ADDRESSES
+    if not allowed and not request.user.is_staff:
+        return HttpResponse(status=401 if token else 403)
+    return HttpResponse(metrics.render_metrics(), content_type=metrics.CONTENT_TYPE)
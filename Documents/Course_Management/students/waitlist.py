@@ -0,0 +1,166 @@
+"""
+Course waitlists.
+
+A student who tries to enroll in a full course joins its waitlist instead of
+being turned away to poll the page. When seats free up (an enrollment is
+deleted, max_students is raised or the course is reactivated), promote()
+admits the waitlist in order, skipping students whose enrollments and live
+seat holds already reach MAX_COURSES_PER_STUDENT, who keep their place.
+
+Inactive enrollments keep their seat, so deactivating one frees nothing.
+Seat holds (students/holds.py) take seats too; the ones that expire are
+swept before promoting. A waiting student who also holds a seat in the course
+is enrolled into it, whether or not another seat is free.
+
+Seats freed during a transaction are collected per course and promoted once
+it commits, and a course's promotion runs a fixed handful of queries however
+many seats it fills. Deleting a student, or a few hundred enrollments from
+the admin, is one promotion per affected course, not one per freed seat.
+"""
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Exists, F, Max, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .db import immediate_atomic
+from .enrollment import CourseFullError, EnrollmentError, enroll_student, retry_locked
+from .membership import invalidate_enrollments
+from .models import MAX_COURSES_PER_STUDENT, Course, Enrollment, SeatHold, Student, Waitlist
+
+
+def join_waitlist(student, course):
+    """Put ``student`` at the end of ``course``'s waitlist or raise EnrollmentError."""
+    return retry_locked(_join_waitlist, student, course)
+
+
+def _join_waitlist(student, course):
+    try:
+        with immediate_atomic():
+            if Enrollment.objects.filter(student=student, course=course).exists():
+                raise EnrollmentError("You are already enrolled in this course.")
+            # Serializes joins on the course row (BEGIN IMMEDIATE on SQLite)
+            Course.objects.select_for_update().filter(pk=course.pk).exists()
+            last = Waitlist.objects.filter(course=course).aggregate(last=Max('position'))['last']
+            return Waitlist.objects.create(student=student, course=course, position=(last or 0) + 1)
+    except IntegrityError:
+        raise EnrollmentError("You are already on the waitlist for this course.")
+
+
+def enroll_or_join_waitlist(student, course):
+    """
+    enroll_student(), or join_waitlist() if the course is full. Returns the
+    Enrollment or the Waitlist entry; raises EnrollmentError otherwise.
+    """
+    try:
+        return enroll_student(student, course)
+    except CourseFullError:
+        return join_waitlist(student, course)
+
+
+def waitlist_rank(entry):
+    """1 for the next student in line."""
+    return Waitlist.objects.filter(course_id=entry.course_id, position__lte=entry.position).count()
+
+
+class PendingPromotion:
+    """The on_commit callback promoting every course that freed seats in a transaction."""
+
+    def __init__(self):
+        self.course_ids = set()
+        self.ran = False
+
+    def __call__(self):
+        self.ran = True
+        promote(self.course_ids)
+
+
+def schedule_promotion(course_ids, using=None):
+    """Promote ``course_ids``' waitlists once the current transaction commits."""
+    connection = transaction.get_connection(using)
+    # Rolled-back savepoints drop their callbacks, so look for a live one
+    pending = next((
+        func for _, func, *_ in connection.run_on_commit
+        if isinstance(func, PendingPromotion) and not func.ran
+    ), None)
+    if pending is not None:
+        pending.course_ids.update(course_ids)
+        return
+    pending = PendingPromotion()
+    pending.course_ids.update(course_ids)
+    # Outside a transaction this promotes at once
+    transaction.on_commit(pending, using=using)
+
+
+def promote(course_ids):
+    """Fill the free seats of ``course_ids`` from their waitlists; returns the new enrollments."""
+    enrollments = []
+    for course_id in sorted(course_ids):
+        enrollments += retry_locked(_promote_course, course_id)
+    return enrollments
+
+
+def _promote_course(course_id):
+    with immediate_atomic():
+        return _promote_seats(course_id)
+
+
+def _promote_seats(course_id):
+    # Lock order is course row, then student rows, as in enroll_student()
+    SeatHold.release_expired([course_id])
+    course = Course.objects.select_for_update().filter(pk=course_id, is_active=True).values(
+        'enrolled_count', 'held_count', 'max_students'
+    ).first()
+    if course is None:
+        return []
+    free = course['max_students'] - course['enrolled_count'] - course['held_count']
+    # Waiting students who also hold a seat here (they joined after placing
+    # the hold) are enrolled into it without needing a free one
+    holders = set(SeatHold.objects.filter(
+        course_id=course_id, student__waitlist__course_id=course_id
+    ).values_list('student_id', flat=True))
+    if free <= 0 and not holders:
+        return []
+    # Live holds count towards the course limit, as in students.holds.place_hold()
+    other_holds = SeatHold.objects.filter(
+        student_id=OuterRef('student_id'), expires_at__gt=timezone.now()
+    ).exclude(course_id=course_id).order_by().values('student_id').annotate(n=Count('pk')).values('n')
+    candidates = (
+        Waitlist.objects.select_for_update()
+        .filter(course_id=course_id)
+        .alias(taken=F('student__course_count') + Coalesce(Subquery(other_holds), Value(0)))
+        .filter(taken__lt=MAX_COURSES_PER_STUDENT)
+        # Enrolled by a path that skipped the signal (bulk inserts)
+        .exclude(student__enrollment__course_id=course_id)
+        # Holders first, so the slice cannot cut them off behind the free seats
+        .alias(holds_here=Exists(SeatHold.objects.filter(course_id=course_id, student_id=OuterRef('student_id'))))
+        .order_by('-holds_here', 'position')
+        .values_list('pk', 'student_id')[:max(free, 0) + len(holders)]
+    )
+    entries = []
+    for entry_id, student_id in candidates:
+        if student_id in holders:
+            entries.append((entry_id, student_id))
+        elif free > 0:
+            free -= 1
+            entries.append((entry_id, student_id))
+    if not entries:
+        return []
+
+    entry_ids, student_ids = zip(*entries)
+    Student.objects.filter(pk__in=student_ids).update(course_count=F('course_count') + 1)
+    # bulk_create() sends no post_save, so the counters are applied here
+    enrollments = Enrollment.objects.bulk_create(
+        [Enrollment(student_id=student_id, course_id=course_id) for student_id in student_ids]
+    )
+    converted = list(SeatHold.objects.filter(course_id=course_id, student_id__in=holders.intersection(student_ids)))
+    for hold in converted:
+        # The held seat is the new enrollment's; see seat_hold_deleted()
+        hold._converted = True
+        hold.delete()
+    Course.adjust_enrollment_counts(
+        course_id, enrolled=len(enrollments), active=len(enrollments), held=-len(converted)
+    )
+    Waitlist.objects.filter(pk__in=entry_ids).delete()
+    invalidate_enrollments(student_ids)
+    return enrollments